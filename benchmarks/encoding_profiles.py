@@ -0,0 +1,85 @@
+"""
+Benchmark de los perfiles de codificación (Settings.ENCODING_PROFILES).
+
+Renderiza el vídeo final con los placeholders de placeholder_assets/ una vez por
+perfil y muestra tiempo de render, tamaño del MP4 y SSIM frente a una referencia
+sin pérdidas (x264 crf 0), para decidir entre CPU y egress con datos.
+Usa la misma configuración que la app (.env).
+
+    python -m benchmarks.encoding_profiles [--profiles fast balanced] [--image] [--keep DIR]
+"""
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+from moviepy.config import FFMPEG_BINARY
+
+from core.config import settings
+from services.video_service import VideoService
+from utils.files import PLACEHOLDERS
+
+REFERENCE_PROFILE = {"preset": "ultrafast", "crf": 0, "tune": None, "threads": None, "audio_bitrate": "192k"}
+
+
+def _ssim(path: str, reference: str) -> float:
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path, "-i", reference,
+         "-lavfi", "[0:v][1:v]ssim", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    m = re.search(r"All:([0-9.]+)", proc.stderr)
+    if not m:
+        raise RuntimeError(f"No se pudo calcular SSIM: {proc.stderr[-500:]}")
+    return float(m.group(1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", nargs="*", default=None, help="por defecto, todos")
+    parser.add_argument("--image", action="store_true", help="variante con imagen de pareja")
+    parser.add_argument("--keep", default=None, help="directorio donde conservar los MP4")
+    args = parser.parse_args()
+
+    profiles = dict(settings.ENCODING_PROFILES)
+    names = args.profiles or list(profiles)
+    profiles["_reference"] = REFERENCE_PROFILE
+
+    out_dir = args.keep or tempfile.mkdtemp(prefix="bench_profiles_")
+    os.makedirs(out_dir, exist_ok=True)
+    vs = VideoService(
+        static_videos_dir=settings.STATIC_VIDEOS,
+        overlay_path=settings.STATIC_OVERLAY,
+        audio_path=settings.STATIC_AUDIO,
+        temp_dir=settings.TEMP_DIR,
+        render_mode=settings.RENDER_MODE,
+        encoding_profiles=profiles,
+        default_profile=settings.DEFAULT_ENCODING_PROFILE,
+    )
+    cartel = PLACEHOLDERS["cartel"]
+    pareja = PLACEHOLDERS["polaroid_img"] if args.image else PLACEHOLDERS["video"]
+
+    def render(name: str) -> tuple[str, float]:
+        path = os.path.join(out_dir, f"{name}.mp4")
+        start = time.perf_counter()
+        vs.render_to_file(path, cartel, pareja, args.image, profile=name)
+        return path, time.perf_counter() - start
+
+    try:
+        # Primera pasada de calentamiento: cachés de overlay / segmentos fijos fuera de la medida
+        reference, _ = render("_reference")
+        print(f"{'perfil':<12}{'tiempo (s)':>12}{'tamaño (MB)':>14}{'SSIM':>10}")
+        for name in names:
+            path, elapsed = render(name)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{name:<12}{elapsed:>12.2f}{size_mb:>14.2f}{_ssim(path, reference):>10.4f}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Paridad y velocidad de los motores de render (Settings.RENDER_ENGINE).
+
+Renderiza el vídeo final con los placeholders de placeholder_assets/ con el
+motor moviepy y con el filtergraph de ffmpeg, y muestra el tiempo de cada uno,
+el número de frames y PSNR/SSIM del de ffmpeg frente al de moviepy.
+Usa la misma configuración que la app (.env). La paridad con umbral, sobre
+clips sintéticos, la comprueba tests/test_engine_parity.py.
+
+    python -m benchmarks.engine_parity [--profile balanced] [--image] [--keep DIR]
+"""
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+from moviepy.config import FFMPEG_BINARY
+
+from core.config import settings
+from services.video_service import RENDER_ENGINES, VideoService
+from utils.files import PLACEHOLDERS
+
+
+def _compare(path: str, reference: str) -> tuple[float, float, float]:
+    """(PSNR medio, PSNR del peor frame, SSIM) de path frente a reference."""
+    with tempfile.NamedTemporaryFile(suffix=".log", delete=False) as f:
+        stats = f.name
+    try:
+        proc = subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-i", path, "-i", reference,
+             "-lavfi", f"[0:v][1:v]psnr=stats_file={stats};[0:v][1:v]ssim", "-f", "null", "-"],
+            capture_output=True, text=True,
+        )
+        psnr = re.search(r"average:([0-9.]+|inf)", proc.stderr)
+        ssim = re.search(r"All:([0-9.]+)", proc.stderr)
+        if not psnr or not ssim:
+            raise RuntimeError(f"No se pudo comparar: {proc.stderr[-500:]}")
+        with open(stats, "r", encoding="utf-8") as f:
+            per_frame = [float(m) for m in re.findall(r"psnr_avg:([0-9.]+|inf)", f.read())]
+        return float(psnr.group(1)), min(per_frame, default=float("nan")), float(ssim.group(1))
+    finally:
+        os.unlink(stats)
+
+
+def _frames(path: str) -> int:
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path, "-map", "0:v", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    counts = re.findall(r"frame=\s*(\d+)", proc.stderr)
+    return int(counts[-1]) if counts else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profile", default=None, help="perfil de codificación (por defecto, el de la app)")
+    parser.add_argument("--image", action="store_true", help="variante con imagen de pareja")
+    parser.add_argument("--keep", default=None, help="directorio donde conservar los MP4")
+    args = parser.parse_args()
+
+    out_dir = args.keep or tempfile.mkdtemp(prefix="bench_engines_")
+    os.makedirs(out_dir, exist_ok=True)
+    cartel = PLACEHOLDERS["cartel"]
+    pareja = PLACEHOLDERS["polaroid_img"] if args.image else PLACEHOLDERS["video"]
+
+    def render(engine: str) -> tuple[str, float]:
+        vs = VideoService(
+            static_videos_dir=settings.STATIC_VIDEOS,
+            overlay_path=settings.STATIC_OVERLAY,
+            audio_path=settings.STATIC_AUDIO,
+            temp_dir=settings.TEMP_DIR,
+            encoding_profiles=settings.ENCODING_PROFILES,
+            default_profile=settings.DEFAULT_ENCODING_PROFILE,
+            render_engine=engine,
+        )
+        path = os.path.join(out_dir, f"{engine}.mp4")
+        start = time.perf_counter()
+        vs.render_to_file(path, cartel, pareja, args.image, profile=args.profile)
+        return path, time.perf_counter() - start
+
+    try:
+        # moviepy primero: deja la caché del overlay caliente, que ffmpeg no usa
+        results = {engine: render(engine) for engine in RENDER_ENGINES}
+        reference = results["moviepy"][0]
+        print(f"{'motor':<10}{'tiempo (s)':>12}{'frames':>8}{'PSNR':>8}{'PSNR mín':>10}{'SSIM':>8}")
+        for engine, (path, elapsed) in results.items():
+            row = f"{engine:<10}{elapsed:>12.2f}{_frames(path):>8}"
+            if path == reference:
+                print(f"{row}{'-':>8}{'-':>10}{'-':>8}")
+                continue
+            psnr, worst, ssim = _compare(path, reference)
+            print(f"{row}{psnr:>8.2f}{worst:>10.2f}{ssim:>8.4f}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
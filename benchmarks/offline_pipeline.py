@@ -0,0 +1,110 @@
+"""
+Pipeline completo (cartel -> pareja -> vídeo final) sin red, con STORAGE_BACKEND local o memory.
+
+Levanta la app con uvicorn en un hilo, sube los placeholders al almacén y
+sustituye Runway por un stub que devuelve sus URLs de /api/media: así la copia
+"desde Runway", la descarga de entradas y la subida del render pasan por el
+backend elegido y lo que se mide es solo nuestro código. Power Automate no se llama.
+
+    python -m benchmarks.offline_pipeline [--backend memory] [--runs 3] [--port 8765]
+                                          [--cartel placeholder_assets/cartel.mp4] [--pareja ...]
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+import uuid
+
+
+class _RunwayStub:
+    def __init__(self, cartel_url: str, pareja_url: str):
+        self.cartel_url = cartel_url
+        self.pareja_url = pareja_url
+
+    async def cache_key(self, kind: str, image_url: str, storage=None):
+        # Cada vuelta tiene que medir la generación completa, no la caché
+        return None
+
+    async def create_cartel_video(self, image_url: str) -> str:
+        return self.cartel_url
+
+    async def create_video_pareja(self, image_url: str) -> str:
+        return self.pareja_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("local", "memory"), default="memory")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cartel", help="vídeo que devuelve el stub de Runway para el cartel (placeholder por defecto)")
+    parser.add_argument("--pareja", help="ídem para la pareja")
+    args = parser.parse_args()
+
+    # Antes de importar la app: core.deps crea el backend al importarse
+    base_url = f"http://127.0.0.1:{args.port}"
+    os.environ["STORAGE_BACKEND"] = args.backend
+    os.environ["STORAGE_PUBLIC_URL"] = base_url
+
+    import httpx
+    import uvicorn
+    import main as app_main
+    from core.deps import get_blob_storage, get_runway_service
+    from routers import final_video
+    from utils.files import PLACEHOLDERS
+
+    storage = get_blob_storage()
+    server = uvicorn.Server(uvicorn.Config(app_main.app, port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    try:
+        # Local y memory no atan nada al event loop: se pueden sembrar desde aquí
+        def seed(kind: str, path: str) -> str:
+            with open(path or PLACEHOLDERS[kind], "rb") as f:
+                upload = storage.upload_stream(f.read(), f"runway_{kind}", "bench", content_settings="video/mp4")
+            return asyncio.run(upload)[1]
+
+        runway = _RunwayStub(seed("cartel", args.cartel), seed("video", args.pareja))
+        app_main.app.dependency_overrides[get_runway_service] = lambda: runway
+        final_video.send_power_automate = _no_power_automate
+
+        print(f"backend={args.backend} ({type(storage).__name__})")
+        print(f"{'run':>4}{'cartel':>9}{'pareja':>9}{'final':>9}{'total':>9}")
+        with httpx.Client(base_url=base_url, timeout=600) as client:
+            for run in range(args.runs):
+                file_id = uuid.uuid4().hex
+                times = []
+                start = time.perf_counter()
+                cartel = _post(client, "/api/create_cartel_video", times, id=file_id, nombre1="A", nombre2="B",
+                               image_url="-", demo=False)["video_url"]
+                pareja = _post(client, "/api/create_video_pareja", times, id=file_id, image_url="-",
+                               demo=False)["video_url"]
+                final = _post(client, "/api/generate_final_video", times, id=file_id, nombre1="A", nombre2="B",
+                              email1="a@b.c", email2="a@b.c", cartel_video=cartel, pareja_video=pareja,
+                              isImage=False)["video_path"]
+                total = time.perf_counter() - start
+                size = len(client.get(final).content)
+                print(f"{run:>4}" + "".join(f"{t:>9.2f}" for t in times) + f"{total:>9.2f}  {size / 1e6:.1f} MB")
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def _no_power_automate(client, **kwargs):
+    return None
+
+
+def _post(client, path: str, times: list, **body) -> dict:
+    start = time.perf_counter()
+    resp = client.post(path, json=body)
+    resp.raise_for_status()
+    times.append(time.perf_counter() - start)
+    return resp.json()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark del blend screen+máscara del overlay (frames/s).
+
+Compara la implementación float32 original de VideoService._compose_screen con
+ScreenCompositor (enteros, buffers reutilizados) en frames 720p y 1080p.
+
+    python -m benchmarks.screen_blend [--frames 120]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.compositing import ScreenCompositor
+
+SIZES = {"720p": (720, 1280), "1080p": (1080, 1920)}
+
+
+def legacy_screen_blend(bg, fg):
+    bg = bg.astype(np.float32) / 255.0
+    fg = fg.astype(np.float32) / 255.0
+    scr = 1.0 - (1.0 - bg) * (1.0 - fg)
+    return np.clip(scr * 255.0, 0, 255).astype(np.uint8)
+
+
+def legacy_compose(bg, fg, m):
+    scr = legacy_screen_blend(bg, fg)
+    m3 = m[..., None]
+    out = bg * (1.0 - m3) + scr * m3
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def _frames(h, w, n, rng):
+    bg = rng.integers(0, 256, size=(n, h, w, 3), dtype=np.uint8)
+    fg = rng.integers(0, 256, size=(n, h, w, 3), dtype=np.uint8)
+    m = rng.random(size=(n, h, w), dtype=np.float32)
+    return bg, fg, m
+
+
+def _fps(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--pool", type=int, default=8, help="frames distintos que se reciclan")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for name, (h, w) in SIZES.items():
+        bg, fg, m = _frames(h, w, args.pool, rng)
+        compositor = ScreenCompositor()
+
+        def legacy(i):
+            k = i % args.pool
+            return legacy_compose(bg[k], fg[k], m[k])
+
+        def fixed(i):
+            k = i % args.pool
+            return compositor.blend(bg[k], fg[k], compositor.alpha_from_mask(m[k]))
+
+        err = max(
+            int(np.abs(legacy(k).astype(np.int16) - fixed(k).astype(np.int16)).max())
+            for k in range(args.pool)
+        )
+        before = _fps(legacy, args.frames)
+        after = _fps(fixed, args.frames)
+        print(f"{name:>6}: float32 {before:7.1f} fps | entero {after:7.1f} fps | x{after / before:.2f} | max |Δ| = {err}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,8 +28,100 @@ class Settings(BaseSettings):
     STATIC_OVERLAY: str = "static/overlay/efectoluces-logo.mov"
     STATIC_AUDIO: str = "static/audio/audio.mp4"
 
+    # "full": recodifica todo el timeline en cada petición
+    # "spliced": solo codifica cartel/pareja y une los segmentos fijos pre-codificados por stream copy
+    RENDER_MODE: str = "full"
+    # "moviepy" o "ffmpeg" (filtergraph único en un subproceso; ignora RENDER_MODE)
+    RENDER_ENGINE: str = "moviepy"
+    # Altura máxima para la que se pre-codifican los segmentos fijos al arrancar (salida de Runway: 720p)
+    RENDER_WARMUP_HEIGHT: int = 720
+
+    # Perfiles de codificación (libx264 + AAC), seleccionables por petición en VideoFinalRequest.
+    # En .env como JSON: ENCODING_PROFILES='{"fast": {"preset": "veryfast", "crf": 24, ...}}'
+    ENCODING_PROFILES: dict[str, dict] = Field(default_factory=lambda: {
+        "fast": {"preset": "veryfast", "crf": 24, "tune": None, "threads": None, "audio_bitrate": "128k"},
+        "balanced": {"preset": "medium", "crf": 23, "tune": None, "threads": None, "audio_bitrate": "128k"},
+        "archive": {"preset": "slow", "crf": 18, "tune": "film", "threads": None, "audio_bitrate": "192k"},
+    })
+    DEFAULT_ENCODING_PROFILE: str = "balanced"
+
+    # Procesos de render por worker de gunicorn (None = RENDER_QUEUE_CONCURRENCY, lo que la cola deja correr a la vez)
+    RENDER_POOL_SIZE: int | None = None
+    # Límite de memoria (RLIMIT_DATA) por proceso de render, en MB (0 = sin límite)
+    RENDER_WORKER_MEMORY_MB: int = 3072
+    # Reciclar cada proceso tras N renders (None = nunca)
+    RENDER_WORKER_MAX_TASKS: int | None = 50
+
+    # Cola de renders: jobs en ejecución a la vez y máximo en espera (el resto recibe 429)
+    RENDER_QUEUE_CONCURRENCY: int = 2
+    RENDER_QUEUE_MAX: int = 20
+
+    # Dónde se guardan vídeos e imágenes: "azure" (Blob Storage), "local" (ficheros en
+    # STORAGE_LOCAL_DIR) o "memory" (solo este proceso). Local y memory se sirven en
+    # {STORAGE_PUBLIC_URL}/api/media/ para poder ejecutar el pipeline sin red
+    STORAGE_BACKEND: str = "azure"
+    STORAGE_LOCAL_DIR: str = "temp_files/storage"
+    STORAGE_PUBLIC_URL: str = "http://localhost:8000"
+
+    # Cache-Control de /api/media (segundos); los clientes revalidan con ETag al caducar
+    MEDIA_CACHE_MAX_AGE: int = 24 * 3600
+
     AZURE_STORAGE_CONNECTION_STRING: str | None = Field(None, env="AZURE_STORAGE_CONNECTION_STRING")
     AZURE_BLOB_CONTAINER: str = Field("public-data", env="AZURE_BLOB_CONTAINER")
+    # Sin connection string: https://<cuenta>.blob.core.windows.net con managed identity (azure-identity)
+    AZURE_STORAGE_ACCOUNT_URL: str | None = None
+    # Para firmar URLs con SAS (generate_sas=True); por defecto, la clave de la connection string
+    AZURE_STORAGE_ACCOUNT_KEY: str | None = None
+    # SAS de lectura de cada blob, válido BLOB_SAS_TTL_SECONDS desde que se firma la URL.
+    # "container": con la clave de la cuenta; "user_delegation": con managed identity, con una
+    # clave de delegación (máx. 7 días) que se renueva cuando le quedan menos de
+    # TTL + BLOB_SAS_REFRESH_MARGIN_SECONDS
+    BLOB_SAS_MODE: str = "container"
+    BLOB_SAS_TTL_SECONDS: int = 24 * 3600
+    BLOB_SAS_REFRESH_MARGIN_SECONDS: int = 3600
+    # Subidas/descargas con el SDK async: hasta max_single_put_size en una petición,
+    # por encima en bloques de max_block_size con max_concurrency en paralelo
+    BLOB_MAX_SINGLE_PUT_SIZE: int = 8 * 1024 * 1024
+    BLOB_MAX_BLOCK_SIZE: int = 4 * 1024 * 1024
+    BLOB_MAX_CONCURRENCY: int = 4
+
+    # Deduplicación de subidas: SHA-256 del contenido -> blob que ya lo tiene (copia dentro
+    # de Azure en vez de volver a subirlo; las subidas en streaming solo se indexan).
+    # Por número de entradas (0 = desactivada)
+    BLOB_DEDUPE_INDEX_DIR: str = "temp_files/content_index"
+    BLOB_DEDUPE_MAX_ENTRIES: int = 100_000
+
+    # Caché local de lo que subimos (vídeos de Runway, imágenes): el vídeo final los lee
+    # de aquí en vez de volver a bajarlos. Por bytes totales, LRU (0 = desactivada)
+    ASSET_CACHE_DIR: str = "temp_files/asset_cache"
+    ASSET_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+
+    # Clientes HTTP compartidos (keep-alive) para todas las llamadas salientes
+    HTTP_TIMEOUT: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 10
+    HTTP_KEEPALIVE_SECONDS: float = 30.0
+    # Solo si está instalado h2
+    HTTP2: bool = True
+
+    # Tareas de Runway: un solo bucle de sondeo por proceso. Primer sondeo a los
+    # RUNWAY_POLL_INITIAL_SECONDS, luego el intervalo crece x RUNWAY_POLL_BACKOFF hasta el máximo
+    RUNWAY_POLL_INITIAL_SECONDS: float = 5.0
+    RUNWAY_POLL_MAX_SECONDS: float = 20.0
+    RUNWAY_POLL_BACKOFF: float = 1.5
+    RUNWAY_TASK_TIMEOUT_SECONDS: float = 600.0
+    # Admisión delante de Runway (por worker): generaciones a la vez, creaciones por minuto
+    # (0 = sin límite) con ráfagas de RUNWAY_RATE_BURST, y máximo en espera (el resto recibe 429)
+    RUNWAY_MAX_CONCURRENCY: int = 5
+    RUNWAY_RATE_PER_MINUTE: float = 30.0
+    RUNWAY_RATE_BURST: int = 5
+    RUNWAY_QUEUE_MAX: int = 20
+    # Generaciones ya hechas (misma imagen, prompt, modelo, ratio y duración) -> vídeo guardado.
+    # Caducan a los RUNWAY_CACHE_TTL_SECONDS; por número de entradas (0 = desactivada)
+    RUNWAY_CACHE_DIR: str = "temp_files/runway_cache"
+    RUNWAY_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    RUNWAY_CACHE_MAX_ENTRIES: int = 10_000
 
     # Configuración en Pydantic v2 (sustituye a class Config)
     model_config = SettingsConfigDict(
@@ -0,0 +1,131 @@
+import time
+import inspect
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+
+@dataclass
+class _Provider:
+    factory: Callable[[], Any]
+    warmup: Optional[Callable[[Any], Any]] = None
+    shutdown: Optional[Callable[[Any], Any]] = None
+
+
+async def _call(fn: Callable[[Any], Any], instance: Any):
+    result = fn(instance)
+    if inspect.isawaitable(result):
+        await result
+
+
+class Container:
+    """
+    Singletons de la app (clientes HTTP, pools, cachés, servicios), creados una vez
+    y compartidos por todas las peticiones. Se registran con provide() y las
+    dependencias se piden dentro de la factory con get(), así que se construyen antes.
+
+    startup() (lifespan) los construye y calienta todos; shutdown() los cierra en
+    orden inverso al de construcción. Cada paso queda medido en `timings` y en el log.
+    get() construye bajo demanda lo que aún no exista: así funcionan los scripts y
+    benchmarks que usan los servicios sin arrancar la app (los servicios con warmup
+    tienen que funcionar también sin él: se inician en su primer uso).
+    """
+
+    def __init__(self):
+        self._providers: dict[str, _Provider] = {}
+        self._instances: dict[str, Any] = {}
+        # Reentrante: una factory pide sus dependencias con get()
+        self._lock = threading.RLock()
+        # nombre -> {"build": s, "warmup": s, "shutdown": s}
+        self.timings: dict[str, dict[str, float]] = {}
+
+    def provide(self, name: str, factory: Callable[[], Any], warmup: Optional[Callable[[Any], Any]] = None,
+                shutdown: Optional[Callable[[Any], Any]] = None):
+        self._providers[name] = _Provider(factory, warmup, shutdown)
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        # Las dependencias síncronas de FastAPI llegan desde el threadpool
+        with self._lock:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._providers[name].factory()
+                self._record(name, "build", time.perf_counter() - start)
+            return self._instances[name]
+
+    def _record(self, name: str, phase: str, seconds: float):
+        self.timings.setdefault(name, {})[phase] = seconds
+
+    async def startup(self):
+        """
+        Construye y calienta todo. Un fallo no impide arrancar (p.ej. MSAL sin red al
+        descubrir el tenant): se registra, la instancia a medio arrancar se cierra y
+        se saca del registro, y el siguiente get() la vuelve a construir.
+        """
+        start = time.perf_counter()
+        for name, provider in self._providers.items():
+            try:
+                instance = self.get(name)
+                if provider.warmup is not None:
+                    t = time.perf_counter()
+                    await _call(provider.warmup, instance)
+                    self._record(name, "warmup", time.perf_counter() - t)
+            except Exception as e:
+                logger.warning(f"No se pudo preparar {name}, se creará en su primer uso: {e!r}")
+                await self._discard(name)
+        logger.info(f"Dependencias listas en {time.perf_counter() - start:.2f}s: "
+                    f"{self._summary(self._instances, ('build', 'warmup'))}")
+
+    async def _discard(self, name: str):
+        with self._lock:
+            instance = self._instances.pop(name, None)
+        provider = self._providers[name]
+        if instance is None or provider.shutdown is None:
+            return
+        try:
+            await _call(provider.shutdown, instance)
+        except Exception:
+            logger.exception(f"Error cerrando {name}")
+
+    async def shutdown(self):
+        start = time.perf_counter()
+        with self._lock:
+            built = list(self._instances.items())
+            self._instances.clear()
+        closed = []
+        for name, instance in reversed(built):
+            provider = self._providers[name]
+            if provider.shutdown is None:
+                continue
+            t = time.perf_counter()
+            try:
+                await _call(provider.shutdown, instance)
+            except Exception:
+                logger.exception(f"Error cerrando {name}")
+            self._record(name, "shutdown", time.perf_counter() - t)
+            closed.append(name)
+        logger.info(f"Dependencias cerradas en {time.perf_counter() - start:.2f}s: {self._summary(closed, ('shutdown',))}")
+
+    def _summary(self, names, phases: tuple) -> str:
+        parts = []
+        for name in names:
+            timing = self.timings.get(name, {})
+            steps = [f"{phase} {timing[phase] * 1000:.0f}ms" for phase in phases if phase in timing]
+            if steps:
+                parts.append(f"{name} ({', '.join(steps)})")
+        return "; ".join(parts)
+
+    def render(self) -> str:
+        """Tiempos de arranque y cierre por dependencia, en formato de texto de Prometheus."""
+        lines = ["# HELP app_dependency_seconds Tiempo de construcción, calentamiento y cierre de cada dependencia",
+                 "# TYPE app_dependency_seconds gauge"]
+        for name, timing in self.timings.items():
+            for phase, seconds in timing.items():
+                lines.append(f'app_dependency_seconds{{dependency="{name}",phase="{phase}"}} {seconds}')
+        return "\n".join(lines) + "\n"
@@ -1,8 +1,21 @@
-from fastapi import Depends
-from runwayml import RunwayML
 from .config import settings
-from services.runway_service import RunwayService
+# `settings` se redefine más abajo con DelegatedGraphSettings; las opciones de render
+# solo existen en la configuración de la app
+from .config import settings as app_settings
+from services.runway_service import RunwayService, RunwayDispatcher
+from services.runway_tasks import RunwayTaskManager
+from services.generation_cache import GenerationCache
 from services.video_service import VideoService
+from services.render_executor import RenderExecutor
+from services.render_jobs import RenderJobQueue, RenderJobStore
+from core.metrics import RenderMetrics
+from core.container import Container
+from services.asset_cache import AssetCache
+from core.http_clients import HttpClients
+from services.blob_storage_service import BlobStorageService
+from services.sas_manager import SasManager
+from services.content_index import ContentIndex
+from services.storage import STORAGE_BACKENDS, StorageBackend, LocalStorage, MemoryStorage
 from services.graph_service import GraphService
 from services.delegated_graph_service import DelegatedGraphService
 from pathlib import Path
@@ -10,34 +23,184 @@ from typing import List
 import os
 from core.delegated_graph_config import get_delegated_graph_settings
 
-def get_runway_client() -> RunwayML:
-    return RunwayML(api_key=settings.RUNWAY_API_KEY)
+# Singletons de la app: se construyen en el lifespan (startup) y se cierran al apagar.
+# Orden de registro = orden de dependencias; el cierre va al revés
+container = Container()
 
-def get_runway_service(client: RunwayML = Depends(get_runway_client)) -> RunwayService:
-    return RunwayService(client)
+container.provide(
+    "http_clients",
+    lambda: HttpClients(
+        timeout=app_settings.HTTP_TIMEOUT,
+        connect_timeout=app_settings.HTTP_CONNECT_TIMEOUT,
+        max_connections=app_settings.HTTP_MAX_CONNECTIONS,
+        max_connections_per_host=app_settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_seconds=app_settings.HTTP_KEEPALIVE_SECONDS,
+        http2=app_settings.HTTP2,
+    ),
+    warmup=lambda http: http.start(),
+    shutdown=lambda http: http.close(),
+)
 
-def get_video_service() -> VideoService:
-    return VideoService(
+def get_http_clients() -> HttpClients:
+    return container.get("http_clients")
+
+container.provide(
+    "asset_cache",
+    lambda: AssetCache(app_settings.ASSET_CACHE_DIR, app_settings.ASSET_CACHE_MAX_BYTES),
+)
+
+def get_asset_cache() -> AssetCache:
+    return container.get("asset_cache")
+
+def _new_storage() -> StorageBackend:
+    backend = app_settings.STORAGE_BACKEND
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND desconocido: {backend}")
+    if backend == "local":
+        return LocalStorage(app_settings.STORAGE_LOCAL_DIR, app_settings.STORAGE_PUBLIC_URL)
+    if backend == "memory":
+        return MemoryStorage(app_settings.STORAGE_PUBLIC_URL)
+    return BlobStorageService(
+        connection_string=app_settings.AZURE_STORAGE_CONNECTION_STRING,
+        container=app_settings.AZURE_BLOB_CONTAINER,
+        max_single_put_size=app_settings.BLOB_MAX_SINGLE_PUT_SIZE,
+        max_block_size=app_settings.BLOB_MAX_BLOCK_SIZE,
+        max_concurrency=app_settings.BLOB_MAX_CONCURRENCY,
+        cache=get_asset_cache(),
+        account_url=app_settings.AZURE_STORAGE_ACCOUNT_URL,
+        sas=SasManager(
+            app_settings.AZURE_BLOB_CONTAINER,
+            mode=app_settings.BLOB_SAS_MODE,
+            account_key=app_settings.AZURE_STORAGE_ACCOUNT_KEY,
+            ttl=app_settings.BLOB_SAS_TTL_SECONDS,
+            refresh_margin=app_settings.BLOB_SAS_REFRESH_MARGIN_SECONDS,
+        ),
+        index=ContentIndex(app_settings.BLOB_DEDUPE_INDEX_DIR, app_settings.BLOB_DEDUPE_MAX_ENTRIES),
+    )
+
+container.provide("blob_storage", _new_storage, shutdown=lambda storage: storage.close())
+
+def get_blob_storage() -> StorageBackend:
+    return container.get("blob_storage")
+
+container.provide(
+    "render_executor",
+    lambda: RenderExecutor(
+        # Por worker de gunicorn: tantos procesos como renders admite su cola
+        max_workers=app_settings.RENDER_POOL_SIZE or app_settings.RENDER_QUEUE_CONCURRENCY,
+        memory_limit_mb=app_settings.RENDER_WORKER_MEMORY_MB,
+        max_tasks_per_child=app_settings.RENDER_WORKER_MAX_TASKS,
+    ),
+    shutdown=lambda executor: executor.shutdown(),
+)
+
+def get_render_executor() -> RenderExecutor:
+    return container.get("render_executor")
+
+container.provide(
+    "render_jobs",
+    lambda: RenderJobQueue(
+        store=RenderJobStore(os.path.join(app_settings.TEMP_DIR, "jobs")),
+        concurrency=app_settings.RENDER_QUEUE_CONCURRENCY,
+        max_pending=app_settings.RENDER_QUEUE_MAX,
+    ),
+    warmup=lambda jobs: jobs.start(),
+    shutdown=lambda jobs: jobs.stop(),
+)
+
+def get_render_jobs() -> RenderJobQueue:
+    return container.get("render_jobs")
+
+container.provide("render_metrics", RenderMetrics)
+
+def get_render_metrics() -> RenderMetrics:
+    return container.get("render_metrics")
+
+container.provide(
+    "video_service",
+    lambda: VideoService(
         static_videos_dir=settings.STATIC_VIDEOS,
         overlay_path=settings.STATIC_OVERLAY,
         audio_path=settings.STATIC_AUDIO,
         temp_dir=settings.TEMP_DIR,
-    )
+        render_mode=app_settings.RENDER_MODE,
+        encoding_profiles=app_settings.ENCODING_PROFILES,
+        default_profile=app_settings.DEFAULT_ENCODING_PROFILE,
+        render_engine=app_settings.RENDER_ENGINE,
+    ),
+)
+
+def get_video_service() -> VideoService:
+    return container.get("video_service")
 
+container.provide(
+    "runway_tasks",
+    lambda: RunwayTaskManager(
+        api_key=app_settings.RUNWAY_API_KEY,
+        http=get_http_clients(),
+        initial_interval=app_settings.RUNWAY_POLL_INITIAL_SECONDS,
+        max_interval=app_settings.RUNWAY_POLL_MAX_SECONDS,
+        backoff=app_settings.RUNWAY_POLL_BACKOFF,
+        timeout=app_settings.RUNWAY_TASK_TIMEOUT_SECONDS,
+    ),
+    shutdown=lambda tasks: tasks.close(),
+)
+
+def get_runway_tasks() -> RunwayTaskManager:
+    return container.get("runway_tasks")
+
+container.provide(
+    "runway_dispatcher",
+    lambda: RunwayDispatcher(
+        concurrency=app_settings.RUNWAY_MAX_CONCURRENCY,
+        rate_per_minute=app_settings.RUNWAY_RATE_PER_MINUTE,
+        burst=app_settings.RUNWAY_RATE_BURST,
+        max_pending=app_settings.RUNWAY_QUEUE_MAX,
+    ),
+)
+
+def get_runway_dispatcher() -> RunwayDispatcher:
+    return container.get("runway_dispatcher")
+
+container.provide("runway_service", lambda: RunwayService(get_runway_tasks(), get_runway_dispatcher()))
+
+def get_runway_service() -> RunwayService:
+    return container.get("runway_service")
+
+container.provide(
+    "generation_cache",
+    lambda: GenerationCache(
+        app_settings.RUNWAY_CACHE_DIR,
+        ttl=app_settings.RUNWAY_CACHE_TTL_SECONDS,
+        max_entries=app_settings.RUNWAY_CACHE_MAX_ENTRIES,
+    ),
+)
+
+def get_generation_cache() -> GenerationCache:
+    return container.get("generation_cache")
+
+# Se lee .env una vez al importar, no en cada petición
 settings = get_delegated_graph_settings()
 
-def get_graph_service() -> GraphService:
-    return GraphService(
+# MSAL descubre el tenant por HTTP al crear la aplicación: una vez, no por petición
+container.provide(
+    "graph_service",
+    lambda: GraphService(
         tenant_id=settings.AZURE_TENANT_ID,
         client_id=settings.AZURE_CLIENT_ID,
         client_secret=settings.AZURE_CLIENT_SECRET,
         user_email=settings.AZURE_USER_EMAIL,
         graph_base=settings.GRAPH_BASE,
-    )
+        session=get_http_clients().requests,
+    ),
+)
+
+def get_graph_service() -> GraphService:
+    return container.get("graph_service")
 
 
-def get_delegated_graph_service():
-    s = get_delegated_graph_settings()
+def _new_delegated_graph_service() -> DelegatedGraphService:
+    s = settings
 
     # Token cache file
     cache_dir = os.path.join(Path.home(), ".video_editor_app")
@@ -48,7 +211,6 @@ def get_delegated_graph_service():
     has_secret = bool(s.AZURE_CLIENT_SECRET and s.AZURE_CLIENT_SECRET.strip())
 
     if has_secret:
-        print("client secret", s.AZURE_CLIENT_SECRET)
         # Flujo de aplicación
         scopes = ["https://graph.microsoft.com/.default"]
         client_secret = s.AZURE_CLIENT_SECRET
@@ -67,4 +229,14 @@ def get_delegated_graph_service():
         scopes=scopes,
         token_cache_path=token_cache_path,
         client_secret=client_secret,
-    )
\ No newline at end of file
+        session=get_http_clients().requests,
+    )
+
+# El token cache se lee del disco una vez y queda en memoria, compartido por las peticiones
+container.provide("delegated_graph_service", _new_delegated_graph_service)
+
+def get_delegated_graph_service() -> DelegatedGraphService:
+    return container.get("delegated_graph_service")
+
+def get_container() -> Container:
+    return container
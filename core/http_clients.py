@@ -0,0 +1,262 @@
+import asyncio
+import importlib.util
+import threading
+from typing import Optional
+import aiohttp
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+# httpx solo negocia HTTP/2 si está instalado h2 (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class _Counter:
+    """Peticiones y conexiones nuevas de un cliente; reutilizadas = peticiones - conexiones."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def add(self, requests: int = 0, connections: int = 0):
+        with self._lock:
+            self.requests += requests
+            self.connections += connections
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "reused": max(self.requests - self.connections, 0),
+            }
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter que cuenta peticiones y conexiones nuevas de urllib3."""
+
+    def __init__(self, counter: _Counter, **kwargs):
+        self._counter = counter
+        super().__init__(**kwargs)
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        pool = super().get_connection_with_tls_context(*args, **kwargs)
+        if not getattr(pool, "_counted", False):
+            # urllib3 llama a _new_conn por cada conexión TCP/TLS que abre
+            new_conn = pool._new_conn
+
+            def counted_new_conn():
+                self._counter.add(connections=1)
+                return new_conn()
+
+            pool._new_conn = counted_new_conn
+            pool._counted = True
+        return pool
+
+    def send(self, request, **kwargs):
+        self._counter.add(requests=1)
+        return super().send(request, **kwargs)
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Cuerpo de la respuesta que devuelve el hueco del host al cerrarse (leída entera o no)."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _PerHostLimitTransport(httpx.AsyncBaseTransport):
+    """
+    httpx solo limita conexiones en total: este transporte deja como mucho
+    `limit` peticiones a la vez por (esquema, host, puerto). Cada una ocupa su
+    hueco hasta que se cierra la respuesta, así que las descargas en streaming
+    también cuentan mientras leen el cuerpo.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limit: int):
+        self._transport = transport
+        self.limit = limit
+        self._slots: dict[tuple, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = (request.url.scheme, request.url.host, request.url.port)
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self.limit)
+        await slots.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            slots.release()
+            raise
+        response.stream = _ReleasingStream(response.stream, slots.release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HttpClients:
+    """
+    Clientes HTTP compartidos por toda la app (keep-alive entre peticiones):
+    httpx.AsyncClient (HTTP/2 si hay h2), aiohttp.ClientSession para descargas
+    en streaming y requests.Session para el código síncrono (Graph y MSAL).
+    Los tres dejan como mucho `max_connections_per_host` peticiones a la vez
+    contra un mismo host; el resto espera.
+
+    Los asíncronos se crean en start() (lifespan de la app) porque necesitan el
+    event loop; si se piden antes, se crean en el loop actual. close() los cierra.
+    """
+
+    def __init__(self, timeout: float = 30.0, connect_timeout: float = 10.0,
+                 max_connections: int = 100, max_connections_per_host: int = 10,
+                 keepalive_seconds: float = 30.0, http2: bool = True):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_seconds = keepalive_seconds
+        self.http2 = http2 and HTTP2_AVAILABLE
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 pedido pero h2 no está instalado: httpx usará HTTP/1.1")
+        self.counters = {"httpx": _Counter(), "aiohttp": _Counter(), "requests": _Counter()}
+        self._httpx: Optional[httpx.AsyncClient] = None
+        self._aiohttp: Optional[aiohttp.ClientSession] = None
+        self._requests: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    # --- httpx ---
+    def _new_httpx(self) -> httpx.AsyncClient:
+        counter = self.counters["httpx"]
+
+        async def trace(event: str, info: dict):
+            if event == "connection.connect_tcp.complete":
+                counter.add(connections=1)
+
+        async def on_request(request: httpx.Request):
+            counter.add(requests=1)
+            request.extensions["trace"] = trace
+
+        # httpx no tiene límite por host: lo pone _PerHostLimitTransport por encima del pool
+        transport = httpx.AsyncHTTPTransport(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_seconds,
+            ),
+        )
+        return httpx.AsyncClient(
+            transport=_PerHostLimitTransport(transport, self.max_connections_per_host),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            follow_redirects=True,
+            event_hooks={"request": [on_request]},
+        )
+
+    # --- aiohttp ---
+    def _new_aiohttp(self) -> aiohttp.ClientSession:
+        counter = self.counters["aiohttp"]
+
+        async def on_request_start(session, ctx, params):
+            counter.add(requests=1)
+
+        async def on_connection_create_end(session, ctx, params):
+            counter.add(connections=1)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_seconds,
+                ttl_dns_cache=300,
+            ),
+            # Sin total: las descargas largas fijan el suyo por petición
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.timeout),
+            trace_configs=[trace],
+        )
+
+    # --- requests ---
+    def _new_requests(self) -> requests.Session:
+        session = requests.Session()
+        # pool_block: con el pool del host lleno se espera una conexión libre en vez de abrir otra
+        adapter = _CountingAdapter(
+            self.counters["requests"],
+            pool_connections=self.max_connections_per_host,
+            pool_maxsize=self.max_connections_per_host,
+            pool_block=True,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def httpx(self) -> httpx.AsyncClient:
+        if self._httpx is None or self._httpx.is_closed:
+            self._httpx = self._new_httpx()
+        return self._httpx
+
+    @property
+    def aiohttp(self) -> aiohttp.ClientSession:
+        if self._aiohttp is None or self._aiohttp.closed:
+            self._aiohttp = self._new_aiohttp()
+        return self._aiohttp
+
+    @property
+    def requests(self) -> requests.Session:
+        with self._lock:
+            if self._requests is None:
+                self._requests = self._new_requests()
+            return self._requests
+
+    async def start(self):
+        self.httpx
+        self.aiohttp
+        self.requests
+        logger.info(f"Clientes HTTP compartidos listos (HTTP/2: {self.http2})")
+
+    async def close(self):
+        if self._httpx is not None:
+            await self._httpx.aclose()
+            self._httpx = None
+        if self._aiohttp is not None:
+            await self._aiohttp.close()
+            self._aiohttp = None
+        with self._lock:
+            if self._requests is not None:
+                self._requests.close()
+                self._requests = None
+
+    def stats(self) -> dict:
+        return {name: c.snapshot() for name, c in self.counters.items()}
+
+    def render(self) -> str:
+        """Contadores de reutilización en formato de texto de Prometheus."""
+        stats = self.stats()
+        lines = []
+        for metric, key, help in (
+            ("http_client_requests_total", "requests", "Peticiones salientes por cliente"),
+            ("http_client_connections_total", "connections", "Conexiones nuevas abiertas por cliente"),
+            ("http_client_reused_total", "reused", "Peticiones servidas por una conexión reutilizada"),
+        ):
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{client="{name}"}} {s[key]}' for name, s in sorted(stats.items())]
+        return "\n".join(lines) + "\n"
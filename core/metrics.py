@@ -0,0 +1,99 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+# Límites superiores de los buckets (el +Inf va implícito)
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+BYTES_BUCKETS = (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+FRAMES_BUCKETS = (1, 24, 48, 96, 240, 480, 960)
+
+
+class Timings:
+    """
+    Spans de un render, en orden: [{"stage", "seconds", "bytes", "frames"}].
+    Son dicts planos para que viajen tal cual desde el proceso de render y se
+    guarden en el JSON del job.
+    """
+
+    def __init__(self, spans: Optional[list[dict]] = None):
+        self.spans = spans if spans is not None else []
+
+    def counter(self, stage: str) -> dict:
+        """Span acumulativo: quien lo usa suma seconds/frames/bytes (p.ej. por frame)."""
+        rec = {"stage": stage, "seconds": 0.0, "bytes": None, "frames": None}
+        self.spans.append(rec)
+        return rec
+
+    @contextmanager
+    def span(self, stage: str):
+        rec = self.counter(stage)
+        start = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["seconds"] += time.perf_counter() - start
+
+    def extend(self, spans: Iterable[dict]):
+        self.spans.extend(spans)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple, label: str = "stage"):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._lock = threading.Lock()
+        # valor de la etiqueta -> [cuentas por bucket (+Inf al final), suma]
+        self._series: dict[str, list] = {}
+
+    def observe(self, value: float, label_value: str):
+        with self._lock:
+            counts, _ = series = self._series.setdefault(label_value, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(c), s) for k, (c, s) in self._series.items()}
+        for value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class RenderMetrics:
+    """
+    Histogramas por etapa del pipeline de vídeo final, en formato de texto de
+    Prometheus. Son por proceso: con varios workers de gunicorn cada uno
+    expone los renders que ha despachado él.
+    """
+
+    def __init__(self):
+        self.seconds = Histogram("render_stage_seconds", "Duración de cada etapa del render", SECONDS_BUCKETS)
+        self.bytes = Histogram("render_stage_bytes", "Bytes procesados por etapa", BYTES_BUCKETS)
+        self.frames = Histogram("render_stage_frames", "Frames procesados por etapa", FRAMES_BUCKETS)
+
+    def observe(self, spans: Iterable[dict]):
+        for s in spans:
+            self.seconds.observe(s["seconds"], s["stage"])
+            if s.get("bytes") is not None:
+                self.bytes.observe(s["bytes"], s["stage"])
+            if s.get("frames") is not None:
+                self.frames.observe(s["frames"], s["stage"])
+
+    def render(self) -> str:
+        lines = []
+        for h in (self.seconds, self.bytes, self.frames):
+            lines += h.render()
+        return "\n".join(lines) + "\n"
@@ -3,6 +3,7 @@ import uuid
 import msal
 from fastapi import Request
 from core.config import settings
+from core.deps import get_http_clients
 
 AUTHORITY = f"https://login.microsoftonline.com/{settings.AZURE_TENANT_ID}"
 GRAPH_SCOPES = settings.GRAPH_SCOPES.split()
@@ -32,6 +33,8 @@ def build_cca(request: Request) -> msal.ConfidentialClientApplication:
         authority=AUTHORITY,
         client_credential=settings.AZURE_CLIENT_SECRET,
         token_cache=cache,
+        # Reutiliza conexiones con login.microsoftonline.com entre peticiones
+        http_client=get_http_clients().requests,
     )
 
 def get_scopes() -> list[str]:
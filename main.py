@@ -4,8 +4,11 @@ from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import settings
-from routers import ai_generation, final_video, mail, media, whatsapp, image_generation
+from routers import ai_generation, final_video, mail, media, whatsapp, image_generation, metrics
 from utils.files import init_temp_dir, cleanup_temp_files
+from core.deps import get_video_service, get_container
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 # === LOGGING CONFIGURATION ===
@@ -13,8 +16,6 @@ LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
 
-app = FastAPI(title="Video Generation API")
-
 # Formato uniforme y legible
 LOG_FORMAT = (
     "%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d | %(message)s"
@@ -40,6 +41,28 @@ logger = logging.getLogger("video_generation_app")
 
 logger.info("Logger configurado correctamente.")
 
+async def _warm_static_segments():
+    try:
+        await asyncio.to_thread(get_video_service().warm_static_segments, settings.RENDER_WARMUP_HEIGHT)
+        logger.info("Segmentos fijos pre-codificados.")
+    except Exception:
+        # El primer render los generará bajo demanda
+        logger.exception("No se pudieron pre-codificar los segmentos fijos")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cleanup_temp_files()
+    # Clientes, pools y servicios compartidos: se crean y calientan aquí, con su tiempo en el log
+    await get_container().startup()
+    if settings.RENDER_MODE == "spliced":
+        app.state.warmup_task = asyncio.create_task(_warm_static_segments())
+    try:
+        yield
+    finally:
+        await get_container().shutdown()
+
+app = FastAPI(title="Video Generation API", lifespan=lifespan)
+
 app.add_middleware(
     SessionMiddleware, 
     secret_key=settings.SESSION_SECRET, 
@@ -56,16 +79,13 @@ app.add_middleware(
 
 init_temp_dir(settings.TEMP_DIR)
 
-@app.on_event("startup")
-async def _startup():
-    cleanup_temp_files()
-
 app.include_router(media.router)
 app.include_router(ai_generation.router)
 app.include_router(final_video.router)
 app.include_router(mail.router)
 app.include_router(whatsapp.router)
 app.include_router(image_generation.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def root():
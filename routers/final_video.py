@@ -1,74 +1,25 @@
-from fastapi import APIRouter, Depends
-from core.deps import get_video_service
+from fastapi import APIRouter, Depends, HTTPException
+from core.deps import get_video_service, get_render_executor, get_render_jobs, get_render_metrics, get_blob_storage, get_http_clients
+from core.metrics import Timings, RenderMetrics
+from core.http_clients import HttpClients
 from services.video_service import VideoService
-from schemas.generation import VideoFinalRequest
+from services.render_executor import RenderExecutor
+from services.render_jobs import RenderJobQueue, JobReporter, QueueFullError
+from services.storage import StorageBackend
+from schemas.generation import VideoFinalRequest, RenderJobStatus
+from utils.downloads import download_input
 
 import os
-import uuid
-import requests
-from urllib.parse import urlparse
+import asyncio
+import aiohttp
+import httpx
 import logging
 
 logger = logging.getLogger("video_generation_app")
 router = APIRouter(prefix="/api")
 
-def _download_to_dir(url: str, dest_dir: str) -> str:
-    """
-    Descarga la URL al directorio dest_dir y devuelve la ruta absoluta del fichero.
-    Usa streaming y genera un nombre con uuid. Intenta inferir extensión desde la URL o el header.
-    """
-    logger.info("Downloading URL to dir")
-    parsed = urlparse(url)
-    # intenta sacar extensión de la ruta
-    ext = os.path.splitext(parsed.path)[1]
-    tmp_name = f"input_{uuid.uuid4()}{ext or ''}"
-    out_path = os.path.join(dest_dir, tmp_name)
-
-    # Diccionario de mapeo de Content-Type a extensiones (más limpio y extensible)
-    MIME_EXTENSIONS = {
-        "video/mp4": ".mp4",
-        "video/mpeg": ".mp4", # Mantiene el mapeo original a .mp4
-        "image/jpeg": ".jpg",
-        "image/png": ".png",
-        "image/gif": ".gif",
-        "application/pdf": ".pdf",
-        # Añade otros tipos de archivos aquí si es necesario
-    }
-
-    try:
-        with requests.get(url, stream=True, timeout=30) as r:
-            r.raise_for_status() # Lanza un error para códigos de estado HTTP malos
-            
-            # 2. Si no hay extensión, intenta inferir del Content-Type
-            if not ext:
-                ct = r.headers.get("Content-Type", "").lower().split(';')[0].strip()
-                
-                inferred_ext = MIME_EXTENSIONS.get(ct)
-                
-                if inferred_ext:
-                    # Ajusta la ruta de salida con la extensión inferida
-                    out_path += inferred_ext
-                    logger.info(f"Inferred extension {inferred_ext} from Content-Type: {ct}")
-                else:
-                    logger.warning(f"Could not infer extension from Content-Type: {ct}. Using generic name.")
-
-            # 3. Escribir el contenido en el disco de forma eficiente
-            logger.info(f"Saving to path: {out_path}")
-            with open(out_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=1024 * 1024):
-                    # El chequeo `if chunk:` es redundante con iter_content, pero se mantiene por seguridad
-                    if chunk:
-                        f.write(chunk)
-                        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error during download: {e}")
-        # En un sistema real, podrías querer manejar la limpieza del archivo parcial aquí
-        return "" # Devuelve cadena vacía o lanza la excepción
-
-    return out_path
-
-
-def send_power_automate(nombre1: str, nombre2: str, email1: str, email2: str, video_uri: str, timeout: int = 30):
+async def send_power_automate(client: httpx.AsyncClient, nombre1: str, nombre2: str, email1: str, email2: str,
+                              video_uri: str, timeout: int = 30):
     """
     Llama a la API externa de Power Automate enviando los parámetros en el body JSON.
     Devuelve el JSON de respuesta si existe, o el texto de la respuesta.
@@ -90,49 +41,107 @@ def send_power_automate(nombre1: str, nombre2: str, email1: str, email2: str, vi
     }
     headers = {"Content-Type": "application/json"}
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=timeout)
+        resp = await client.post(url, json=payload, headers=headers, timeout=timeout)
         resp.raise_for_status()
         try:
             logger.info("Power Automate API call successful")
             return {"status": "success", "video_path": video_uri}
         except ValueError:
             return resp.text
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise RuntimeError(f"Error calling external API: {e}") from e
 
 
-@router.post("/generate_final_video")
-async def generate_final_video(req: VideoFinalRequest, vs: VideoService = Depends(get_video_service)):
-    """
-    Recibe en req URLs públicas (blob). Descarga localmente y llama a VideoService.compose_final.
-    Devuelve path absoluto y URL pública usando get_media_url.
-    """
+async def _run_final_video(req: VideoFinalRequest, vs: VideoService, executor: RenderExecutor,
+                           metrics: RenderMetrics, storage: StorageBackend, http: HttpClients,
+                           job: JobReporter) -> str:
     downloaded = []
+    timings = Timings()
     logger.info(f'Generando video final con entradas: {req.cartel_video}, {req.pareja_video}')
     try:
         # Asegurar que el directorio temporal exista (VideoService ya crea temp_dir)
         temp_dir = vs.temp_dir
-
-        # Cartel_video
-        cartel_local = _download_to_dir(req.cartel_video, temp_dir)
-        downloaded.append(cartel_local)
-
-        # Pareja_video
-        pareja_local = _download_to_dir(req.pareja_video, temp_dir)
-        downloaded.append(pareja_local)
-
-        # Llamada al servicio (pasa rutas locales)
-        out = vs.compose_final(req.id, cartel_local, pareja_local, req.isImage)
-
-        send_power_automate(nombre1=req.nombre1, nombre2=req.nombre2, email1=req.email1, email2=req.email2, video_uri=out)
+        job.stage("downloading")
+
+        # Cartel y pareja a la vez; los blobs propios salen de la caché local o del SDK y el resto por HTTP.
+        # download_input ya limpia su parcial si falla
+        async def fetch(stage: str, url: str, session: aiohttp.ClientSession) -> str:
+            with timings.span(stage) as rec:
+                path = await download_input(url, temp_dir, session, storage=storage)
+                downloaded.append(path)
+                rec["bytes"] = os.path.getsize(path)
+            return path
+
+        results = await asyncio.gather(
+            fetch("download_cartel", req.cartel_video, http.aiohttp),
+            fetch("download_pareja", req.pareja_video, http.aiohttp),
+            return_exceptions=True,
+        )
+        # Si falla uno, el otro ya está en `downloaded` y se borra en el finally
+        for r in results:
+            if isinstance(r, BaseException):
+                raise r
+        cartel_local, pareja_local = results
+
+        # Llamada al servicio (pasa rutas locales) en el pool de render: no bloquea el event loop
+        job.stage("rendering")
+        out = await executor.compose_final(vs, req.id, cartel_local, pareja_local, req.isImage, req.encoding_profile,
+                                           timings, storage)
+
+        job.stage("notifying")
+        await send_power_automate(http.httpx, nombre1=req.nombre1, nombre2=req.nombre2, email1=req.email1,
+                                  email2=req.email2, video_uri=out)
         logger.info(f'Video final generado en: {out}')
-
-        # Devolver ruta y URL pública (get_media_url debe aceptar path absoluto o convertir)
-        return {"status": "success", "video_path": out}
+        return out
     finally:
+        # Con el job (también si falla, hasta donde llegó) y en /metrics
+        job.job["timings"] = timings.spans
+        metrics.observe(timings.spans)
         # limpiar ficheros de entrada descargados
         for p in downloaded:
             try:
                 if os.path.exists(p): os.remove(p)
             except:
-                pass
\ No newline at end of file
+                pass
+
+
+@router.post("/generate_final_video")
+async def generate_final_video(
+    req: VideoFinalRequest,
+    vs: VideoService = Depends(get_video_service),
+    executor: RenderExecutor = Depends(get_render_executor),
+    jobs: RenderJobQueue = Depends(get_render_jobs),
+    metrics: RenderMetrics = Depends(get_render_metrics),
+    storage: StorageBackend = Depends(get_blob_storage),
+    http: HttpClients = Depends(get_http_clients),
+):
+    """
+    Recibe en req URLs de blob (las de nuestro contenedor se leen con el SDK). Descarga localmente y llama a VideoService.compose_final.
+    Todo render pasa por la cola acotada; con async_job=True devuelve el job_id sin esperar
+    (consultar en GET /api/jobs/{job_id}).
+    """
+    if req.encoding_profile and req.encoding_profile not in vs.encoding_profiles:
+        raise HTTPException(status_code=400, detail=f"Perfil de codificación desconocido: {req.encoding_profile}")
+
+    try:
+        job_id, result = jobs.submit(
+            lambda job: _run_final_video(req, vs, executor, metrics, storage, http, job),
+            meta={"id": req.id},
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    if req.async_job:
+        return {"status": "queued", "job_id": job_id}
+
+    out = await result
+    # Devolver ruta y URL pública (get_media_url debe aceptar path absoluto o convertir)
+    return {"status": "success", "video_path": out, "job_id": job_id}
+
+
+@router.get("/jobs/{job_id}", response_model=RenderJobStatus)
+async def get_job(job_id: str, jobs: RenderJobQueue = Depends(get_render_jobs)):
+    job = jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job
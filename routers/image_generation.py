@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-import requests
+import httpx
 import uuid
 import tempfile
 from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageFilter
@@ -7,7 +7,9 @@ import os, sys
 from schemas.generation import EditCartelRequest
 from azure.storage.blob import BlobServiceClient, ContentSettings, generate_blob_sas, BlobSasPermissions
 from datetime import datetime, timedelta
-from utils.blob_storage import upload_to_blob_storage
+from core.deps import get_http_clients, get_blob_storage
+from services.storage import StorageBackend
+from core.http_clients import HttpClients
 import logging
 
 logger = logging.getLogger("video_generation_app")
@@ -118,7 +120,8 @@ def render_save_the_date(
         img.convert("RGB").save(output_image, quality=100, subsampling=0)
 
 
-def send_power_automate(uid:str, nombre1: str, nombre2: str, email1: str, email2: str, telefono1: str, telefono2: str, fecha: str, timeout: int = 30):
+async def send_power_automate(client: httpx.AsyncClient, uid:str, nombre1: str, nombre2: str, email1: str, email2: str,
+                              telefono1: str, telefono2: str, fecha: str, timeout: int = 30):
     """
     Llama a la API externa de Power Automate enviando los parámetros en el body JSON.
     Devuelve el JSON de respuesta si existe, o el texto de la respuesta.
@@ -143,18 +146,19 @@ def send_power_automate(uid:str, nombre1: str, nombre2: str, email1: str, email2
     }
     headers = {"Content-Type": "application/json"}
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=timeout)
+        resp = await client.post(url, json=payload, headers=headers, timeout=timeout)
         resp.raise_for_status()
         try:
             logger.info("Power Automate API call successful")
         except ValueError:
             return resp.text
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise RuntimeError(f"Error calling external API: {e}") from e
     
 
 @router.post("/edit_cartel_image")
-async def edit_cartel_image(data: EditCartelRequest):
+async def edit_cartel_image(data: EditCartelRequest, http: HttpClients = Depends(get_http_clients),
+                           storage: StorageBackend = Depends(get_blob_storage)):
 
     # input fijo
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -166,7 +170,8 @@ async def edit_cartel_image(data: EditCartelRequest):
     out_name = f"img_cartel_{data.id}.jpg"
     out_path = os.path.join(tempfile.gettempdir(), out_name)
 
-    send_power_automate(
+    await send_power_automate(
+        http.httpx,
         uid=data.id,
         nombre1= data.nombre1, 
         nombre2= data.nombre2, 
@@ -174,7 +179,7 @@ async def edit_cartel_image(data: EditCartelRequest):
         email2= data.email2, 
         telefono1= data.telef1, 
         telefono2= data.telef2, 
-        fecha= data.fecha
+        fecha= data.fecha,
     )
 
     try:
@@ -190,10 +195,10 @@ async def edit_cartel_image(data: EditCartelRequest):
             render_save_the_date(input_image=input_img, output_image=out_path, names=names, date_str=fecha, vertical_shift=-74, line_spacing_top=1, line_spacing_main=38, l2_size=102)
 
         # Upload to Blob
-        file_id, public_url = upload_to_blob_storage(
+        file_id, public_url = await storage.upload_file(
             file_path=out_path,
             filename=f'img_cartel_{data.id}',
-            content_type="image/jpeg",
+            content_settings="image/jpeg",
             folder=data.id  # Optional: organize files in folders
         )
 
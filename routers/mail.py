@@ -82,10 +82,11 @@ async def get_user_info(
 
 
 # routers/mail.py
-from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi import APIRouter, Request, HTTPException, Query, Depends
 from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
-import httpx
 from core.config import settings
+from core.deps import get_http_clients
+from core.http_clients import HttpClients
 from core.msal_client import build_cca, get_scopes
 from schemas.mail import SendEmailIn
 
@@ -203,7 +204,7 @@ def me(request: Request):
     return {"authenticated": bool(result and "access_token" in result)}
 
 @router.post("/send")
-async def send(request: Request, payload: SendEmailIn):
+async def send(request: Request, payload: SendEmailIn, http: HttpClients = Depends(get_http_clients)):
     cca = build_cca(request)
     accounts = cca.get_accounts()
     if not accounts:
@@ -215,15 +216,15 @@ async def send(request: Request, payload: SendEmailIn):
 
     graph_payload = _build_graph_message(payload)
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            f"{GRAPH_BASE}/me/sendMail",
-            headers={
-                "Authorization": f"Bearer {result['access_token']}",
-                "Content-Type": "application/json",
-            },
-            json=graph_payload,
-        )
+    resp = await http.httpx.post(
+        f"{GRAPH_BASE}/me/sendMail",
+        headers={
+            "Authorization": f"Bearer {result['access_token']}",
+            "Content-Type": "application/json",
+        },
+        json=graph_payload,
+        timeout=30,
+    )
     if resp.status_code not in (200, 202):
         try:
             err = resp.json()
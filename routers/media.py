@@ -1,35 +1,40 @@
 import os
 import uuid
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request
 from typing import Tuple
 import requests
-from utils.blob_storage import upload_bytes_to_blob_storage
+from core.config import settings
+from core.deps import get_blob_storage
+from services.storage import StorageBackend, StoredObject
+from utils.files import media_file
+from utils.media_responses import media_response
 import logging
 
 logger = logging.getLogger("video_generation_app")
 router = APIRouter(prefix="/api")
 
-'''@router.get("/media/{file_path:path}")
-def serve_media(file_path: str):
-    if ".." in file_path or file_path.startswith("/"):
-        raise HTTPException(status_code=400, detail="Invalid file path")
-    full_path = os.path.join(os.getcwd(), os.path.normpath(file_path))
-    if not os.path.exists(full_path):
+@router.api_route("/media/{blob_name:path}", methods=["GET", "HEAD"])
+def serve_media(blob_name: str, request: Request, storage: StorageBackend = Depends(get_blob_storage)):
+    """
+    Sirve los objetos de los backends local y memory (STORAGE_BACKEND), que son las
+    URLs públicas de storage.url() (con Azure los sirve Blob Storage), y los ficheros
+    de get_media_url (placeholders y TEMP_DIR). Admite Range, ETag/If-None-Match y
+    Cache-Control: los reproductores saltan pidiendo solo el tramo que necesitan.
+    """
+    obj = storage.get_object(blob_name)
+    if obj is None:
+        path = media_file(blob_name)
+        obj = StoredObject.from_path(path) if path is not None else None
+    if obj is None:
         raise HTTPException(status_code=404, detail="File not found")
-
-    if file_path.endswith(".mp4"): mt = "video/mp4"
-    elif file_path.endswith(".png"): mt = "image/png"
-    elif file_path.endswith((".jpg", ".jpeg")): mt = "image/jpeg"
-    else: mt = "application/octet-stream"
-    return FileResponse(full_path, media_type=mt)'''
+    return media_response(request, obj, settings.MEDIA_CACHE_MAX_AGE)
 
 
 @router.post("/saveImage")
-async def save_image(file: UploadFile = File(...)):
+async def save_image(file: UploadFile = File(...), storage: StorageBackend = Depends(get_blob_storage)):
     """
     Recibe una imagen desde el front, la sube a Azure Blob Storage usando
-    upload_bytes_to_blob_storage y devuelve la URL pública.
+    storage.upload_stream y devuelve la URL pública.
     """
     unique_id = str(uuid.uuid4().hex) #id único para el archivo y nombre de la carpeta
     filename = f'img_pareja_{unique_id}'
@@ -47,16 +52,16 @@ async def save_image(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error reading uploaded file: {e}")
 
-    # Preparar content settings como dict (upload_bytes_to_blob_storage acepta dict)
+    # Preparar content settings como dict (upload_stream acepta dict)
     content_settings = {"content_type": file.content_type}
 
     try:
-        file_id, public_url = upload_bytes_to_blob_storage(
-            video_content=content,
+        file_id, public_url = await storage.upload_stream(
+            content,
             content_settings=content_settings,
             filename=filename,
             folder=unique_id,
-            generate_sas=False
+            generate_sas=False,
         )
     except HTTPException:
         raise
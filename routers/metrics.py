@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from core.deps import get_render_metrics, get_http_clients, get_runway_dispatcher, get_container
+from core.container import Container
+from core.metrics import RenderMetrics
+from core.http_clients import HttpClients
+from services.runway_service import RunwayDispatcher
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(
+    render_metrics: RenderMetrics = Depends(get_render_metrics),
+    http: HttpClients = Depends(get_http_clients),
+    runway: RunwayDispatcher = Depends(get_runway_dispatcher),
+    container: Container = Depends(get_container),
+):
+    """
+    Histogramas por etapa del render, reutilización de conexiones HTTP, cola de Runway
+    y tiempos de arranque de las dependencias, en formato de texto de Prometheus.
+    """
+    return PlainTextResponse(render_metrics.render() + http.render() + runway.render() + container.render(),
+                             media_type="text/plain; version=0.0.4")
@@ -1,9 +1,10 @@
 import os
 from typing import Optional
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Depends
 from pydantic import BaseModel, constr
-import httpx
 from core.config import settings
+from core.deps import get_http_clients
+from core.http_clients import HttpClients
 
 WHATSAPP_TOKEN = settings.WHATSAPP_TOKEN
 PHONE_NUMBER_ID = settings.WHATSAPP_PHONE_NUMBER_ID
@@ -28,7 +29,7 @@ def ensure_e164(msisdn: str) -> str:
 router = APIRouter(prefix="/api")
 
 @router.post("/whatsapp/send")
-async def send_whatsapp(req: SendMessageReq):
+async def send_whatsapp(req: SendMessageReq, http: HttpClients = Depends(get_http_clients)):
 
     print("Enviando WhatsApp a", req.to)
     
@@ -68,9 +69,8 @@ async def send_whatsapp(req: SendMessageReq):
             }
         }"""
 
-    async with httpx.AsyncClient(timeout=15) as client:
-        r = await client.post(API_URL, headers=headers, json=payload)
-        if r.status_code >= 400:
-            # WhatsApp devuelve errores útiles en JSON
-            raise HTTPException(status_code=r.status_code, detail=r.text)
-        return r.json()
\ No newline at end of file
+    r = await http.httpx.post(API_URL, headers=headers, json=payload, timeout=15)
+    if r.status_code >= 400:
+        # WhatsApp devuelve errores útiles en JSON
+        raise HTTPException(status_code=r.status_code, detail=r.text)
+    return r.json()
\ No newline at end of file
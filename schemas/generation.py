@@ -29,6 +29,8 @@ class CartelRequest(BaseModel):
     nombre2: str
     image_url: str
     demo: bool
+    # True: genera en Runway aunque la misma imagen ya esté en caché
+    bypass_cache: bool = False
 
 class PolaroidImgRequest(BaseModel):
     key: str
@@ -40,6 +42,17 @@ class ParejaVidRequest(BaseModel):
     id: str
     image_url: str
     demo: bool
+    bypass_cache: bool = False
+
+class VideosRequest(BaseModel):
+    # Cartel y pareja a la vez (/api/create_videos)
+    id: str
+    nombre1: str
+    nombre2: str
+    cartel_image_url: str
+    pareja_image_url: str
+    demo: bool
+    bypass_cache: bool = False
 
 class VideoFinalRequest(BaseModel):
     id: str
@@ -50,6 +63,27 @@ class VideoFinalRequest(BaseModel):
     cartel_video: str
     pareja_video: str
     isImage: bool
+    # True: encola el render y devuelve job_id al momento
+    async_job: bool = False
+    # Nombre de un perfil de Settings.ENCODING_PROFILES (None = DEFAULT_ENCODING_PROFILE)
+    encoding_profile: Optional[str] = None
+
+class StageTiming(BaseModel):
+    stage: str                  # download_cartel | open_clips | encode | upload ...
+    seconds: float
+    bytes: Optional[int] = None
+    frames: Optional[int] = None
+
+class RenderJobStatus(BaseModel):
+    id: str
+    status: str                 # queued | running | done | failed
+    stage: str
+    progress: float
+    video_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    timings: list[StageTiming] = []
 
 class EmailRequest(BaseModel):
     to_email: str
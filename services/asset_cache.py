@@ -0,0 +1,206 @@
+import os, uuid, hashlib
+from typing import Optional
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+
+def _digest(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class AssetWriter:
+    """
+    Escritura incremental de un blob en la caché (para subidas por streaming):
+    write() por trozos, commit() al terminar la subida, abort() si falla.
+    Como put_bytes, nunca lanza: si algo va mal el blob simplemente no queda en caché.
+    """
+
+    def __init__(self, cache: "AssetCache", key: str):
+        self._cache = cache
+        self._key = key
+        self._sha = hashlib.sha256()
+        self._size = 0
+        self._tmp = os.path.join(cache._objects, f".{os.getpid()}-{uuid.uuid4().hex}.tmp")
+        try:
+            self._f = open(self._tmp, "wb")
+        except OSError as e:
+            logger.warning(f"AssetCache: no se pudo abrir {key}: {e}")
+            self._f = None
+
+    def write(self, data: bytes):
+        if self._f is None:
+            return
+        self._size += len(data)
+        if self._size > self._cache.max_bytes:
+            # No cabría: se descarta sin seguir escribiendo
+            self.abort()
+            return
+        try:
+            self._sha.update(data)
+            self._f.write(data)
+        except OSError as e:
+            logger.warning(f"AssetCache: no se pudo escribir {self._key}: {e}")
+            self.abort()
+
+    def commit(self):
+        if self._f is None:
+            return
+        try:
+            self._f.close()
+            self._f = None
+            self._cache._link(self._key, self._sha.hexdigest(), self._tmp)
+        except OSError as e:
+            logger.warning(f"AssetCache: no se pudo guardar {self._key}: {e}")
+            self.abort()
+
+    def abort(self):
+        if self._f is not None:
+            try:
+                self._f.close()
+            except OSError:
+                pass
+            self._f = None
+        try:
+            if os.path.exists(self._tmp): os.remove(self._tmp)
+        except OSError:
+            pass
+
+
+class AssetCache:
+    """
+    Caché local write-through de los blobs que acabamos de subir (vídeos de Runway,
+    imágenes de pareja), para que generate_final_video no los vuelva a bajar.
+
+    Direccionada por contenido: objects/<sha256 del contenido> guarda los bytes y
+    refs/<sha256 de la ruta del blob> apunta al objeto. Todo se publica con rename
+    atómico, así que varios workers pueden compartir el directorio. El mtime de cada
+    objeto es su último uso: al pasar de max_bytes se borran los más antiguos (LRU).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._objects = os.path.join(cache_dir, "objects")
+        self._refs = os.path.join(cache_dir, "refs")
+        if self.enabled:
+            os.makedirs(self._objects, exist_ok=True)
+            os.makedirs(self._refs, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self._refs, _digest(key))
+
+    def _publish(self, tmp: str, dest: str):
+        try:
+            os.replace(tmp, dest)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _link(self, key: str, sha: str, tmp: str):
+        """Publica el fichero tmp como objeto `sha` (o lo descarta si ya existe) y apunta `key` a él."""
+        obj = os.path.join(self._objects, sha)
+        if os.path.exists(obj):
+            os.remove(tmp)
+            os.utime(obj)
+        else:
+            self._publish(tmp, obj)
+        ref = self._ref_path(key)
+        tmp = f"{ref}.{os.getpid()}-{uuid.uuid4().hex[:6]}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(sha)
+        self._publish(tmp, ref)
+        self._evict()
+
+    def put_bytes(self, key: str, data: bytes):
+        """Guarda data como contenido del blob `key`. Nunca falla: la caché es opcional."""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        writer = self.writer(key)
+        writer.write(data)
+        writer.commit()
+
+    def writer(self, key: str) -> Optional[AssetWriter]:
+        """AssetWriter para ir guardando el blob `key` por trozos, o None si la caché está desactivada."""
+        return AssetWriter(self, key) if self.enabled else None
+
+    def get(self, key: str) -> Optional[str]:
+        """Ruta del objeto en caché para el blob `key`, o None. Marca el objeto como usado."""
+        if not self.enabled:
+            return None
+        ref = self._ref_path(key)
+        try:
+            with open(ref, "r", encoding="utf-8") as f:
+                obj = os.path.join(self._objects, f.read().strip())
+            os.utime(obj)
+            return obj
+        except FileNotFoundError:
+            # Sin ref, o el objeto ya fue desalojado: la ref huérfana sobra
+            if os.path.exists(ref):
+                try:
+                    os.remove(ref)
+                except OSError:
+                    pass
+            return None
+        except OSError as e:
+            logger.warning(f"AssetCache: error leyendo {key}: {e}")
+            return None
+
+    def copy_to(self, key: str, dest_path: str) -> bool:
+        """
+        Materializa el blob `key` en dest_path (hardlink si se puede, si no copia).
+        Quien lo recibe puede borrarlo sin afectar a la caché. False si no está.
+        """
+        obj = self.get(key)
+        if obj is None:
+            return False
+        try:
+            try:
+                os.link(obj, dest_path)
+            except OSError:
+                # Otro sistema de ficheros (o sin soporte de hardlinks)
+                with open(obj, "rb") as src, open(dest_path, "wb") as dst:
+                    while chunk := src.read(1024 * 1024):
+                        dst.write(chunk)
+            return True
+        except OSError as e:
+            # Desalojado entre get() y el link
+            logger.warning(f"AssetCache: no se pudo copiar {key}: {e}")
+            try:
+                if os.path.exists(dest_path): os.remove(dest_path)
+            except OSError:
+                pass
+            return False
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self._objects) as it:
+            for e in it:
+                if e.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                logger.info(f"AssetCache: desalojado {os.path.basename(path)} ({size} bytes)")
+            except FileNotFoundError:
+                total -= size
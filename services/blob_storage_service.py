@@ -0,0 +1,399 @@
+import os
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
+from azure.core import MatchConditions
+from azure.storage.blob import ContentSettings
+from azure.storage.blob.aio import BlobServiceClient
+from fastapi import HTTPException
+from services.content_index import ContentIndex
+from services.sas_manager import BlobSasSigner, SasManager
+from services.storage import StorageBackend, UploadData, _content_settings
+from utils.blob_storage import upload_stream_to_blob_storage
+import logging
+
+if TYPE_CHECKING:
+    from services.asset_cache import AssetCache
+
+logger = logging.getLogger("video_generation_app")
+
+# Metadato con el SHA-256 del contenido, en los blobs cuyo hash se conoce antes de subirlos
+HASH_METADATA = "sha256"
+
+
+def _managed_identity_credential():
+    # azure-identity solo hace falta sin connection string (managed identity / Entra ID)
+    try:
+        from azure.identity.aio import DefaultAzureCredential
+    except ImportError:
+        raise HTTPException(status_code=500, detail="AZURE_STORAGE_ACCOUNT_URL requires azure-identity")
+    return DefaultAzureCredential()
+
+
+class _ContentDigest:
+    """SHA-256 y tamaño de lo que se va subiendo (para ContentIndex)."""
+
+    def __init__(self):
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk: bytes):
+        self._sha.update(chunk)
+        self.size += len(chunk)
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+
+def _file_digest(file_path: str) -> _ContentDigest:
+    digest = _ContentDigest()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(4 * 1024 * 1024):
+            digest.update(chunk)
+    return digest
+
+
+@dataclass
+class AzureBlobSink:
+    """
+    Subida síncrona por bloques para los procesos de render (picklable). Lleva el
+    firmante de SasManager (la clave ya obtenida por el proceso de la app): el hijo
+    firma el SAS del blob al terminar, sin pedir nada a Azure.
+    """
+    connection_string: str
+    container: str
+    signer: Optional[BlobSasSigner] = None
+
+    def upload_chunks(self, chunks: Iterable[bytes], filename: str, folder: str = "",
+                      content_settings=None, generate_sas: bool = False) -> Tuple[str, str]:
+        return upload_stream_to_blob_storage(
+            chunks=chunks, content_settings=_content_settings(content_settings), filename=filename, folder=folder,
+            generate_sas=generate_sas, connection_string=self.connection_string, container=self.container,
+            signer=self.signer,
+        )
+
+
+class BlobStorageService(StorageBackend):
+    """
+    Acceso a AZURE_BLOB_CONTAINER con azure.storage.blob.aio: un único
+    BlobServiceClient por proceso (y con él su pool de conexiones), creado en
+    el primer uso dentro del event loop de la app y cerrado en el lifespan.
+    Con connection string se autentica con ella; si no, con account_url y
+    DefaultAzureCredential (managed identity).
+
+    Las subidas dejan una copia en `cache` (AssetCache) para que el vídeo final
+    no vuelva a bajar lo que acabamos de subir; download_to_path la consulta antes.
+    Las URLs con generate_sas llevan un SAS de lectura de ese blob firmado por `sas`.
+
+    Con `index` (ContentIndex) cada subida guarda el SHA-256 de su contenido; si
+    llega otra vez el mismo contenido (bytes o fichero, que se pueden resumir
+    antes de subir) se copia dentro de Azure desde el blob que ya lo tiene.
+    """
+
+    def __init__(
+        self,
+        connection_string: Optional[str],
+        container: str,
+        account_key: Optional[str] = None,
+        max_single_put_size: int = 8 * 1024 * 1024,
+        max_block_size: int = 4 * 1024 * 1024,
+        max_concurrency: int = 4,
+        cache: Optional["AssetCache"] = None,
+        account_url: Optional[str] = None,
+        sas: Optional[SasManager] = None,
+        index: Optional[ContentIndex] = None,
+    ):
+        self.connection_string = connection_string
+        self.account_url = account_url
+        self.container = container
+        self.max_single_put_size = max_single_put_size
+        self.max_block_size = max_block_size
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.sas = sas or SasManager(container, account_key=account_key)
+        self.index = index if index is not None and index.enabled else None
+        self._service: Optional[BlobServiceClient] = None
+        self._credential = None
+
+    @property
+    def service(self) -> BlobServiceClient:
+        if self._service is None:
+            kwargs = {"max_single_put_size": self.max_single_put_size, "max_block_size": self.max_block_size}
+            if self.connection_string:
+                self._service = BlobServiceClient.from_connection_string(self.connection_string, **kwargs)
+            elif self.account_url:
+                self._credential = _managed_identity_credential()
+                self._service = BlobServiceClient(self.account_url, credential=self._credential, **kwargs)
+            else:
+                raise HTTPException(status_code=500, detail="Missing AZURE_STORAGE_CONNECTION_STRING")
+        return self._service
+
+    async def close(self):
+        if self._service is not None:
+            await self._service.close()
+            self._service = None
+        if self._credential is not None:
+            await self._credential.close()
+            self._credential = None
+
+    async def sync_sink(self) -> Optional[AzureBlobSink]:
+        # Sin connection string (managed identity) el hijo no puede autenticarse:
+        # RenderExecutor renderiza a fichero y sube desde aquí
+        if not self.connection_string:
+            return None
+        return AzureBlobSink(self.connection_string, self.container, await self.sas.signer(self.service))
+
+    def cache_key(self, blob_name: str) -> str:
+        return f"{self.container}/{blob_name}"
+
+    def url(self, blob_name: str, sas_token: Optional[str] = None) -> str:
+        public_url = f"{self.service.url}{self.container}/{blob_name}"
+        return f"{public_url}?{sas_token}" if sas_token else public_url
+
+    async def _public_url(self, blob_name: str, generate_sas: bool) -> str:
+        return self.url(blob_name, await self.sas.sign(self.service, blob_name) if generate_sas else None)
+
+    def own_blob_name(self, url: str) -> Optional[str]:
+        """
+        Si la URL apunta a un blob de nuestra cuenta y contenedor devuelve el nombre
+        del blob (sin SAS ni query); si no, o si no hay cuenta configurada, None.
+        """
+        if not (self.connection_string or self.account_url) or not url:
+            return None
+        try:
+            service = urlparse(self.service.url)
+        except (ValueError, HTTPException):
+            return None
+        parsed = urlparse(url)
+        if parsed.hostname is None or parsed.hostname.lower() != (service.hostname or "").lower():
+            return None
+        # Con Azurite/emulador la cuenta va en la ruta (/devstoreaccount1/): forma parte del prefijo
+        prefix = f"{service.path.rstrip('/')}/{self.container}/"
+        if not parsed.path.startswith(prefix):
+            return None
+        blob_name = unquote(parsed.path[len(prefix):])
+        return blob_name or None
+
+    async def upload_stream(
+        self,
+        data: UploadData,
+        filename: str,
+        folder: str = "",
+        content_settings: Union[ContentSettings, dict, str, None] = None,
+        generate_sas: bool = False,
+        length: Optional[int] = None,
+    ) -> Tuple[str, str]:
+        """
+        Sube bytes o un iterable (síncrono o asíncrono) de trozos y devuelve
+        (file_id, public_url). Hasta max_single_put_size va en una sola petición;
+        por encima, en bloques de max_block_size con max_concurrency en vuelo
+        (el iterable se consume a medida que hay hueco, así que la memoria queda
+        acotada). Si el iterable falla no se hace commit: el blob no cambia.
+
+        Con índice, bytes que ya estén subidos se copian dentro de Azure en vez de
+        subirlos. Un iterable solo se indexa (su hash sirve a subidas posteriores):
+        el hash se conoce al acabar, con todo ya enviado, y una copia costaría lo
+        mismo que el commit. Los bytes llevan además su hash en los metadatos (content_hash).
+        """
+        cs = _content_settings(content_settings)
+        blob_name = self.blob_name(filename, folder, cs.content_type)
+        is_bytes = isinstance(data, (bytes, bytearray))
+        digest = None
+        if is_bytes:
+            digest = _ContentDigest()
+            await asyncio.to_thread(digest.update, bytes(data))
+            if self.index is not None and await self._copy_existing(digest, blob_name, cs):
+                if self.cache is not None:
+                    await asyncio.to_thread(self.cache.put_bytes, self.cache_key(blob_name), bytes(data))
+                return filename, await self._public_url(blob_name, generate_sas)
+        elif self.index is not None:
+            digest = _ContentDigest()
+        writer = self.cache.writer(self.cache_key(blob_name)) if self.cache is not None else None
+
+        if not is_bytes and (writer is not None or digest is not None):
+            data = self._tee(data, digest, writer)
+        try:
+            blob_client = self.service.get_blob_client(container=self.container, blob=blob_name)
+            resp = await blob_client.upload_blob(
+                data,
+                length=length,
+                overwrite=True,
+                content_settings=cs,
+                metadata={HASH_METADATA: digest.hexdigest()} if is_bytes else None,
+                max_concurrency=self.max_concurrency,
+            )
+            if writer is not None:
+                if is_bytes:
+                    await asyncio.to_thread(writer.write, bytes(data))
+                await asyncio.to_thread(writer.commit)
+                writer = None
+            if digest is not None:
+                self._index(digest, blob_name, resp, cs)
+            return filename, await self._public_url(blob_name, generate_sas)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error uploading to blob storage: {str(e)}")
+        finally:
+            if writer is not None:
+                writer.abort()
+
+    @staticmethod
+    def _consume(chunk: bytes, digest: Optional[_ContentDigest], writer):
+        if digest is not None:
+            digest.update(chunk)
+        if writer is not None:
+            writer.write(chunk)
+
+    @classmethod
+    async def _tee(cls, data, digest, writer):
+        if hasattr(data, "__aiter__"):
+            async for chunk in data:
+                await asyncio.to_thread(cls._consume, chunk, digest, writer)
+                yield chunk
+        else:
+            for chunk in data:
+                await asyncio.to_thread(cls._consume, chunk, digest, writer)
+                yield chunk
+
+    def _index(self, digest: _ContentDigest, blob_name: str, resp: dict, cs: ContentSettings):
+        if self.index is None:
+            return
+        self.index.put(digest.hexdigest(), blob_name, (resp or {}).get("etag"), cs.content_type, digest.size)
+
+    async def _copy_existing(self, digest: _ContentDigest, blob_name: str, cs: ContentSettings) -> bool:
+        """
+        Si el índice ya tiene este contenido en un blob, lo pone en blob_name sin
+        volver a subirlo: nada si es el mismo blob y no ha cambiado, o Put Blob From
+        URL (copia síncrona dentro de Azure) con source_if_match del ETag indexado.
+        False si no hay entrada o ya no vale (blob borrado o modificado): hay que subir.
+        """
+        sha = digest.hexdigest()
+        entry = self.index.get(sha)
+        if entry is None:
+            return False
+        try:
+            dst = self.service.get_blob_client(container=self.container, blob=blob_name)
+            if entry["blob"] == blob_name:
+                props = await dst.get_blob_properties()
+                if props.etag == entry["etag"] and props.content_settings.content_type == cs.content_type:
+                    logger.info(f"Contenido ya subido en {blob_name}: no se vuelve a subir")
+                    return True
+                raise ValueError("el blob ha cambiado")
+            source = self.url(entry["blob"], await self.sas.sign(self.service, entry["blob"]))
+            resp = await dst.upload_blob_from_url(
+                source,
+                overwrite=True,
+                content_settings=cs,
+                metadata={HASH_METADATA: sha},
+                include_source_blob_properties=False,
+                source_etag=entry["etag"],
+                source_match_condition=MatchConditions.IfNotModified,
+            )
+        except Exception as e:
+            logger.info(f"Entrada de deduplicación de {entry['blob']} descartada ({e}); se sube {blob_name}")
+            self.index.discard(sha)
+            return False
+        logger.info(f"Contenido ya subido en {entry['blob']}: copiado a {blob_name} dentro de Azure")
+        self._index(digest, blob_name, resp, cs)
+        return True
+
+    async def upload_file(
+        self,
+        file_path: str,
+        filename: str,
+        folder: str = "",
+        content_settings: Union[ContentSettings, dict, str, None] = None,
+        generate_sas: bool = False,
+    ) -> Tuple[str, str]:
+        """
+        Sube un fichero local (bloques en paralelo si pasa de max_single_put_size),
+        con su hash en los metadatos. Con índice, si ese contenido ya está subido se
+        copia dentro de Azure.
+        """
+        cs = _content_settings(content_settings)
+        blob_name = self.blob_name(filename, folder, cs.content_type)
+        digest = await asyncio.to_thread(_file_digest, file_path)
+        try:
+            if self.index is None or not await self._copy_existing(digest, blob_name, cs):
+                blob_client = self.service.get_blob_client(container=self.container, blob=blob_name)
+                with open(file_path, "rb") as f:
+                    resp = await blob_client.upload_blob(
+                        f,
+                        length=os.path.getsize(file_path),
+                        overwrite=True,
+                        content_settings=cs,
+                        metadata={HASH_METADATA: digest.hexdigest()},
+                        max_concurrency=self.max_concurrency,
+                    )
+                self._index(digest, blob_name, resp, cs)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error uploading to blob storage: {str(e)}")
+        if self.cache is not None:
+            await asyncio.to_thread(self._cache_file, blob_name, file_path)
+        return filename, await self._public_url(blob_name, generate_sas)
+
+    def _cache_file(self, blob_name: str, file_path: str):
+        writer = self.cache.writer(self.cache_key(blob_name))
+        if writer is None:
+            return
+        with open(file_path, "rb") as f:
+            while chunk := f.read(self.max_block_size):
+                writer.write(chunk)
+        writer.commit()
+
+    async def copy_from_url(self, url: str, filename: str, folder: str = "",
+                            content_settings: Union[ContentSettings, dict, str, None] = None,
+                            generate_sas: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        Put Blob From URL: Azure lee el origen (p.ej. los vídeos demo de otra cuenta)
+        y lo escribe en el blob sin que los bytes pasen por aquí. None si Azure no
+        puede leerlo (origen privado, demasiado grande...): hay que copiarlo en streaming.
+        """
+        cs = _content_settings(content_settings)
+        blob_name = self.blob_name(filename, folder, cs.content_type)
+        try:
+            dst = self.service.get_blob_client(container=self.container, blob=blob_name)
+            await dst.upload_blob_from_url(url, overwrite=True, content_settings=cs,
+                                           include_source_blob_properties=False)
+        except Exception as e:
+            logger.warning(f"Copia en servidor de {url} a {blob_name} falló ({e})")
+            return None
+        logger.info(f"{url} copiado a {blob_name} dentro de Azure")
+        return filename, await self._public_url(blob_name, generate_sas)
+
+    async def content_hash(self, blob_name: str) -> Optional[str]:
+        """El hash de los metadatos con un HEAD; None si el blob no lo tiene (subido en streaming)."""
+        try:
+            props = await self.service.get_blob_client(container=self.container, blob=blob_name).get_blob_properties()
+        except Exception as e:
+            logger.info(f"Sin propiedades de {blob_name} ({e})")
+            return None
+        return (props.metadata or {}).get(HASH_METADATA)
+
+    async def download_to_path(self, blob_name: str, file_path: str) -> Optional[str]:
+        """
+        Descarga el blob a file_path: de la caché local si está, si no con
+        download_blob en paralelo (max_concurrency rangos, reintentos del SDK).
+        Devuelve el Content-Type (None si vino de la caché). Si falla, borra el
+        fichero parcial y relanza la excepción del SDK.
+        """
+        if self.cache is not None and await asyncio.to_thread(self.cache.copy_to, self.cache_key(blob_name), file_path):
+            logger.info(f"Blob {blob_name} servido desde la caché local")
+            return None
+        blob_client = self.service.get_blob_client(container=self.container, blob=blob_name)
+        try:
+            downloader = await blob_client.download_blob(max_concurrency=self.max_concurrency)
+            with open(file_path, "wb") as f:
+                await downloader.readinto(f)
+            return downloader.properties.content_settings.content_type
+        except BaseException:
+            try:
+                if os.path.exists(file_path): os.remove(file_path)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class ScreenCompositor:
+    """
+    Mezcla "screen" con máscara en aritmética entera (uint8/uint16).
+
+    out = bg + (screen(bg, fg) - bg) * a
+        = bg + fg * a * (255 - bg) / 255²
+
+    Se premultiplica fg por la máscara (w = fg * a / 255, un solo plano uint8) y
+    el resto se calcula in-place sobre buffers reservados una vez por render:
+    ningún temporal float32 de tamaño frame completo.
+
+    El array devuelto por blend() es un buffer reutilizado: se sobrescribe en la
+    siguiente llamada (el writer de moviepy lo consume antes de pedir otro frame).
+    """
+
+    def __init__(self):
+        self._shape = None
+
+    def _ensure(self, shape):
+        if self._shape == shape:
+            return
+        h, w = shape[:2]
+        self._acc = np.empty(shape, dtype=np.uint16)
+        self._tmp = np.empty(shape, dtype=np.uint16)
+        self._w = np.empty(shape, dtype=np.uint8)
+        self._out = np.empty(shape, dtype=np.uint8)
+        self._alpha = np.empty((h, w), dtype=np.uint8)
+        self._alpha_f = np.empty((h, w), dtype=np.float32)
+        self._shape = shape
+
+    def _div255(self, x):
+        # round(x / 255) exacto para 0 <= x <= 255 * 255, sin salir de uint16
+        x += 128
+        np.right_shift(x, 8, out=self._tmp)
+        x += self._tmp
+        x >>= 8
+        return x
+
+    def alpha_from_mask(self, mask) -> np.ndarray:
+        """Máscara float [0, 1] de moviepy -> alpha uint8 (buffer reutilizado)."""
+        self._ensure(mask.shape + (3,))
+        np.multiply(mask, 255.0, out=self._alpha_f)
+        self._alpha_f += 0.5
+        np.copyto(self._alpha, self._alpha_f, casting="unsafe")
+        return self._alpha
+
+    def premultiply(self, fg, alpha=None) -> np.ndarray:
+        """w = round(fg * alpha / 255); sin alpha el overlay es opaco y w = fg."""
+        if alpha is None:
+            return fg
+        self._ensure(fg.shape)
+        acc = np.multiply(fg, alpha[..., None], out=self._acc, dtype=np.uint16)
+        np.copyto(self._w, self._div255(acc), casting="unsafe")
+        return self._w
+
+    def blend_premultiplied(self, bg, w) -> np.ndarray:
+        self._ensure(bg.shape)
+        acc = np.subtract(255, bg, out=self._acc, dtype=np.uint16)
+        acc *= w
+        self._div255(acc)
+        # bg + w * (255 - bg) / 255 <= 255: el cast a uint8 no desborda
+        return np.add(bg, acc, out=self._out, casting="unsafe")
+
+    def blend(self, bg, fg, alpha=None) -> np.ndarray:
+        bg = np.asarray(bg, dtype=np.uint8)
+        fg = np.asarray(fg, dtype=np.uint8)
+        self._ensure(bg.shape)
+        return self.blend_premultiplied(bg, self.premultiply(fg, alpha))
@@ -0,0 +1,94 @@
+import os, uuid, json
+from typing import Optional
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+# Cada cuántas escrituras se comprueba si hay que podar el índice
+PRUNE_EVERY = 256
+
+
+def _mtime(entry: os.DirEntry) -> float:
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+class ContentIndex:
+    """
+    Índice SHA-256 del contenido -> último blob subido con ese contenido, para que
+    BlobStorageService convierta una subida repetida (reintentos del front, la misma
+    imagen otra vez) en una copia dentro de Azure. Solo se ahorran las subidas de
+    bytes y ficheros, cuyo hash se calcula antes de subir; las de un iterable
+    (p.ej. transfer_to_blob) se indexan pero siempre se suben.
+
+    Un JSON por hash en index_dir, publicado con rename atómico como AssetCache, así
+    que lo comparten los workers. Guarda el ETag del blob: la copia se hace con
+    source_if_match y, si el blob cambió o ya no existe, la entrada se descarta.
+    Al pasar de max_entries se borran las más antiguas (max_entries=0 lo desactiva).
+    """
+
+    def __init__(self, index_dir: str, max_entries: int = 100_000):
+        self.index_dir = index_dir
+        self.max_entries = max_entries
+        self._puts = 0
+        if self.enabled:
+            os.makedirs(index_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.index_dir, sha)
+
+    def get(self, sha: str) -> Optional[dict]:
+        """{"blob", "etag", "content_type", "size"} o None."""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(sha), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, sha: str, blob: str, etag: Optional[str], content_type: Optional[str], size: int):
+        """Como AssetCache.put_bytes, nunca lanza: sin índice solo se pierde la deduplicación."""
+        if not self.enabled or not etag:
+            return
+        tmp = os.path.join(self.index_dir, f".{os.getpid()}-{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"blob": blob, "etag": etag, "content_type": content_type, "size": size}, f)
+            os.replace(tmp, self._path(sha))
+        except OSError as e:
+            logger.warning(f"ContentIndex: no se pudo guardar {blob}: {e}")
+            try:
+                if os.path.exists(tmp): os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._puts += 1
+        if self._puts % PRUNE_EVERY == 0:
+            self._prune()
+
+    def discard(self, sha: str):
+        try:
+            os.remove(self._path(sha))
+        except OSError:
+            pass
+
+    def _prune(self):
+        try:
+            entries = [e for e in os.scandir(self.index_dir) if e.is_file() and not e.name.startswith(".")]
+        except OSError:
+            return
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        for entry in sorted(entries, key=_mtime)[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
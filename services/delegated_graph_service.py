@@ -13,6 +13,7 @@ class DelegatedGraphService:
         scopes: list[str],
         token_cache_path: Optional[str] = None,
         client_secret: Optional[str] = None,
+        session: Optional[requests.Session] = None,
     ):
         """
         Initialize the DelegatedGraphService with OAuth2 client configuration.
@@ -23,6 +24,7 @@ class DelegatedGraphService:
             scopes: List of Microsoft Graph API scopes (e.g., ['Mail.Send', 'User.Read'])
             token_cache_path: Optional path to store the token cache
             client_secret: Optional client secret for confidential client flow
+            session: Optional shared requests.Session (keep-alive) for Graph and MSAL calls
         """
         self.client_id = client_id
         self.authority = authority
@@ -31,6 +33,7 @@ class DelegatedGraphService:
             else [s for s in str(scopes or "").replace(",", " ").split() if s]
         )
         self.client_secret = client_secret
+        self.session = session or requests.Session()
         self.token_cache = msal.SerializableTokenCache()
         self.token_cache_path = token_cache_path or "./.msal_token_cache.json"
         
@@ -45,14 +48,14 @@ class DelegatedGraphService:
         
         # Initialize the MSAL application
         if self.client_secret:
-            print("client secret service", self.client_secret)
             # Use ConfidentialClientApplication for server-side flows
             self.scopes = ["https://graph.microsoft.com/.default"]
             self.app = msal.ConfidentialClientApplication(
                 client_id=client_id,
                 client_credential=client_secret,
                 authority=authority,
-                token_cache=self.token_cache
+                token_cache=self.token_cache,
+                http_client=self.session,
             )
         else:
             # Use PublicClientApplication for device code flow
@@ -62,7 +65,8 @@ class DelegatedGraphService:
             self.app = msal.PublicClientApplication(
                 client_id=client_id,
                 authority=authority,
-                token_cache=self.token_cache
+                token_cache=self.token_cache,
+                http_client=self.session,
             )
     
     def _save_token_cache(self):
@@ -279,7 +283,7 @@ PASOS PARA SOLUCIONAR EL PROBLEMA:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(
+            response = self.session.post(
                 endpoint,
                 headers=headers,
                 json=email_msg,
@@ -320,7 +324,7 @@ PASOS PARA SOLUCIONAR EL PROBLEMA:
             # Delegado: hay usuario -> /me
             url = "https://graph.microsoft.com/v1.0/me"
 
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = self.session.get(url, headers=headers, timeout=30)
         if resp.status_code != 200:
             raise Exception(f"Failed to get user info: {resp.status_code} - {resp.text}")
         return resp.json()
@@ -0,0 +1,179 @@
+import os
+import math
+import subprocess
+from typing import Optional
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from PIL import Image
+from core.metrics import Timings
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+
+def _even(n: float) -> int:
+    # yuv420p exige dimensiones pares
+    return max(2, int(round(n / 2.0)) * 2)
+
+
+def _probe(path: str, image: bool) -> tuple[tuple[int, int], float]:
+    if image:
+        # Las imágenes no tienen duración: la fija el timeline
+        with Image.open(path) as img:
+            return img.size, 0.0
+    info = ffmpeg_parse_infos(path)
+    w, h = info["video_size"]
+    return (int(w), int(h)), float(info.get("video_duration") or info["duration"])
+
+
+def build_ffmpeg_command(
+    out_path: str,
+    segments: list[dict],
+    overlay_path: Optional[str],
+    audio_path: Optional[str],
+    enc: dict,
+    fps: int,
+    movflags: str,
+) -> list[str]:
+    """
+    Construye un único comando ffmpeg con el timeline completo:
+    trim + scale/pad por segmento, concat, overlay en modo screen con su alpha
+    (blend=screen + maskedmerge), recorte del audio y encode.
+
+    Cada segmento es {"path", "start", "duration", "image", "size"}: se leen con
+    seek en la entrada (-ss/-t), así que solo se decodifica el rango usado.
+
+    Los frames de cada segmento se fijan sobre la rejilla global (t = i / fps),
+    igual que muestrea moviepy el clip concatenado, para que los cortes caigan
+    en el mismo frame con los dos motores.
+    """
+    height = min(seg["size"][1] for seg in segments)
+    widths = [_even(seg["size"][0] * height / seg["size"][1]) for seg in segments]
+    width = max(widths)
+    total = sum(seg["duration"] for seg in segments)
+    # moviepy escribe int(duration * fps) frames
+    total_frames = int(total * fps)
+
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"]
+    for seg in segments:
+        if seg["image"]:
+            cmd += ["-loop", "1", "-framerate", str(fps), "-t", f"{seg['duration']:.6f}", "-i", seg["path"]]
+        else:
+            if seg["start"]:
+                cmd += ["-ss", f"{seg['start']:.6f}"]
+            cmd += ["-t", f"{seg['duration']:.6f}", "-i", seg["path"]]
+
+    graph = []
+    labels = []
+    seg_start = 0.0
+    for i, (seg, w) in enumerate(zip(segments, widths)):
+        seg_end = seg_start + seg["duration"]
+        first = math.ceil(seg_start * fps - 1e-6)
+        last = min(math.ceil(seg_end * fps - 1e-6), total_frames)
+        n = max(last - first, 0)
+        # Igual que concatenate_videoclips(method="compose"): misma altura (lanczos, como
+        # resized() de moviepy), centrado en el lienzo.
+        # El segmento se coloca en su instante global, se muestrea en los frames
+        # first..last-1 y se rellena clonando el último si la fuente se queda corta.
+        # round=up: cada frame de la fuente vale desde su instante hacia delante, como
+        # en get_frame de moviepy (con round=down un segmento que no empieza en un frame
+        # exacto de la rejilla sale adelantado un frame)
+        graph.append(
+            f"[{i}:v]format=gbrp,scale={w}:{height}:flags=lanczos,setsar=1,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+            f"setpts=PTS-STARTPTS+{seg_start:.6f}/TB,fps={fps}:start_time={first / fps:.6f}:round=up,"
+            f"tpad=stop_mode=clone:stop={n},trim=end_frame={n},setpts=PTS-STARTPTS,format=gbrp[v{i}]"
+        )
+        labels.append(f"[v{i}]")
+        seg_start = seg_end
+    graph.append(f"{''.join(labels)}concat=n={len(segments)}:v=1:a=0,"
+                 f"settb=1/{fps},setpts=N[base]")
+
+    n_inputs = len(segments)
+    if overlay_path:
+        ov = n_inputs
+        cmd += ["-i", overlay_path]
+        n_inputs += 1
+        # with_duration() de moviepy congela el último frame: tpad clona hasta cubrir el timeline
+        graph += [
+            f"[{ov}:v]scale={width}:{height}:flags=lanczos,fps={fps},format=rgba,"
+            f"tpad=stop_mode=clone:stop_duration={total:.6f},"
+            # Misma base de tiempos que [base]: si no, blend duplica frames al sincronizar
+            f"trim=end_frame={total_frames},settb=1/{fps},setpts=N,split[ova][ovb]",
+            "[ova]format=gbrp[ovrgb]",
+            "[ovb]alphaextract,format=gbrp[ovmask]",
+            "[base]split[bg1][bg2]",
+            "[bg1][ovrgb]blend=all_mode=screen[scr]",
+            "[bg2][scr][ovmask]maskedmerge,format=yuv420p[vout]",
+        ]
+    else:
+        graph.append("[base]format=yuv420p[vout]")
+
+    maps = ["-map", "[vout]"]
+    if audio_path:
+        au = n_inputs
+        cmd += ["-i", audio_path]
+        graph.append(f"[{au}:a]atrim=0:{total:.6f},asetpts=PTS-STARTPTS[aout]")
+        maps += ["-map", "[aout]"]
+
+    cmd += ["-filter_complex", ";".join(graph)] + maps
+    cmd += ["-c:v", "libx264", "-preset", enc["preset"], "-crf", str(enc["crf"])]
+    if enc.get("tune"):
+        cmd += ["-tune", enc["tune"]]
+    if enc.get("threads"):
+        cmd += ["-threads", str(enc["threads"])]
+    cmd += ["-pix_fmt", "yuv420p", "-r", str(fps)]
+    if audio_path:
+        cmd += ["-c:a", "aac"]
+        if enc.get("audio_bitrate"):
+            cmd += ["-b:a", enc["audio_bitrate"]]
+    cmd += ["-movflags", movflags, "-f", "mp4", out_path]
+    return cmd
+
+
+def render_ffmpeg(
+    out_path: str,
+    timeline: list[tuple[str, float, Optional[float], bool]],
+    overlay_path: Optional[str],
+    audio_path: Optional[str],
+    enc: dict,
+    fps: int,
+    movflags: str,
+    timings: Optional[Timings] = None,
+):
+    """
+    Renderiza el timeline [(path, start, duration | None, es_imagen), ...] en un
+    solo subproceso ffmpeg. duration=None usa el clip entero.
+    Decode, escalado, overlay y encode van en el mismo proceso: solo hay spans
+    open_clips (probe) y encode.
+    """
+    timings = timings if timings is not None else Timings()
+    segments = []
+    with timings.span("open_clips") as rec:
+        for path, start, duration, image in timeline:
+            size, clip_duration = _probe(path, image)
+            segments.append({
+                "path": path,
+                "start": start,
+                "duration": duration if duration is not None else clip_duration - start,
+                "image": image,
+                "size": size,
+            })
+        rec["bytes"] = sum(os.path.getsize(seg["path"]) for seg in segments)
+    cmd = build_ffmpeg_command(
+        out_path,
+        segments,
+        overlay_path if overlay_path and os.path.exists(overlay_path) else None,
+        audio_path if audio_path and os.path.exists(audio_path) else None,
+        enc,
+        fps,
+        movflags,
+    )
+    logger.info(f'ffmpeg: render de {len(segments)} segmentos en un solo proceso')
+    with timings.span("encode") as rec:
+        rec["frames"] = int(sum(seg["duration"] for seg in segments) * fps)
+        proc = subprocess.run(cmd, capture_output=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg render falló: {proc.stderr.decode(errors='replace')[-2000:]}")
+        if os.path.isfile(out_path):
+            rec["bytes"] = os.path.getsize(out_path)
@@ -0,0 +1,169 @@
+import os, uuid, json, time, hashlib
+import asyncio
+from typing import Awaitable, Callable, Optional, Tuple
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+# Cada cuántas escrituras se comprueba si hay que podar la caché
+PRUNE_EVERY = 64
+
+Stored = Tuple[str, str]
+
+
+def generation_key(image_sha256: str, **params) -> str:
+    """SHA-256 del hash de la imagen y de los parámetros de la generación (prompt, modelo...)."""
+    h = hashlib.sha256(image_sha256.encode("ascii"))
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class _ProducerCancelled(Exception):
+    """La petición que generaba se canceló: las que la esperaban lo vuelven a intentar."""
+
+
+def _mtime(entry: os.DirEntry) -> float:
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+class GenerationCache:
+    """
+    Generaciones de Runway ya hechas: clave de generation_key() -> (file_id, URL
+    pública) del vídeo guardado en el almacén. Los reintentos, volver atrás en el
+    front o reeditar el cartel con la misma foto no vuelven a pagar ni esperar a Runway.
+
+    Un JSON por clave en cache_dir, publicado con rename atómico (lo comparten los
+    workers). Las entradas caducan a los `ttl` s; al pasar de max_entries se borran
+    las más antiguas. max_entries=0 la desactiva.
+
+    memoize() además agrupa las peticiones iguales que llegan mientras la primera
+    sigue generándose (dentro de este proceso): esperan a su resultado. Si la
+    primera se cancela (el cliente cortó la conexión), una de las que esperaban
+    pasa a generar en vez de cancelarse con ella.
+    """
+
+    def __init__(self, cache_dir: str, ttl: int = 7 * 24 * 3600, max_entries: int = 10_000):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._puts = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[Stored]:
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["created_at"] > self.ttl:
+            self.discard(key)
+            return None
+        return entry["file_id"], entry["url"]
+
+    def put(self, key: str, stored: Stored):
+        """Como ContentIndex.put, nunca lanza: sin caché solo se pierde la memoización."""
+        if not self.enabled:
+            return
+        file_id, url = stored
+        tmp = os.path.join(self.cache_dir, f".{os.getpid()}-{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"file_id": file_id, "url": url, "created_at": time.time()}, f)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            logger.warning(f"GenerationCache: no se pudo guardar {url}: {e}")
+            try:
+                if os.path.exists(tmp): os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._puts += 1
+        if self._puts % PRUNE_EVERY == 0:
+            self._prune()
+
+    def discard(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    async def memoize(self, key: Optional[str], produce: Callable[[], Awaitable[Stored]],
+                      bypass: bool = False) -> Stored:
+        """
+        Resultado guardado para `key` o, si no hay, el de produce() (que se guarda).
+        Sin clave o con la caché desactivada se llama siempre a produce(); bypass=True
+        no consulta la caché pero sí guarda el resultado nuevo.
+        """
+        if key is None or not self.enabled:
+            return await produce()
+        while not bypass:
+            stored = self.get(key)
+            if stored is not None:
+                self.hits += 1
+                logger.info(f"Generación de Runway en caché: {stored[1]}")
+                return stored
+            if key not in self._inflight:
+                break
+            try:
+                stored = await asyncio.shield(self._inflight[key])
+            except _ProducerCancelled:
+                continue
+            self.hits += 1
+            return stored
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            stored = await produce()
+        except asyncio.CancelledError:
+            # No future.cancel(): cancelaría también a los que esperan
+            future.set_exception(_ProducerCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Si nadie más la esperaba, que no avise de excepción sin recoger
+            future.exception()
+            raise
+        else:
+            self.put(key, stored)
+            future.set_result(stored)
+            return stored
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _prune(self):
+        now = time.time()
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.is_file() and not e.name.startswith(".")]
+        except OSError:
+            return
+        keep = []
+        for entry in entries:
+            if now - _mtime(entry) > self.ttl:
+                self.discard(entry.name)
+            else:
+                keep.append(entry)
+        excess = len(keep) - self.max_entries
+        if excess <= 0:
+            return
+        for entry in sorted(keep, key=_mtime)[:excess]:
+            self.discard(entry.name)
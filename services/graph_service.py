@@ -1,13 +1,17 @@
 import requests
+from typing import Optional
 from msal import ConfidentialClientApplication
 
 class GraphService:
-    def __init__(self, tenant_id: str, client_id: str, client_secret: str, user_email: str, graph_base: str):
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str, user_email: str, graph_base: str,
+                 session: Optional[requests.Session] = None):
         self.user_email = user_email
         self.graph_base = graph_base
+        self.session = session or requests.Session()
         self.app = ConfidentialClientApplication(client_id=client_id,
                                                  authority=f"https://login.microsoftonline.com/{tenant_id}",
-                                                 client_credential=client_secret)
+                                                 client_credential=client_secret,
+                                                 http_client=self.session)
         self.scope = ["https://graph.microsoft.com/.default"]
 
     def _token(self) -> str:
@@ -25,8 +29,8 @@ class GraphService:
             },
             "saveToSentItems": True,
         }
-        resp = requests.post(f"{self.graph_base}/users/{self.user_email}/sendMail",
-                             headers={"Authorization": f"Bearer {self._token()}", "Content-Type": "application/json"},
-                             json=payload, timeout=30)
+        resp = self.session.post(f"{self.graph_base}/users/{self.user_email}/sendMail",
+                                  headers={"Authorization": f"Bearer {self._token()}", "Content-Type": "application/json"},
+                                  json=payload, timeout=30)
         if resp.status_code not in (200, 202):
             raise RuntimeError(f"Graph sendMail falló: {resp.status_code} {resp.text}")
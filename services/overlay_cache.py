@@ -0,0 +1,101 @@
+import os, uuid, json, shutil, hashlib
+import numpy as np
+from moviepy import VideoFileClip
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+# Subir si cambia el formato del almacén en disco
+OVERLAY_STORE_VERSION = 1
+
+
+class OverlayFrames:
+    """
+    Frames del overlay ya decodificados y redimensionados, respaldados por
+    ficheros .npy mapeados en memoria (solo lectura). Todos los workers que
+    abren el mismo almacén comparten las páginas vía page cache.
+    """
+
+    def __init__(self, rgb: np.ndarray, alpha: np.ndarray, fps: int):
+        self.rgb = rgb          # [N, H, W, 3] uint8
+        self.alpha = alpha      # [N, H, W] uint8
+        self.fps = fps
+
+    def __len__(self):
+        return self.rgb.shape[0]
+
+    def frame(self, t: float) -> tuple[np.ndarray, np.ndarray]:
+        i = min(max(int(round(t * self.fps)), 0), len(self) - 1)
+        return self.rgb[i], self.alpha[i]
+
+
+def _store_key(overlay_path: str, size: tuple[int, int], n_frames: int, fps: int) -> str:
+    st = os.stat(overlay_path)
+    raw = f"v{OVERLAY_STORE_VERSION}|{os.path.abspath(overlay_path)}|{st.st_size}|{int(st.st_mtime)}|{size[0]}x{size[1]}|{n_frames}|{fps}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _open(store_dir: str, fps: int) -> OverlayFrames:
+    rgb = np.load(os.path.join(store_dir, "rgb.npy"), mmap_mode="r")
+    alpha = np.load(os.path.join(store_dir, "alpha.npy"), mmap_mode="r")
+    return OverlayFrames(rgb, alpha, fps)
+
+
+def load_overlay_frames(overlay_path: str, size: tuple[int, int], duration: float,
+                        cache_dir: str, fps: int) -> OverlayFrames:
+    """
+    Devuelve los frames del overlay para un tamaño y duración de timeline.
+    La primera vez decodifica con moviepy (mismo muestreo que el render:
+    t = i / fps, estirado a `duration` con with_duration) y publica el almacén
+    con un rename atómico; después es solo un np.load con mmap.
+    """
+    size = (int(size[0]), int(size[1]))
+    # Un frame extra: el último instante del timeline también tiene overlay
+    n_frames = int(duration * fps) + 1
+    key = _store_key(overlay_path, size, n_frames, fps)
+    store_dir = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(store_dir, "meta.json")):
+        return _open(store_dir, fps)
+
+    logger.info(f'Decodificando overlay {size[0]}x{size[1]}, {n_frames} frames')
+    os.makedirs(cache_dir, exist_ok=True)
+    build_dir = os.path.join(cache_dir, f".{key}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+    os.makedirs(build_dir)
+    clip = None
+    try:
+        clip = (VideoFileClip(overlay_path, has_mask=True)
+                .with_duration(duration)
+                .resized(size))
+        w, h = size
+        rgb = np.lib.format.open_memmap(os.path.join(build_dir, "rgb.npy"), mode="w+",
+                                        dtype=np.uint8, shape=(n_frames, h, w, 3))
+        alpha = np.lib.format.open_memmap(os.path.join(build_dir, "alpha.npy"), mode="w+",
+                                          dtype=np.uint8, shape=(n_frames, h, w))
+        for i in range(n_frames):
+            t = min(i / fps, duration)
+            rgb[i] = clip.get_frame(t)[..., :3]
+            if clip.mask is not None:
+                np.copyto(alpha[i], clip.mask.get_frame(t) * 255.0 + 0.5, casting="unsafe")
+            else:
+                alpha[i] = 255
+        rgb.flush()
+        alpha.flush()
+        del rgb, alpha
+        with open(os.path.join(build_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"overlay": os.path.abspath(overlay_path), "size": list(size),
+                       "frames": n_frames, "fps": fps}, f)
+        try:
+            os.rename(build_dir, store_dir)
+        except OSError:
+            # Otro worker lo publicó antes
+            shutil.rmtree(build_dir, ignore_errors=True)
+        return _open(store_dir, fps)
+    except Exception:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    finally:
+        if clip is not None:
+            try:
+                clip.close()
+            except:
+                pass
@@ -0,0 +1,118 @@
+import os
+import asyncio
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from services.video_service import VideoService
+from services.storage import StorageBackend
+from core.metrics import Timings
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+
+def _init_worker(memory_limit_mb: int):
+    # RLIMIT_DATA y no RLIMIT_AS: los mmap de solo lectura del overlay (caché
+    # compartida entre workers) no deben contar contra el límite
+    if memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def _compose_final(vs: VideoService, file_id: str, cartel: str, pareja: str, isImage: bool,
+                   profile: Optional[str], sink=None) -> tuple[str, list[dict]]:
+    # Los spans se miden en el proceso hijo y vuelven con el resultado
+    timings = Timings()
+    url = vs.compose_final(file_id, cartel, pareja, isImage, profile, timings, sink)
+    return url, timings.spans
+
+
+def _render_to_file(vs: VideoService, out_path: str, cartel: str, pareja: str, isImage: bool,
+                    profile: Optional[str]) -> list[dict]:
+    timings = Timings()
+    vs.render_to_file(out_path, cartel, pareja, isImage, profile=profile, timings=timings)
+    return timings.spans
+
+
+class RenderExecutor:
+    """
+    Ejecuta los renders (CPU) en un ProcessPoolExecutor acotado para no
+    bloquear el event loop del worker de uvicorn.
+
+    Un pool por worker de gunicorn: `max_workers` debe ser lo que ese worker
+    puede renderizar a la vez (RENDER_QUEUE_CONCURRENCY), no los núcleos de la máquina.
+    Los procesos se crean con "spawn": el worker ya tiene hilos (event loop,
+    clientes HTTP) y hacer fork con hilos vivos puede heredar locks tomados.
+    """
+
+    def __init__(self, max_workers: int = 1, memory_limit_mb: int = 0,
+                 max_tasks_per_child: Optional[int] = None):
+        if max_workers < 1:
+            raise ValueError("max_workers debe ser >= 1")
+        self.max_workers = max_workers
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_child = max_tasks_per_child
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # No encolar en el pool más de lo que puede ejecutar: el resto espera aquí
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            logger.info(f'Arrancando pool de render con {self.max_workers} procesos')
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb,),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+        return self._pool
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        except BrokenProcessPool:
+            # Un proceso murió (p.ej. por el límite de memoria): se recrea el pool para el siguiente render
+            logger.error("Pool de render roto, se recrea")
+            self.shutdown()
+            raise
+
+    async def compose_final(self, vs: VideoService, file_id: str, cartel: str, pareja: str, isImage: bool,
+                            profile: Optional[str] = None, timings: Optional[Timings] = None,
+                            storage: Optional[StorageBackend] = None) -> str:
+        """
+        Renderiza y sube el vídeo final a `storage` (por defecto, Azure desde el
+        proceso de render). Si el backend no se puede usar desde otro proceso
+        (memory), el hijo renderiza a un fichero y se sube desde aquí.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        timings = timings if timings is not None else Timings()
+        sink = await storage.sync_sink() if storage is not None else None
+        async with self._slots:
+            if storage is None or sink is not None:
+                url, spans = await self._run(_compose_final, vs, file_id, cartel, pareja, isImage, profile, sink)
+                timings.extend(spans)
+                return url
+            out_path = os.path.join(vs.temp_dir, f"vid_final_{file_id}.mp4")
+            try:
+                timings.extend(await self._run(_render_to_file, vs, out_path, cartel, pareja, isImage, profile))
+                with timings.span("upload") as rec:
+                    rec["bytes"] = os.path.getsize(out_path)
+                    _, url = await storage.upload_file(out_path, f"vid_final_{file_id}", file_id,
+                                                       content_settings="video/mp4", generate_sas=True)
+            finally:
+                try:
+                    os.remove(out_path)
+                except OSError:
+                    pass
+        logger.info(f'Video final subido a {type(storage).__name__}: {url}')
+        return url
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
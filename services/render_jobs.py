@@ -0,0 +1,156 @@
+import os, json, time, uuid
+import asyncio
+from typing import Awaitable, Callable, Optional
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+# Progreso aproximado al entrar en cada etapa
+STAGES = {
+    "queued": 0.0,
+    "downloading": 0.1,
+    "rendering": 0.3,
+    "notifying": 0.9,
+    "done": 1.0,
+}
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Cola de render llena")
+        self.retry_after = retry_after
+
+
+class RenderJobStore:
+    """
+    Estado de los jobs en ficheros JSON (uno por job) bajo un directorio
+    compartido: cualquier worker de gunicorn puede responder al polling,
+    aunque el job lo esté ejecutando otro.
+    """
+
+    def __init__(self, jobs_dir: str):
+        self.jobs_dir = jobs_dir
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def get(self, job_id: str) -> Optional[dict]:
+        # Los ids son uuid hex: cualquier otra cosa no es un job
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, job: dict):
+        job["updated_at"] = time.time()
+        tmp = f"{self._path(job['id'])}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp, self._path(job["id"]))
+
+    def prune(self, max_age_s: float):
+        limit = time.time() - max_age_s
+        for name in os.listdir(self.jobs_dir):
+            fp = os.path.join(self.jobs_dir, name)
+            try:
+                if os.path.getmtime(fp) < limit:
+                    os.unlink(fp)
+            except OSError:
+                pass
+
+
+class JobReporter:
+    def __init__(self, store: RenderJobStore, job: dict):
+        self._store = store
+        self.job = job
+
+    def stage(self, name: str, progress: Optional[float] = None):
+        self.job["stage"] = name
+        self.job["progress"] = STAGES.get(name, self.job["progress"]) if progress is None else progress
+        if name not in ("queued", "done"):
+            self.job["status"] = "running"
+        self._store.save(self.job)
+
+
+JobRunner = Callable[[JobReporter], Awaitable[str]]
+
+
+class RenderJobQueue:
+    """
+    Cola acotada de renders: `concurrency` jobs a la vez y como mucho
+    `max_pending` esperando. Todo render (síncrono o por job) pasa por aquí.
+    """
+
+    def __init__(self, store: RenderJobStore, concurrency: int, max_pending: int,
+                 retention_s: float = 24 * 3600):
+        self.store = store
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.retention_s = retention_s
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+
+    def start(self):
+        if self._workers:
+            return
+        self.store.prune(self.retention_s)
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, runner: JobRunner, meta: Optional[dict] = None) -> tuple[str, asyncio.Future]:
+        """Encola el job; devuelve (job_id, futuro con la URL final)."""
+        if self._queue is None:
+            self.start()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "video_url": None,
+            "error": None,
+            "created_at": time.time(),
+            "meta": meta or {},
+        }
+        fut = asyncio.get_running_loop().create_future()
+        # Los jobs asíncronos nadie los espera: que un fallo no genere "exception never retrieved"
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            self._queue.put_nowait((job, runner, fut))
+        except asyncio.QueueFull:
+            # Estimación grosera: lo que tarda en vaciarse una tanda de la cola
+            raise QueueFullError(retry_after=30 * max(1, self.max_pending // max(1, self.concurrency)))
+        self.store.save(job)
+        return job["id"], fut
+
+    async def _worker(self):
+        while True:
+            job, runner, fut = await self._queue.get()
+            reporter = JobReporter(self.store, job)
+            try:
+                url = await runner(reporter)
+                job["video_url"] = url
+                job["status"] = "done"
+                reporter.stage("done")
+                if not fut.done():
+                    fut.set_result(url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f'Job de render {job["id"]} falló')
+                job["status"] = "failed"
+                job["error"] = str(e)
+                self.store.save(job)
+                if not fut.done():
+                    fut.set_exception(e)
+            finally:
+                self._queue.task_done()
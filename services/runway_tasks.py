@@ -0,0 +1,205 @@
+import time
+import random
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional
+from runwayml import AsyncRunwayML, RateLimitError, APIConnectionError, APIStatusError, TaskFailedError, TaskTimeoutError
+from runwayml.types import TaskRetrieveResponse
+from core.http_clients import HttpClients
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+# Estados de Runway que terminan la tarea
+FAILED_STATUSES = ("FAILED", "CANCELLED")
+# Variación aleatoria de cada intervalo para no sondear todas las tareas a la vez
+POLL_JITTER = 0.1
+
+
+@dataclass
+class _PendingTask:
+    id: str
+    future: asyncio.Future
+    deadline: float
+    interval: float
+    next_poll: float
+    polls: int = 0
+    details: Optional[TaskRetrieveResponse] = field(default=None, repr=False)
+
+
+class RunwayTaskManager:
+    """
+    Tareas de Runway sin bloquear el event loop: se crean con el cliente async y un
+    único bucle de sondeo comparte el seguimiento de todas las pendientes del
+    proceso; quien la pidió espera un future. Sustituye a wait_for_task_output(),
+    que dejaba el worker parado durante todo el render de Runway.
+
+    Backoff adaptativo por tarea: el primer sondeo a los `initial_interval` s, y
+    cada respuesta sin terminar multiplica el intervalo por `backoff` hasta
+    `max_interval`. THROTTLED (en cola en Runway) salta directamente al máximo, y
+    un 429 pausa el bucle entero el Retry-After que mande Runway.
+
+    El cliente usa el httpx.AsyncClient compartido de HttpClients y se crea al
+    primer uso, dentro del event loop de la app.
+    """
+
+    def __init__(self, api_key: str, http: HttpClients, initial_interval: float = 5.0,
+                 max_interval: float = 20.0, backoff: float = 1.5, timeout: float = 600.0):
+        if initial_interval <= 0 or max_interval < initial_interval:
+            raise ValueError("Intervalos de sondeo de Runway no válidos")
+        if backoff < 1:
+            raise ValueError("backoff debe ser >= 1")
+        self.api_key = api_key
+        self.http = http
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self._client: Optional[AsyncRunwayML] = None
+        self._http_client = None
+        self._pending: dict[str, _PendingTask] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._paused_until = 0.0
+        self.polls = 0
+
+    @property
+    def client(self) -> AsyncRunwayML:
+        http_client = self.http.httpx
+        if self._client is None or self._http_client is not http_client:
+            self._client = AsyncRunwayML(api_key=self.api_key, http_client=http_client)
+            self._http_client = http_client
+        return self._client
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def image_to_video(self, **params) -> TaskRetrieveResponse:
+        """Crea la tarea y espera a que termine. TaskFailedError / TaskTimeoutError como el SDK."""
+        task = await self.client.image_to_video.create(**params)
+        logger.info(f"Tarea de Runway {task.id} creada ({self.in_flight + 1} en curso)")
+        return await self.wait(task.id)
+
+    async def wait(self, task_id: str) -> TaskRetrieveResponse:
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        pending = _PendingTask(
+            id=task_id,
+            future=loop.create_future(),
+            deadline=now + self.timeout,
+            interval=self.initial_interval,
+            next_poll=now + self._jitter(self.initial_interval),
+        )
+        self._pending[task_id] = pending
+        self._ensure_poller()
+        try:
+            return await pending.future
+        finally:
+            # También si quien espera se cancela: el bucle deja de sondearla
+            self._pending.pop(task_id, None)
+
+    def _jitter(self, interval: float) -> float:
+        return interval * (1 + random.uniform(-POLL_JITTER, POLL_JITTER))
+
+    def _ensure_poller(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+        else:
+            # Puede que la nueva tarea toque antes que la que esperaba el bucle
+            self._wakeup.set()
+
+    async def _poll_loop(self):
+        # Termina cuando no quedan tareas; el siguiente wait() lo vuelve a arrancar
+        while self._pending:
+            for pending in [p for p in self._pending.values() if p.future.done()]:
+                self._pending.pop(pending.id, None)
+            if not self._pending:
+                break
+            now = time.monotonic()
+            next_poll = max(min(p.next_poll for p in self._pending.values()), self._paused_until)
+            if next_poll > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), next_poll - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due = [p for p in self._pending.values() if p.next_poll <= now]
+            await asyncio.gather(*(self._poll(p) for p in due))
+
+    async def _poll(self, pending: _PendingTask):
+        try:
+            details = await self.client.tasks.retrieve(pending.id)
+        except RateLimitError as e:
+            retry_after = retry_after_seconds(e) or self.max_interval
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            logger.warning(f"Runway limita el sondeo (429): pausa de {retry_after:.0f}s")
+            self._reschedule(pending, self.max_interval)
+            return
+        except (APIConnectionError, APIStatusError) as e:
+            if isinstance(e, APIStatusError) and e.status_code < 500:
+                self._settle(pending, exception=e)
+                return
+            # Fallo puntual de red o de Runway: se reintenta más tarde, hasta el timeout
+            logger.warning(f"Error sondeando la tarea de Runway {pending.id}: {e!r}")
+            self._reschedule(pending, pending.interval * self.backoff)
+            return
+        except Exception as e:
+            self._settle(pending, exception=e)
+            return
+
+        self.polls += 1
+        pending.polls += 1
+        pending.details = details
+        if details.status == "SUCCEEDED":
+            logger.info(f"Tarea de Runway {pending.id} terminada tras {pending.polls} sondeos")
+            self._settle(pending, result=details)
+        elif details.status in FAILED_STATUSES:
+            self._settle(pending, exception=TaskFailedError(details))
+        else:
+            interval = self.max_interval if details.status == "THROTTLED" else pending.interval * self.backoff
+            self._reschedule(pending, interval)
+
+    def _reschedule(self, pending: _PendingTask, interval: float):
+        now = time.monotonic()
+        if now >= pending.deadline:
+            error = TaskTimeoutError(pending.details) if pending.details is not None \
+                else TimeoutError(f"Tarea de Runway {pending.id} sin respuesta")
+            self._settle(pending, exception=error)
+            return
+        pending.interval = min(interval, self.max_interval)
+        pending.next_poll = min(now + self._jitter(pending.interval), pending.deadline)
+
+    def _settle(self, pending: _PendingTask, result=None, exception: Optional[BaseException] = None):
+        self._pending.pop(pending.id, None)
+        if pending.future.done():
+            return
+        if exception is not None:
+            pending.future.set_exception(exception)
+        else:
+            pending.future.set_result(result)
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        for pending in list(self._pending.values()):
+            self._settle(pending, exception=RuntimeError("La app se está cerrando"))
+        # El httpx.AsyncClient es de HttpClients: lo cierra él
+        self._client = None
+        self._http_client = None
+        self._wakeup = None
+
+
+def retry_after_seconds(error: APIStatusError) -> Optional[float]:
+    try:
+        return float(error.response.headers.get("retry-after", ""))
+    except ValueError:
+        return None
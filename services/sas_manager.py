@@ -0,0 +1,110 @@
+import time
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from azure.storage.blob import BlobSasPermissions, UserDelegationKey, generate_blob_sas
+from azure.storage.blob.aio import BlobServiceClient
+import logging
+
+logger = logging.getLogger("video_generation_app")
+
+# "container": firmado con la clave de la cuenta. "user_delegation": con una clave de
+# delegación pedida con credenciales de Entra ID (managed identity), sin clave de cuenta
+SAS_MODES = ("container", "user_delegation")
+
+# Azure no emite claves de delegación de más de 7 días
+MAX_USER_DELEGATION_TTL = 7 * 24 * 3600
+# Margen para relojes desincronizados: el token vale desde un poco antes de emitirse
+CLOCK_SKEW = timedelta(minutes=5)
+
+
+@dataclass
+class BlobSasSigner:
+    """
+    Firma SAS de lectura de un solo blob, cada uno con `ttl` segundos desde que se
+    firma. Solo es un HMAC local con la clave de la cuenta o la de delegación (que
+    no caduca antes de `key_expiry`): picklable, así que los procesos de render
+    firman la URL del vídeo final al terminar la subida.
+    """
+    account_name: str
+    container: str
+    ttl: int
+    account_key: Optional[str] = None
+    user_delegation_key: Optional[UserDelegationKey] = None
+    key_expiry: Optional[datetime] = None
+
+    def sign(self, blob_name: str) -> str:
+        now = datetime.now(timezone.utc)
+        expiry = now + timedelta(seconds=self.ttl)
+        if self.key_expiry is not None:
+            # Un SAS de delegación deja de valer cuando caduca su clave
+            expiry = min(expiry, self.key_expiry)
+        return generate_blob_sas(self.account_name, self.container, blob_name,
+                                 account_key=self.account_key, user_delegation_key=self.user_delegation_key,
+                                 permission=BlobSasPermissions(read=True), start=now - CLOCK_SKEW, expiry=expiry)
+
+
+class SasManager:
+    """
+    SAS de lectura por blob (una URL filtrada solo da acceso a ese blob), válidos
+    `ttl` segundos desde que se firma cada URL.
+
+    Lo caro no es firmar (HMAC local) sino, en modo user_delegation, pedir la clave
+    de delegación a Azure: se pide una de 7 días y se reutiliza mientras le queden
+    más de `ttl` + `refresh_margin` segundos, así cualquier URL firmada con ella
+    (también en un proceso de render que tarde hasta `refresh_margin`) vale el `ttl` entero.
+
+    signer() devuelve None si no hay con qué firmar (modo container sin clave de
+    cuenta): las URLs salen sin SAS, como antes.
+    """
+
+    def __init__(self, container: str, mode: str = "container", account_key: Optional[str] = None,
+                 ttl: int = 24 * 3600, refresh_margin: int = 3600):
+        if mode not in SAS_MODES:
+            raise ValueError(f"Modo de SAS desconocido: {mode}")
+        if ttl <= 0 or refresh_margin < 0:
+            raise ValueError("ttl y refresh_margin no válidos")
+        if mode == "user_delegation" and ttl + refresh_margin >= MAX_USER_DELEGATION_TTL - CLOCK_SKEW.total_seconds():
+            raise ValueError(f"Con user_delegation ttl + refresh_margin debe ser menor que {MAX_USER_DELEGATION_TTL}s")
+        self.container = container
+        self.mode = mode
+        self.account_key = account_key
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._signer: Optional[BlobSasSigner] = None
+        self._refresh_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        # Claves de delegación pedidas a Azure
+        self.issued = 0
+
+    async def signer(self, service: BlobServiceClient) -> Optional[BlobSasSigner]:
+        if self.mode == "container":
+            # Con connection string la clave ya viene en la credencial del cliente
+            account_key = self.account_key or getattr(service.credential, "account_key", None)
+            if not account_key:
+                return None
+            return BlobSasSigner(service.account_name, self.container, self.ttl, account_key=account_key)
+        if self._signer is not None and time.time() < self._refresh_at:
+            return self._signer
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Otra petición puede haberla renovado mientras esperábamos
+            if self._signer is None or time.time() >= self._refresh_at:
+                self._signer = await self._delegation_signer(service)
+                self._refresh_at = self._signer.key_expiry.timestamp() - self.ttl - self.refresh_margin
+            return self._signer
+
+    async def sign(self, service: BlobServiceClient, blob_name: str) -> Optional[str]:
+        signer = await self.signer(service)
+        return signer.sign(blob_name) if signer is not None else None
+
+    async def _delegation_signer(self, service: BlobServiceClient) -> BlobSasSigner:
+        now = datetime.now(timezone.utc)
+        expiry = now + timedelta(seconds=MAX_USER_DELEGATION_TTL) - CLOCK_SKEW
+        key = await service.get_user_delegation_key(key_start_time=now - CLOCK_SKEW, key_expiry_time=expiry)
+        self.issued += 1
+        logger.info(f"Clave de delegación de {self.container} emitida, caduca {expiry:%Y-%m-%d %H:%M} UTC")
+        return BlobSasSigner(service.account_name, self.container, self.ttl, user_delegation_key=key,
+                             key_expiry=expiry)
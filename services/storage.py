@@ -0,0 +1,316 @@
+import os
+import time
+import hashlib
+import uuid
+import asyncio
+import mimetypes
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterable, Iterable, Optional, Tuple, Union
+from urllib.parse import quote, unquote, urlparse
+import aiofiles
+from azure.storage.blob import ContentSettings
+from fastapi import HTTPException
+import logging
+
+if TYPE_CHECKING:
+    from services.asset_cache import AssetCache
+
+logger = logging.getLogger("video_generation_app")
+
+# Extensión que se añade al nombre del blob según el Content-Type
+BLOB_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "video/mp4": ".mp4",
+}
+
+# STORAGE_BACKEND
+STORAGE_BACKENDS = ("azure", "local", "memory")
+
+# Prefijo de la ruta que sirve los objetos de los backends local y memory
+MEDIA_ROUTE = "/api/media/"
+
+FILE_CHUNK_SIZE = 4 * 1024 * 1024
+
+UploadData = Union[bytes, AsyncIterable[bytes], Iterable[bytes]]
+
+
+def _content_settings(content_settings: Union[ContentSettings, dict, str, None]) -> ContentSettings:
+    if isinstance(content_settings, ContentSettings):
+        return content_settings
+    if isinstance(content_settings, str):
+        return ContentSettings(content_type=content_settings)
+    try:
+        return ContentSettings(**(content_settings or {}))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid content_settings dict: {e}")
+
+
+async def _chunks(data: UploadData):
+    """Itera bytes, iterables síncronos o asíncronos como trozos asíncronos."""
+    if isinstance(data, (bytes, bytearray)):
+        yield bytes(data)
+    elif hasattr(data, "__aiter__"):
+        async for chunk in data:
+            yield chunk
+    else:
+        for chunk in data:
+            yield chunk
+
+
+@dataclass
+class StoredObject:
+    """Objeto de un backend local/memory, tal como lo sirve /api/media."""
+    content_type: str
+    size: int
+    modified: float
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+
+    @classmethod
+    def from_path(cls, path: str) -> Optional["StoredObject"]:
+        """Fichero regular como StoredObject (Content-Type por extensión); None si no existe."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return cls(content_type=content_type, size=st.st_size, modified=st.st_mtime, path=path)
+
+
+class StorageBackend(ABC):
+    """
+    Dónde se guardan los vídeos e imágenes que genera la app (STORAGE_BACKEND):
+    Azure Blob Storage en producción, o un sustituto local (disco o memoria) para
+    ejecutar el pipeline completo y medir sin red.
+
+    Los nombres de blob son "{folder}/{filename}{extensión por Content-Type}" en
+    todos los backends, y upload_* devuelven (file_id, public_url).
+    Un backend tiene que implementar al menos url, own_blob_name, upload_stream y
+    download_to_path: si le falta alguno falla al crearlo, no a mitad de un render.
+    """
+
+    cache: Optional["AssetCache"] = None
+
+    def blob_name(self, filename: str, folder: str = "", content_type: Optional[str] = None) -> str:
+        blob_name = f"{folder}/{filename}" if folder else filename
+        return blob_name + BLOB_EXTENSIONS.get(content_type, "")
+
+    @abstractmethod
+    def url(self, blob_name: str) -> str:
+        """URL pública del blob (sin SAS: upload_* lo añaden con generate_sas si el backend firma)."""
+
+    @abstractmethod
+    def own_blob_name(self, url: str) -> Optional[str]:
+        """Nombre del blob si la URL es de este almacén; si no, None."""
+
+    @abstractmethod
+    async def upload_stream(self, data: UploadData, filename: str, folder: str = "",
+                            content_settings: Union[ContentSettings, dict, str, None] = None,
+                            generate_sas: bool = False, length: Optional[int] = None) -> Tuple[str, str]:
+        """Sube `data` (bytes o trozos, síncronos o asíncronos) como {folder}/{filename}."""
+
+    async def upload_file(self, file_path: str, filename: str, folder: str = "",
+                          content_settings: Union[ContentSettings, dict, str, None] = None,
+                          generate_sas: bool = False) -> Tuple[str, str]:
+        async def read():
+            async with aiofiles.open(file_path, "rb") as f:
+                while chunk := await f.read(FILE_CHUNK_SIZE):
+                    yield chunk
+        return await self.upload_stream(read(), filename, folder, content_settings, generate_sas,
+                                        length=os.path.getsize(file_path))
+
+    async def copy_from_url(self, url: str, filename: str, folder: str = "",
+                            content_settings: Union[ContentSettings, dict, str, None] = None,
+                            generate_sas: bool = False) -> Optional[Tuple[str, str]]:
+        """Copia hecha por el propio almacén, sin pasar los bytes por la app; None si no la soporta."""
+        return None
+
+    @abstractmethod
+    async def download_to_path(self, blob_name: str, file_path: str) -> Optional[str]:
+        """Copia el blob a file_path y devuelve su Content-Type (None si no se conoce)."""
+
+    def get_object(self, blob_name: str) -> Optional[StoredObject]:
+        """Objeto para servirlo por /api/media; None si no existe o el backend no sirve objetos."""
+        return None
+
+    async def content_hash(self, blob_name: str) -> Optional[str]:
+        """
+        SHA-256 (hex) del contenido del blob si el almacén lo sabe sin descargarlo
+        (p.ej. la clave de GenerationCache de una imagen ya subida); None si no.
+        """
+        return None
+
+    async def sync_sink(self):
+        """
+        Objeto picklable con upload_chunks(chunks, filename, folder, content_settings,
+        generate_sas) -> (file_id, public_url), para subir desde los procesos de render.
+        None si el backend solo existe en este proceso.
+        """
+        return None
+
+    async def close(self):
+        pass
+
+
+class _MediaRouteStorage(StorageBackend):
+    """Backends cuyos objetos sirve la propia app en /api/media/{blob}."""
+
+    def __init__(self, public_url: str):
+        self.public_url = public_url.rstrip("/")
+
+    def url(self, blob_name: str) -> str:
+        # generate_sas no aplica: la ruta de media es pública
+        return f"{self.public_url}{MEDIA_ROUTE}{quote(blob_name)}"
+
+    def own_blob_name(self, url: str) -> Optional[str]:
+        if not url:
+            return None
+        base, parsed = urlparse(self.public_url), urlparse(url)
+        if (parsed.hostname or "").lower() != (base.hostname or "").lower() or parsed.port != base.port:
+            return None
+        prefix = f"{base.path.rstrip('/')}{MEDIA_ROUTE}"
+        if not parsed.path.startswith(prefix):
+            return None
+        return unquote(parsed.path[len(prefix):]) or None
+
+
+class LocalStorage(_MediaRouteStorage):
+    """
+    Blobs como ficheros bajo root_dir. Se escriben en un temporal y se publican
+    con rename, así que una subida a medias nunca es visible. Los procesos de
+    render escriben directamente aquí (sync_sink).
+    """
+
+    def __init__(self, root_dir: str, public_url: str):
+        super().__init__(public_url)
+        self.root_dir = os.path.abspath(root_dir)
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def path(self, blob_name: str) -> str:
+        path = os.path.abspath(os.path.join(self.root_dir, blob_name))
+        if os.path.commonpath([path, self.root_dir]) != self.root_dir:
+            raise HTTPException(status_code=400, detail="Invalid blob name")
+        return path
+
+    def _tmp(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{os.getpid()}-{uuid.uuid4().hex[:6]}.tmp"
+
+    async def upload_stream(self, data, filename, folder="", content_settings=None, generate_sas=False, length=None):
+        cs = _content_settings(content_settings)
+        blob_name = self.blob_name(filename, folder, cs.content_type)
+        path = self.path(blob_name)
+        tmp = self._tmp(path)
+        try:
+            async with aiofiles.open(tmp, "wb") as f:
+                async for chunk in _chunks(data):
+                    await f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                if os.path.exists(tmp): os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return filename, self.url(blob_name)
+
+    def upload_chunks(self, chunks: Iterable[bytes], filename: str, folder: str = "",
+                      content_settings=None, generate_sas: bool = False) -> Tuple[str, str]:
+        cs = _content_settings(content_settings)
+        blob_name = self.blob_name(filename, folder, cs.content_type)
+        path = self.path(blob_name)
+        tmp = self._tmp(path)
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                if os.path.exists(tmp): os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return filename, self.url(blob_name)
+
+    async def sync_sink(self):
+        return self
+
+    async def download_to_path(self, blob_name: str, file_path: str) -> Optional[str]:
+        src = self.path(blob_name)
+        try:
+            os.link(src, file_path)
+        except OSError:
+            await asyncio.to_thread(_copy_file, src, file_path)
+        return mimetypes.guess_type(blob_name)[0]
+
+    def get_object(self, blob_name: str) -> Optional[StoredObject]:
+        try:
+            return StoredObject.from_path(self.path(blob_name))
+        except HTTPException:
+            return None
+
+    async def content_hash(self, blob_name: str) -> Optional[str]:
+        try:
+            return await asyncio.to_thread(_file_sha256, self.path(blob_name))
+        except (HTTPException, OSError):
+            return None
+
+
+def _copy_file(src: str, dst: str):
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        while chunk := s.read(FILE_CHUNK_SIZE):
+            d.write(chunk)
+
+
+def _file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class MemoryStorage(_MediaRouteStorage):
+    """
+    Blobs en un dict en memoria de este proceso: para tests de carga y benchmarks.
+    No tiene sync_sink: los renders se suben desde el proceso de la app.
+    """
+
+    def __init__(self, public_url: str):
+        super().__init__(public_url)
+        self._objects: dict[str, StoredObject] = {}
+        self._lock = threading.Lock()
+
+    async def upload_stream(self, data, filename, folder="", content_settings=None, generate_sas=False, length=None):
+        cs = _content_settings(content_settings)
+        blob_name = self.blob_name(filename, folder, cs.content_type)
+        buf = bytearray()
+        async for chunk in _chunks(data):
+            buf += chunk
+        obj = StoredObject(content_type=cs.content_type or "application/octet-stream", size=len(buf),
+                           modified=time.time(), data=bytes(buf))
+        with self._lock:
+            self._objects[blob_name] = obj
+        return filename, self.url(blob_name)
+
+    async def download_to_path(self, blob_name: str, file_path: str) -> Optional[str]:
+        obj = self.get_object(blob_name)
+        if obj is None:
+            raise FileNotFoundError(blob_name)
+        async with aiofiles.open(file_path, "wb") as f:
+            await f.write(obj.data)
+        return obj.content_type
+
+    def get_object(self, blob_name: str) -> Optional[StoredObject]:
+        with self._lock:
+            return self._objects.get(blob_name)
+
+    async def content_hash(self, blob_name: str) -> Optional[str]:
+        obj = self.get_object(blob_name)
+        return hashlib.sha256(obj.data).hexdigest() if obj is not None else None
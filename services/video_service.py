@@ -1,19 +1,222 @@
-import os, uuid
+import os, uuid, json, math, time, shutil, hashlib, threading, subprocess
 import numpy as np
-from moviepy import VideoFileClip, concatenate_videoclips, AudioFileClip, ImageClip
-from utils.blob_storage import upload_bytes_to_blob_storage
+from typing import Optional
+from moviepy import VideoFileClip, VideoClip, concatenate_videoclips, AudioFileClip, ImageClip, CompositeVideoClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from PIL import Image
+from services.compositing import ScreenCompositor
+from services.overlay_cache import OverlayFrames, load_overlay_frames
+from services.ffmpeg_engine import render_ffmpeg
+from core.metrics import Timings
+from utils.blob_storage import upload_stream_to_blob_storage
 from azure.storage.blob import ContentSettings
-from io import BytesIO
 import logging
 
 logger = logging.getLogger("video_generation_app")
 
+FPS = 24
+
+# Tramos dinámicos (Runway): se recortan desde 0.5s con duración fija
+DYNAMIC_START = 0.5
+CARTEL_DURATION = 1.32
+PAREJA_IMAGE_DURATION = 1.32
+PAREJA_VIDEO_DURATION = 2.32
+
+# Subir si cambia la forma de generar los segmentos fijos (invalida la caché en disco)
+STATIC_SEGMENTS_VERSION = 5
+
+RENDER_MODES = ("full", "spliced")
+# "moviepy": frames por Python (render_mode aplica); "ffmpeg": un único filtergraph en un subproceso
+RENDER_ENGINES = ("moviepy", "ffmpeg")
+
+# Perfiles de codificación: los define Settings.ENCODING_PROFILES.
+# preset/crf/tune van a libx264; threads=None deja que x264 decida; audio_bitrate al AAC.
+# Este solo se usa si no se pasa ninguno (equivale a los valores por defecto de moviepy/x264).
+FALLBACK_ENCODING_PROFILES = {
+    "balanced": {"preset": "medium", "crf": 23, "tune": None, "threads": None, "audio_bitrate": None},
+}
+DEFAULT_ENCODING_PROFILE = "balanced"
+
+# MP4 fragmentado: no necesita volver atrás para escribir el moov (salida a FIFO/pipe)
+FRAGMENTED_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+STREAM_READ_SIZE = 1024 * 1024
+
+
+class _FifoBlobUploader(threading.Thread):
+    """
+    Lee el FIFO donde escribe ffmpeg y lo sube como blob por bloques (con
+    sink.upload_chunks si se pasa, p.ej. el del backend de STORAGE_BACKEND).
+    Si la subida falla sigue drenando el FIFO para que ffmpeg no se bloquee;
+    si el render se aborta, no se hace commit del blob.
+    """
+
+    def __init__(self, fifo: str, filename: str, folder: str, sink=None):
+        super().__init__(daemon=True)
+        self.fifo = fifo
+        self.sink = sink
+        self.filename = filename
+        self.folder = folder
+        self._aborted = threading.Event()
+        self._finished = threading.Event()
+        self._url = None
+        self._error = None
+        self.bytes = 0
+        # Tiempo dentro de la subida (stage_block + commit), sin la espera al encoder
+        self.upload_seconds = 0.0
+        self._drained_at = None
+
+    def _chunks(self, f):
+        while True:
+            b = f.read(STREAM_READ_SIZE)
+            if not b:
+                break
+            self.bytes += len(b)
+            start = time.perf_counter()
+            yield b
+            self.upload_seconds += time.perf_counter() - start
+        # EOF también llega cuando ffmpeg muere: el commit espera a que el render confirme
+        self._finished.wait()
+        if self._aborted.is_set():
+            raise RuntimeError("Render abortado: no se confirma el blob")
+        self._drained_at = time.perf_counter()
+
+    def run(self):
+        try:
+            with open(self.fifo, "rb") as f:
+                try:
+                    upload = self.sink.upload_chunks if self.sink is not None else upload_stream_to_blob_storage
+                    _, self._url = upload(
+                        chunks=self._chunks(f),
+                        content_settings=ContentSettings(content_type="video/mp4"),
+                        filename=self.filename,
+                        folder=self.folder,
+                        generate_sas=True,
+                    )
+                    # Último bloque + commit de la lista
+                    self.upload_seconds += time.perf_counter() - self._drained_at
+                except BaseException as e:
+                    self._error = e
+                    while f.read(STREAM_READ_SIZE):
+                        pass
+        except BaseException as e:
+            self._error = self._error or e
+
+    def finish(self):
+        self._finished.set()
+
+    def abort(self):
+        """El render falló: desbloquea al lector (puede no haber escritor nunca)."""
+        self._aborted.set()
+        self._finished.set()
+        while self.is_alive():
+            try:
+                fd = os.open(self.fifo, os.O_WRONLY | os.O_NONBLOCK)
+                os.close(fd)
+                return
+            except OSError:
+                # ENXIO: el lector aún no ha abierto el FIFO
+                time.sleep(0.05)
+
+    def result(self) -> str:
+        if self._error is not None:
+            raise self._error
+        return self._url
+
+class _RangeReader:
+    """
+    Decodifica solo el tramo [start, start + duration) de un vídeo, ya escalado
+    por ffmpeg: -ss en la entrada (salta al keyframe anterior y descarta hasta
+    `start` antes de los filtros), -t para no decodificar de más y scale dentro
+    del propio proceso de decode. Los frames se leen en orden desde el pipe.
+
+    Elige el frame de origen con la misma regla que VideoFileClip/subclipped:
+    int(fps * t + 1e-5), así que el recorte es exacto a frame.
+    """
+
+    def __init__(self, path: str, start: float, duration: float, size: tuple[int, int], fps: float):
+        self.path = path
+        self.start = start
+        self.size = size
+        self.fps = fps
+        self.first = int(fps * start + 0.00001)
+        last = int(fps * (start + duration) + 0.00001)
+        self.n_frames = last - self.first + 1
+        self._frame_bytes = size[0] * size[1] * 3
+        self.proc = None
+        self.pos = -1
+        self.last_read = None
+
+    def _open(self):
+        self.close()
+        # Como moviepy: un epsilon por debajo para que ffmpeg no se salte el frame exacto
+        seek = max(self.first / self.fps - 0.00001, 0.0)
+        cmd = [FFMPEG_BINARY, "-loglevel", "error",
+               "-ss", f"{seek:.6f}", "-t", f"{self.n_frames / self.fps:.6f}", "-i", self.path,
+               # Escalado en RGB, como el lanczos de PIL que usa resized()
+               "-an", "-sn", "-vf", f"format=rgb24,scale={self.size[0]}:{self.size[1]}:flags=lanczos",
+               "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     stdin=subprocess.DEVNULL, bufsize=self._frame_bytes * 4)
+        self.pos = -1
+
+    def frame(self, t: float) -> np.ndarray:
+        idx = min(int(self.fps * (self.start + t) + 0.00001) - self.first, self.n_frames - 1)
+        if self.proc is None or idx < self.pos:
+            self._open()
+        while self.pos < idx:
+            data = self.proc.stdout.read(self._frame_bytes)
+            if len(data) < self._frame_bytes:
+                # Fin del fichero antes de lo esperado: se repite el último frame
+                if self.last_read is None:
+                    raise IOError(f"No se pudo decodificar {self.path} en t={self.start + t:.3f}")
+                break
+            self.last_read = np.frombuffer(data, dtype=np.uint8).reshape(self.size[1], self.size[0], 3)
+            self.pos += 1
+        return self.last_read
+
+    def close(self):
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.terminate()
+            self.proc.stdout.close()
+            self.proc.wait()
+            self.proc = None
+
+
+class _RangeClip(VideoClip):
+    def __init__(self, reader: _RangeReader, duration: float):
+        self.reader = reader
+        super().__init__(frame_function=reader.frame, duration=duration)
+        self.fps = reader.fps
+
+    def close(self):
+        self.reader.close()
+        if self.audio is not None:
+            self.audio.close()
+
+
 class VideoService:
-    def __init__(self, static_videos_dir: str, overlay_path: str, audio_path: str, temp_dir: str):
+    def __init__(self, static_videos_dir: str, overlay_path: str, audio_path: str, temp_dir: str,
+                 render_mode: str = "full", encoding_profiles: Optional[dict] = None,
+                 default_profile: str = DEFAULT_ENCODING_PROFILE, render_engine: str = "moviepy"):
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"render_mode desconocido: {render_mode}")
+        if render_engine not in RENDER_ENGINES:
+            raise ValueError(f"render_engine desconocido: {render_engine}")
+        self.render_engine = render_engine
+        self.encoding_profiles = encoding_profiles or FALLBACK_ENCODING_PROFILES
+        if default_profile not in self.encoding_profiles:
+            raise ValueError(f"Perfil de codificación desconocido: {default_profile}")
+        self.default_profile = default_profile
         self.static_videos_dir = static_videos_dir
         self.overlay_path = overlay_path
         self.audio_path = audio_path
         self.temp_dir = temp_dir
+        self.render_mode = render_mode
+        # Fuera de la raíz de temp_dir: cleanup_temp_files solo borra ficheros sueltos
+        self.segments_dir = os.path.join(self.temp_dir, "static_segments")
+        self.overlay_cache_dir = os.path.join(self.temp_dir, "overlay_frames")
         os.makedirs(self.temp_dir, exist_ok=True)
 
     def _subclip(self, clip: VideoFileClip, seconds: float) -> VideoFileClip:
@@ -21,95 +224,254 @@ class VideoService:
 
     # --- blend helpers ---
     @staticmethod
-    def _screen_blend(bg, fg):
-        bg = bg.astype(np.float32) / 255.0
-        fg = fg.astype(np.float32) / 255.0
-        scr = 1.0 - (1.0 - bg) * (1.0 - fg)
-        return np.clip(scr * 255.0, 0, 255).astype(np.uint8)
-
-    @staticmethod
-    def _compose_screen(bg_clip, fg_clip_same_size):
+    def _compose_screen(bg_clip, overlay: OverlayFrames, offset: float = 0.0, rec: Optional[dict] = None):
         """
-        Aplica screen entre bg y fg respetando la máscara del fg.
-        Ambos deben tener mismo tamaño/duración.
+        Aplica screen entre bg y los frames del overlay respetando su alpha.
+        `offset` es la posición de bg_clip dentro del timeline del overlay.
+        Si se pasa `rec` (span de Timings) acumula ahí el tiempo del blend.
         """
+        # Buffers reservados una vez por render (ver ScreenCompositor)
+        compositor = ScreenCompositor()
+
         def make_frame(get_frame, t):
             bg = bg_clip.get_frame(t)
-            fg = fg_clip_same_size.get_frame(t)
-            if fg_clip_same_size.mask is not None:
-                m = fg_clip_same_size.mask.get_frame(t).astype(np.float32)  # [H,W]
-            else:
-                m = np.ones(bg.shape[:2], dtype=np.float32)
-
-            scr = VideoService._screen_blend(bg, fg)
-            m3 = m[..., None]
-            out = bg * (1.0 - m3) + scr * m3
-            return np.clip(out, 0, 255).astype(np.uint8)
+            start = time.perf_counter()
+            fg, alpha = overlay.frame(offset + t)
+            out = compositor.blend(bg, fg, alpha)
+            if rec is not None:
+                rec["seconds"] += time.perf_counter() - start
+                rec["frames"] = (rec["frames"] or 0) + 1
+            return out
 
         # transform aplica la función sobre cada frame
         return bg_clip.transform(make_frame)
 
+    @staticmethod
+    def _timed(clip, rec: dict):
+        """
+        Acumula en `rec` el tiempo y los frames de clip.get_frame. Incluye todo lo
+        que hay por debajo (decode, resize...): quien lo usa resta las capas inferiores.
+        """
+        def frame(get_frame, t):
+            start = time.perf_counter()
+            out = get_frame(t)
+            rec["seconds"] += time.perf_counter() - start
+            rec["frames"] = (rec["frames"] or 0) + 1
+            return out
+
+        return clip.transform(frame)
+
     # -----------------------
 
-    def compose_final(self, file_id:str, cartel: str, pareja: str, isImage: bool) -> str:
-        v1 = os.path.join(self.static_videos_dir, "nupzial1.mp4")
-        v2 = os.path.join(self.static_videos_dir, "nupzial3.mp4")
-        v3 = os.path.join(self.static_videos_dir, "nupzial4.mp4")
+    # --- carga de clips ---
+
+    @staticmethod
+    def _height(path: str, image: bool = False) -> int:
+        """Altura sin abrir un reader (ffprobe vía moviepy, o PIL para imágenes)."""
+        if image:
+            with Image.open(path) as img:
+                return img.size[1]
+        infos = ffmpeg_parse_infos(path)
+        w, h = infos["video_size"]
+        return int(w if abs(infos.get("video_rotation", 0)) in (90, 270) else h)
+
+    @staticmethod
+    def load_clip(path: str, start: float = 0.0, duration: Optional[float] = None,
+                  height: Optional[int] = None, audio: bool = False) -> VideoClip:
+        """
+        Abre el tramo [start, start + duration) de un vídeo a la altura `height`
+        (ancho proporcional, como resized(height=...)). Equivale a
+        VideoFileClip(path).subclipped(start, start + duration).resized(height=height),
+        pero sin decodificar frames fuera del tramo ni a resolución completa.
+        El decoder de vídeo no lee el audio: con audio=True se adjunta el del mismo
+        tramo (AudioFileClip), que solo hace falta si no hay pista fija.
+        """
+        infos = ffmpeg_parse_infos(path)
+        w, h = infos["video_size"]
+        if abs(infos.get("video_rotation", 0)) in (90, 270):
+            w, h = h, w
+        if height and height != h:
+            w, h = int(w * height / h), height
+        if duration is None:
+            duration = infos.get("video_duration") or infos["duration"]
+            duration -= start
+        reader = _RangeReader(path, start, duration, (int(w), int(h)), infos["video_fps"])
+        clip = _RangeClip(reader, duration)
+        if audio and infos.get("audio_found"):
+            source = AudioFileClip(path)
+            if start < source.duration:
+                # La pista puede ser algo más corta que el vídeo
+                clip.audio = source.subclipped(start, min(start + duration, source.duration))
+            else:
+                source.close()
+        return clip
+
+    def _static_paths(self) -> tuple[str, str, str]:
+        return (
+            os.path.join(self.static_videos_dir, "nupzial1.mp4"),
+            os.path.join(self.static_videos_dir, "nupzial3.mp4"),
+            os.path.join(self.static_videos_dir, "nupzial4.mp4"),
+        )
+
+    def encoding_profile(self, name: Optional[str] = None) -> dict:
+        name = name or self.default_profile
+        if name not in self.encoding_profiles:
+            raise ValueError(f"Perfil de codificación desconocido: {name}")
+        return self.encoding_profiles[name]
 
-        print("Usando videos fijos:", v1, v2, v3)
+    @staticmethod
+    def _x264_kwargs(profile: dict, extra_params: list[str]) -> dict:
+        """Argumentos de write_videofile para un perfil."""
+        params = ["-crf", str(profile["crf"])]
+        if profile.get("tune"):
+            params += ["-tune", profile["tune"]]
+        return {
+            "codec": "libx264",
+            "preset": profile["preset"],
+            "threads": profile.get("threads"),
+            "ffmpeg_params": params + ["-pix_fmt", "yuv420p"] + extra_params,
+        }
+
+    def compose_final(self, file_id:str, cartel: str, pareja: str, isImage: bool,
+                      profile: Optional[str] = None, timings: Optional[Timings] = None, sink=None) -> str:
+        """
+        Renderiza y sube el vídeo final. ffmpeg escribe MP4 fragmentado en un FIFO
+        y un hilo lo va subiendo como bloques del blob mientras se codifica:
+        sin fichero temporal ni copia completa en memoria.
+        sink: destino de la subida (StorageBackend.sync_sink()); por defecto, Azure.
+        """
+        timings = timings if timings is not None else Timings()
+        fifo = os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.mp4")
+        os.mkfifo(fifo)
+        uploader = _FifoBlobUploader(fifo, filename=f'vid_final_{file_id}', folder=file_id, sink=sink)
+        uploader.start()
+        try:
+            self.render_to_file(fifo, cartel, pareja, isImage, fragmented=True, profile=profile, timings=timings)
+            uploader.finish()
+        except BaseException:
+            uploader.abort()
+            raise
+        finally:
+            uploader.join()
+            # Solapado con el encode: solo el tiempo de subida propiamente dicho
+            upload = timings.counter("upload")
+            upload["seconds"] = uploader.upload_seconds
+            upload["bytes"] = uploader.bytes
+            try:
+                os.remove(fifo)
+            except:
+                pass
+
+        public_url = uploader.result()
+        logger.info(f'Video final subido a blob storage: {public_url}')
+        return public_url
+
+    def render_to_file(self, out_path: str, cartel: str, pareja: str, isImage: bool, fragmented: bool = False,
+                       profile: Optional[str] = None, timings: Optional[Timings] = None):
+        """
+        Renderiza el vídeo final en out_path (fichero o FIFO).
+        fragmented=True genera MP4 fragmentado, escribible en una salida no seekable.
+        Los tiempos por etapa se añaden a `timings` si se pasa.
+        """
+        movflags = FRAGMENTED_MOVFLAGS if fragmented else "+faststart"
+        profile_name = profile or self.default_profile
+        enc = self.encoding_profile(profile_name)
+        timings = timings if timings is not None else Timings()
+        if self.render_engine == "ffmpeg":
+            self._render_ffmpeg(out_path, cartel, pareja, isImage, movflags, enc, timings)
+        elif self.render_mode == "spliced":
+            self._render_spliced(out_path, cartel, pareja, isImage, movflags, profile_name, timings)
+        else:
+            self._render_full(out_path, cartel, pareja, isImage, movflags, enc, timings)
 
-        logger.info(f'Usando videos fijos: %s {v1}, %s {v2}, %s {v3}')
+    @staticmethod
+    def _output_bytes(out_path: str) -> Optional[int]:
+        # En un FIFO el tamaño lo cuenta el uploader
+        return os.path.getsize(out_path) if os.path.isfile(out_path) else None
+
+    def _render_ffmpeg(self, out_path: str, cartel: str, pareja: str, isImage: bool, movflags: str, enc: dict,
+                       timings: Timings):
+        """Mismo timeline que _render_full, como un único filtergraph de ffmpeg."""
+        v1, v2, v3 = self._static_paths()
+        if not (os.path.exists(v1) and os.path.exists(v2) and os.path.exists(v3)):
+            raise FileNotFoundError("Uno o más videos fijos no se encontraron")
+        if isImage:
+            pareja_seg = (pareja, 0.0, PAREJA_IMAGE_DURATION, True)
+        else:
+            pareja_seg = (self._local(pareja), DYNAMIC_START, PAREJA_VIDEO_DURATION, False)
+        timeline = [
+            (v1, 0.0, None, False),
+            pareja_seg,
+            (v2, 0.0, None, False),
+            (self._local(cartel), DYNAMIC_START, CARTEL_DURATION, False),
+            (v3, 0.0, None, False),
+        ]
+        render_ffmpeg(out_path, timeline, self.overlay_path, self.audio_path, enc, FPS, movflags, timings)
+
+    def _render_full(self, out_path: str, cartel: str, pareja: str, isImage: bool, movflags: str, enc: dict,
+                     timings: Timings):
+        v1, v2, v3 = self._static_paths()
+
+        logger.info(f'Usando videos fijos: {v1}, {v2}, {v3}')
 
         if not (os.path.exists(v1) and os.path.exists(v2)):
             logger.info(f'No se ha encontrado algun vídeo fijo')
             raise FileNotFoundError("Uno o más videos fijos no se encontraron")
 
         clips = []
+        # Sin pista fija el vídeo final lleva el audio de los clips, como antes
+        clip_audio = not os.path.exists(self.audio_path)
         try:
-            logger.info(f'EMPEZAMOS!!')
-            clip1 = VideoFileClip(v1);      
-            clips.append(clip1)
-
-            logger.info(f'cpli1 ok')
-
-            #Clip pareja
-            if isImage:
-                logger.info(f'Es imagen pareja')
-                nombre_archivo_imagen = pareja
-                duracion_imagen = 1.32
-                clip_imagen = ImageClip(nombre_archivo_imagen, duration=duracion_imagen)
-                clips.append(clip_imagen)
-            else:
-                logger.info(f'Es video pareja')
-                start_time_pareja = 0.5
-                duration_pareja = 2.32 
-                end_time_pareja = start_time_pareja + duration_pareja
-                clip_pareja = VideoFileClip(self._local(pareja));
-                subclip_pareja = clip_pareja.subclipped(start_time_pareja, end_time_pareja)   
-                clips.append(subclip_pareja)
-
-            logger.info(f'cpli pareja ok')
-
-            clip2 = VideoFileClip(v2);                
-            clips.append(clip2)
-
-            logger.info(f'cpli2 ok')
-
-            #Clip cartel
-            start_time_cartel = 0.5
-            duration_cartel = 1.32 
-            end_time_cartel = start_time_cartel + duration_cartel
-            clip_cartel = VideoFileClip(self._local(cartel));
-            subclip_cartel = clip_cartel.subclipped(start_time_cartel, end_time_cartel)   
-            clips.append(subclip_cartel)
+            with timings.span("open_clips") as open_rec:
+                logger.info(f'EMPEZAMOS!!')
+                # Altura común antes de abrir nada: cada clip se decodifica ya a min_h
+                min_h = min(self.static_heights() + [
+                    self._height(self._local(pareja), isImage),
+                    self._height(self._local(cartel)),
+                ])
+
+                clip1 = self.load_clip(v1, height=min_h, audio=clip_audio)
+                clips.append(clip1)
+
+                logger.info(f'cpli1 ok')
+
+                #Clip pareja
+                if isImage:
+                    logger.info(f'Es imagen pareja')
+                    nombre_archivo_imagen = pareja
+                    duracion_imagen = PAREJA_IMAGE_DURATION
+                    clip_imagen = ImageClip(nombre_archivo_imagen, duration=duracion_imagen)
+                    clips.append(clip_imagen)
+                else:
+                    logger.info(f'Es video pareja')
+                    start_time_pareja = DYNAMIC_START
+                    duration_pareja = PAREJA_VIDEO_DURATION
+                    subclip_pareja = self.load_clip(self._local(pareja), start_time_pareja, duration_pareja, min_h, clip_audio)
+                    clips.append(subclip_pareja)
+
+                logger.info(f'cpli pareja ok')
+
+                clip2 = self.load_clip(v2, height=min_h, audio=clip_audio)
+                clips.append(clip2)
+
+                logger.info(f'cpli2 ok')
+
+                #Clip cartel
+                start_time_cartel = DYNAMIC_START
+                duration_cartel = CARTEL_DURATION
+                subclip_cartel = self.load_clip(self._local(cartel), start_time_cartel, duration_cartel, min_h, clip_audio)
+                clips.append(subclip_cartel)
             
-            logger.info(f'cpli cartel ok')
+                logger.info(f'cpli cartel ok')
 
 
-            clip3 = VideoFileClip(v3); 
-            clips.append(clip3)
+                clip3 = self.load_clip(v3, height=min_h, audio=clip_audio)
+                clips.append(clip3)
 
-            logger.info(f'clip3  ok')
+                logger.info(f'clip3  ok')
+                inputs = [v1, self._local(pareja), v2, self._local(cartel), v3]
+                open_rec["bytes"] = sum(os.path.getsize(p) for p in inputs if os.path.isfile(p))
+                open_rec["frames"] = sum(int(c.duration * FPS) for c in clips)
 
 
             '''clip_polaroid = self._subclip(VideoFileClip(self._local(polaroid)), 2); 
@@ -124,63 +486,67 @@ class VideoService:
             clip3 = VideoFileClip(v3); 
             clips.append(clip3)'''
 
-            min_h = min(int(c.h) for c in clips)
-            resized = [c.resized(height=min_h) for c in clips]
+            # resize, concat y overlay son perezosos en moviepy: el coste está en cada
+            # get_frame durante el encode, así que se acumula por frame
+            decode = timings.counter("decode")
+            resize = timings.counter("resize")
+            concat = timings.counter("concat")
+            overlay_rec = timings.counter("overlay")
+
+            # Los vídeos ya llegan a min_h desde el decoder: solo la imagen se redimensiona aquí
+            resized = [self._timed(self._fit_height(self._timed(c, decode), min_h), resize) for c in clips]
 
             logger.info(f'llamo a concatenate_videoclips')
 
-            final_clip = concatenate_videoclips(resized, method="compose")
+            # Con todos los clips del mismo tamaño "compose" solo pinta cada frame sobre un fondo
+            # negro idéntico: "chain" da los mismos frames sin esa copia
+            method = "chain" if len({tuple(c.size) for c in resized}) == 1 else "compose"
+            final_clip = self._timed(concatenate_videoclips(resized, method=method), concat)
 
             logger.info(f'tenemos final_clip')
             
             # Efectos overlay
+            overlay_load = 0.0
             if os.path.exists(self.overlay_path):
-                overlay = (VideoFileClip(self.overlay_path, has_mask=True)
-                           .with_duration(final_clip.duration)
-                           .resized(final_clip.size))
-                final_clip = self._compose_screen(final_clip, overlay)
-                overlay.close()
+                start = time.perf_counter()
+                overlay = self._overlay_frames(final_clip.size, final_clip.duration)
+                overlay_load = time.perf_counter() - start
+                final_clip = self._compose_screen(final_clip, overlay, rec=overlay_rec)
 
             logger.info(f'efectos ok')
-            # Audio
-            if os.path.exists(self.audio_path):
-                audio = AudioFileClip(self.audio_path).subclipped(0, final_clip.duration)
-                final_clip = final_clip.with_audio(audio)
+            # Audio: se codifica aparte (lo mismo que haría write_videofile) para medirlo
+            audio_file = None
+            with timings.span("audio") as audio_rec:
+                if os.path.exists(self.audio_path):
+                    audio_file = os.path.join(self.temp_dir, f"temp-audio-{uuid.uuid4()}.m4a")
+                    with AudioFileClip(self.audio_path) as audio:
+                        audio.subclipped(0, final_clip.duration).write_audiofile(
+                            audio_file, codec="aac", bitrate=enc.get("audio_bitrate"))
+                    audio_rec["bytes"] = os.path.getsize(audio_file)
             logger.info(f'audio ok')
 
-            # Escribir a archivo temporal, leer bytes y subir a Blob Storage
-            tmp_out = os.path.join(self.temp_dir, f"{uuid.uuid4().hex}.mp4")
-            logger.info(f'guardo en temp')
-            audio_tmp = os.path.join(self.temp_dir, f"temp-audio-{uuid.uuid4()}.m4a")
-            final_clip.write_videofile(
-                tmp_out,
-                codec="libx264",
-                audio_codec="aac",
-                temp_audiofile=audio_tmp,
-                remove_temp=True,
-                fps=24
-            )
-            logger.info(f'temp ok')
-
-            # Leer bytes del archivo generado
-            with open(tmp_out, "rb") as f:
-                video_bytes = f.read()
-
-            # Subir a blob storage usando la función de bytes
-            filename = f'vid_final_{file_id}'
-
-            content_settings = ContentSettings(content_type="video/mp4")
-            _, public_url = upload_bytes_to_blob_storage(
-                video_content= video_bytes,
-                content_settings=content_settings,
-                filename=filename,
-                folder=file_id,
-                generate_sas=True
-            )
-
-            logger.info(f'Video final subido a blob storage: {public_url}')
-            
-            return public_url
+            logger.info(f'codificando')
+            with timings.span("encode") as encode:
+                # Sin pista fija, True: el audio concatenado de los clips (ver clip_audio)
+                final_clip.write_videofile(
+                    out_path,
+                    audio=audio_file or True,
+                    audio_codec="aac",
+                    audio_bitrate=enc.get("audio_bitrate"),
+                    temp_audiofile=os.path.join(self.temp_dir, f"temp-audio-{uuid.uuid4()}.m4a"),
+                    remove_temp=True,
+                    fps=FPS,
+                    **self._x264_kwargs(enc, ["-movflags", movflags]),
+                )
+                encode["frames"] = int(final_clip.duration * FPS)
+                encode["bytes"] = self._output_bytes(out_path)
+            # Cada capa incluye las de debajo: se deja en cada span solo lo suyo
+            encode["seconds"] -= concat["seconds"] + overlay_rec["seconds"]
+            concat["seconds"] -= resize["seconds"]
+            resize["seconds"] -= decode["seconds"]
+            # La carga de la caché del overlay es previa al encode
+            overlay_rec["seconds"] += overlay_load
+            logger.info(f'codificado ok')
         finally:
             # Cerrar clips individuales
             for c in clips:
@@ -194,11 +560,273 @@ class VideoService:
                     if hasattr(final_clip, "close"): final_clip.close()
                 except:
                     pass
-            # Eliminar archivo temporal si quedó
-            if 'tmp_out' in locals():
+            if 'audio_file' in locals() and audio_file:
+                try:
+                    if os.path.exists(audio_file): os.remove(audio_file)
+                except:
+                    pass
+
+    def _overlay_frames(self, size, duration: float) -> OverlayFrames:
+        # Decodificado una vez por resolución y duración; después es un lookup sobre mmap
+        return load_overlay_frames(self.overlay_path, size, duration, self.overlay_cache_dir, FPS)
+
+    # --- modo "spliced": segmentos fijos pre-codificados + stream copy ---
+
+    @staticmethod
+    def _frames_duration(n_frames: int) -> float:
+        """Duración con la que write_videofile (int(duration * fps) frames) escribe justo n_frames."""
+        duration = n_frames / FPS
+        while int(duration * FPS) < n_frames:
+            duration = math.nextafter(duration, math.inf)
+        return duration
+
+    @staticmethod
+    def _splice_timeline(parts: list[tuple[str, float]]) -> dict:
+        """
+        Reparte entre los tramos los frames que escribe _render_full con esas
+        duraciones: int(total * FPS) frames, y el frame i (t = i / FPS) es del tramo
+        que cubre t, como en concatenate_videoclips. Por tramo: su primer frame en
+        el timeline (offset), cuántos frames tiene y `shift`, lo que va de su inicio
+        a ese primer frame (para muestrear la fuente en los mismos instantes).
+        """
+        starts, start = [], 0.0
+        for _, duration in parts:
+            starts.append(start)
+            start += duration
+        total = start
+        bounds = [math.ceil(s * FPS - 1e-6) for s in starts] + [int(total * FPS)]
+        names = [name for name, _ in parts]
+        return {
+            "total": total,
+            "offsets": {n: bounds[i] / FPS for i, n in enumerate(names)},
+            "frames": {n: bounds[i + 1] - bounds[i] for i, n in enumerate(names)},
+            "shifts": {n: max(bounds[i] / FPS - starts[i], 0.0) for i, n in enumerate(names)},
+        }
+
+    @staticmethod
+    def _fit_height(clip, height: int):
+        # resized() reescala cada frame aunque el tamaño ya coincida
+        return clip if int(clip.h) == height else clip.resized(height=height)
+
+    @classmethod
+    def _fit(cls, clip, size: tuple[int, int]):
+        """
+        Redimensiona a la altura de salida y centra en el lienzo, igual que
+        concatenate_videoclips(method="compose") con clips de distinto ancho.
+        """
+        w, h = size
+        clip = cls._fit_height(clip, h)
+        if clip.w != w:
+            clip = CompositeVideoClip([clip.with_position("center")], size=size)
+        return clip
+
+    def _encode_segment(self, clip, out_path: str, enc: dict, n_frames: int):
+        # Mismos parámetros en todos los segmentos para que el concat por stream copy
+        # no tenga que recodificar (cada segmento arranca en IDR: GOP alineado al corte)
+        clip = clip.with_duration(self._frames_duration(n_frames))
+        clip.write_videofile(
+            out_path,
+            audio=False,
+            fps=FPS,
+            logger=None,
+            **self._x264_kwargs(enc, []),
+        )
+
+    def _overlay_segment(self, clip, offset: float, total: float, rec: Optional[dict] = None):
+        """Aplica el overlay del tramo [offset, offset + clip.duration) del timeline completo."""
+        if not os.path.exists(self.overlay_path):
+            return clip
+        overlay = self._overlay_frames(clip.size, total)
+        return self._compose_screen(clip, overlay, offset, rec)
+
+    def _segments_key(self, isImage: bool, height: int, profile: str) -> str:
+        enc = json.dumps(self.encoding_profile(profile), sort_keys=True)
+        parts = [f"v{STATIC_SEGMENTS_VERSION}", "img" if isImage else "vid", str(height), str(FPS), enc]
+        for p in (*self._static_paths(), self.overlay_path, self.audio_path):
+            if os.path.exists(p):
+                st = os.stat(p)
+                parts.append(f"{os.path.abspath(p)}:{st.st_size}:{int(st.st_mtime)}")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def static_heights(self) -> list[int]:
+        return [self._height(p) for p in self._static_paths()]
+
+    def prepare_static_segments(self, isImage: bool, height: int, profile: Optional[str] = None) -> dict:
+        """
+        Codifica una sola vez (por variante, altura y perfil) los tramos fijos nupzial1/3/4
+        con el overlay ya aplicado en su posición del timeline, y la pista de audio
+        completa. Devuelve el manifiesto; si ya existe en disco se reutiliza.
+        """
+        profile = profile or self.default_profile
+        enc = self.encoding_profile(profile)
+        key = self._segments_key(isImage, height, profile)
+        seg_dir = os.path.join(self.segments_dir, key)
+        manifest_path = os.path.join(seg_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        v1, v2, v3 = self._static_paths()
+        if not (os.path.exists(v1) and os.path.exists(v2) and os.path.exists(v3)):
+            raise FileNotFoundError("Uno o más videos fijos no se encontraron")
+
+        logger.info(f'Pre-codificando segmentos fijos ({"imagen" if isImage else "video"}, {height}p)')
+        os.makedirs(self.segments_dir, exist_ok=True)
+        # Cada worker de gunicorn construye en su propio directorio y publica con rename atómico
+        build_dir = os.path.join(self.segments_dir, f".{key}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+        os.makedirs(build_dir)
+        statics = []
+        try:
+            statics = [self.load_clip(p, height=height) for p in (v1, v2, v3)]
+            size = (max(c.w for c in statics), height)
+
+            # Mismo timeline y mismos frames que _render_full con estas entradas
+            d1, d2, d3 = (c.duration for c in statics)
+            timeline = self._splice_timeline([
+                ("s1", d1),
+                ("pareja", PAREJA_IMAGE_DURATION if isImage else PAREJA_VIDEO_DURATION),
+                ("s2", d2),
+                ("cartel", CARTEL_DURATION),
+                ("s3", d3),
+            ])
+            total = timeline["total"]
+
+            segments = {}
+            for name, clip in zip(("s1", "s2", "s3"), statics):
+                shift = timeline["shifts"][name]
+                clip = self._fit(clip.subclipped(shift) if shift else clip, size)
+                clip = self._overlay_segment(clip, timeline["offsets"][name], total)
+                self._encode_segment(clip, os.path.join(build_dir, f"{name}.mp4"), enc, timeline["frames"][name])
+                segments[name] = f"{name}.mp4"
+
+            audio_file = None
+            if os.path.exists(self.audio_path):
+                with AudioFileClip(self.audio_path) as audio:
+                    audio.subclipped(0, min(total, audio.duration)).write_audiofile(
+                        os.path.join(build_dir, "audio.m4a"), codec="aac",
+                        bitrate=enc.get("audio_bitrate"), logger=None)
+                audio_file = "audio.m4a"
+
+            manifest = {
+                "size": list(size),
+                **timeline,
+                "segments": segments,
+                "audio": audio_file,
+            }
+            with open(os.path.join(build_dir, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+
+            try:
+                os.rename(build_dir, seg_dir)
+            except OSError:
+                # Otro worker lo publicó antes: nos quedamos con el suyo
+                shutil.rmtree(build_dir, ignore_errors=True)
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        finally:
+            for c in statics:
+                try:
+                    c.close()
+                except:
+                    pass
+
+    def warm_static_segments(self, max_height: int):
+        """Arranque: deja listos los segmentos de ambas variantes para la altura esperada."""
+        height = min(self.static_heights() + [max_height])
+        for isImage in (True, False):
+            self.prepare_static_segments(isImage, height)
+
+    def _render_spliced(self, out_path: str, cartel: str, pareja: str, isImage: bool, movflags: str, profile: str,
+                        timings: Timings):
+        """
+        Solo codifica los tramos pareja y cartel; el resto se une por stream copy
+        (concat demuxer) junto con el audio ya codificado.
+        """
+        clips = []
+        work = []
+        try:
+            with timings.span("open_clips") as rec:
+                # Misma altura que el modo completo: la mínima entre fijos y dinámicos
+                height = min(self.static_heights() + [
+                    self._height(self._local(pareja), isImage),
+                    self._height(self._local(cartel)),
+                ])
+                rec["bytes"] = sum(os.path.getsize(self._local(p)) for p in (pareja, cartel))
+            # Casi siempre un acierto de caché; el primer render por altura/perfil los codifica
+            with timings.span("static_segments"):
+                manifest = self.prepare_static_segments(isImage, height, profile)
+            seg_dir = os.path.join(self.segments_dir, self._segments_key(isImage, height, profile))
+            enc = self.encoding_profile(profile)
+            size = tuple(manifest["size"])
+            frames = manifest["frames"]
+            offsets = manifest["offsets"]
+            shifts = manifest["shifts"]
+
+            # Solo el tramo usado y ya a la altura de salida
+            if isImage:
+                pareja_clip = ImageClip(pareja, duration=frames["pareja"] / FPS)
+            else:
+                pareja_clip = self.load_clip(self._local(pareja), DYNAMIC_START + shifts["pareja"],
+                                             frames["pareja"] / FPS, height)
+            cartel_clip = self.load_clip(self._local(cartel), DYNAMIC_START + shifts["cartel"],
+                                         frames["cartel"] / FPS, height)
+            clips = [pareja_clip, cartel_clip]
+
+            dynamic = {}
+            overlay_rec = timings.counter("overlay")
+            with timings.span("encode") as encode:
+                encode["frames"] = encode["bytes"] = 0
+                for name, clip in (("pareja", pareja_clip), ("cartel", cartel_clip)):
+                    clip = self._fit(clip, size)
+                    clip = self._overlay_segment(clip, offsets[name], manifest["total"], overlay_rec)
+                    path = os.path.join(self.temp_dir, f"seg-{name}-{uuid.uuid4().hex}.mp4")
+                    work.append(path)
+                    self._encode_segment(clip, path, enc, frames[name])
+                    dynamic[name] = path
+                    encode["frames"] += frames[name]
+                    encode["bytes"] += os.path.getsize(path)
+            encode["seconds"] -= overlay_rec["seconds"]
+            logger.info(f'segmentos dinámicos ok')
+
+            order = [
+                os.path.join(seg_dir, manifest["segments"]["s1"]),
+                dynamic["pareja"],
+                os.path.join(seg_dir, manifest["segments"]["s2"]),
+                dynamic["cartel"],
+                os.path.join(seg_dir, manifest["segments"]["s3"]),
+            ]
+            list_path = os.path.join(self.temp_dir, f"concat-{uuid.uuid4().hex}.txt")
+            work.append(list_path)
+            with open(list_path, "w", encoding="utf-8") as f:
+                for p in order:
+                    f.write(f"file '{os.path.abspath(p)}'\n")
+
+            cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error",
+                   "-f", "concat", "-safe", "0", "-i", list_path]
+            if manifest["audio"]:
+                cmd += ["-i", os.path.join(seg_dir, manifest["audio"]),
+                        "-map", "0:v:0", "-map", "1:a:0"]
+            cmd += ["-c", "copy", "-movflags", movflags, "-f", "mp4", out_path]
+            with timings.span("concat") as rec:
+                proc = subprocess.run(cmd, capture_output=True)
+                if proc.returncode != 0:
+                    raise RuntimeError(f"ffmpeg concat falló: {proc.stderr.decode(errors='replace')[-2000:]}")
+                rec["frames"] = sum(frames.values())
+                rec["bytes"] = self._output_bytes(out_path)
+            logger.info(f'concat stream copy ok')
+        finally:
+            for c in clips:
+                try:
+                    c.close()
+                except:
+                    pass
+            for p in work:
                 try:
-                    if os.path.exists(tmp_out):
-                        os.remove(tmp_out)
+                    if os.path.exists(p):
+                        os.remove(p)
                 except:
                     pass
 
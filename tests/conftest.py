@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from tests.media import ffmpeg, lavfi_video
+
+# Settings exige estas variables al importar core.deps (y con él los routers): sin
+# .env, valores de prueba. Ningún test llama a Runway, Graph ni WhatsApp
+for _name, _value in {
+    "RUNWAY_API_KEY": "test", "AZURE_TENANT_ID": "test", "AZURE_CLIENT_ID": "test",
+    "AZURE_CLIENT_SECRET": "", "AZURE_USER_EMAIL": "test@example.com", "SESSION_SECRET": "test",
+    "REDIRECT_URI": "http://localhost", "FRONTEND_URL": "http://localhost", "WHATSAPP_TOKEN": "test",
+    "WHATSAPP_PHONE_NUMBER_ID": "0", "GRAPH_API_VERSION": "v1.0",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+# Más pequeño que los assets reales para que el render tarde poco; cartel y pareja
+# más grandes que los fijos para que se reescalen a la altura común
+STATIC_SIZE = "320x180"
+DYNAMIC_SIZE = "480x270"
+
+
+@pytest.fixture
+def anyio_backend():
+    # Tests async con el plugin de anyio (viene con starlette/httpx), sobre asyncio como la app
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def render_assets(tmp_path_factory) -> dict:
+    """
+    Entradas de VideoService con la misma estructura que static/: nupzial1/3/4,
+    overlay con alpha, pista de audio, y un cartel y una pareja (vídeo e imagen)
+    como los que devuelve Runway.
+    """
+    root = tmp_path_factory.mktemp("render_assets")
+    videos = root / "videos"
+    videos.mkdir()
+    for n, tone in ((1, 440), (3, 550), (4, 660)):
+        lavfi_video(str(videos / f"nupzial{n}.mp4"), f"testsrc2=size={STATIC_SIZE}:rate=24", 0.5, tone)
+    assets = {
+        "static_videos_dir": str(videos),
+        "overlay": str(root / "overlay.mov"),
+        "audio": str(root / "audio.m4a"),
+        "cartel": str(root / "cartel.mp4"),
+        "pareja": str(root / "pareja.mp4"),
+        "pareja_img": str(root / "pareja.png"),
+    }
+    lavfi_video(assets["cartel"], f"testsrc=size={DYNAMIC_SIZE}:rate=24", 3, tone=880)
+    lavfi_video(assets["pareja"], f"mandelbrot=size={DYNAMIC_SIZE}:rate=24", 3)
+    ffmpeg("-f", "lavfi", "-i", "testsrc2=size=400x300", "-frames:v", "1", assets["pareja_img"])
+    # Más largo que el timeline, con alpha al 50%
+    ffmpeg("-f", "lavfi", "-i", f"testsrc2=size={STATIC_SIZE}:rate=24,format=rgba,colorchannelmixer=aa=0.5",
+           "-t", "6", "-c:v", "png", assets["overlay"])
+    ffmpeg("-f", "lavfi", "-i", "sine=frequency=220", "-t", "6", "-c:a", "aac", assets["audio"])
+    assert all(os.path.exists(p) for p in assets.values())
+    return assets
@@ -0,0 +1,61 @@
+"""Vídeos sintéticos para los tests, generados con el mismo ffmpeg que usa moviepy."""
+import subprocess
+from typing import Optional
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+
+def ffmpeg(*args: str):
+    subprocess.run([FFMPEG_BINARY, "-y", "-loglevel", "error", *args], check=True, stdin=subprocess.DEVNULL)
+
+
+def lavfi_video(path: str, source: str, duration: float, tone: Optional[int] = None):
+    """MP4 H.264 desde una fuente lavfi (p.ej. "testsrc2=size=320x180:rate=24"), con un tono si se pide."""
+    args = ["-f", "lavfi", "-i", source, "-t", f"{duration}"]
+    if tone:
+        args += ["-f", "lavfi", "-i", f"sine=frequency={tone}", "-t", f"{duration}", "-c:a", "aac"]
+    ffmpeg(*args, "-c:v", "libx264", "-pix_fmt", "yuv420p", path)
+
+
+def read_frames(path: str) -> np.ndarray:
+    """Todos los frames de un vídeo en RGB: array (frames, alto, ancho, 3)."""
+    w, h = ffmpeg_parse_infos(path)["video_size"]
+    out = subprocess.run([FFMPEG_BINARY, "-loglevel", "error", "-i", path, "-f", "rawvideo", "-pix_fmt", "rgb24", "-"],
+                         capture_output=True, check=True).stdout
+    return np.frombuffer(out, dtype=np.uint8).reshape(-1, h, w, 3)
+
+
+def has_audio(path: str) -> bool:
+    return bool(ffmpeg_parse_infos(path).get("audio_found"))
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+
+
+# Paso de gris entre frames consecutivos de numbered_video (hasta 85 frames); el paso
+# a YUV y vuelta desvía el nivel en ±1
+GRAY_STEP = 3
+
+
+def numbered_video(path: str, n_frames: int, size: tuple[int, int], fps: int = 24, tone: Optional[int] = None):
+    """Vídeo en el que el frame i es gris liso de nivel i * GRAY_STEP (ver frame_index)."""
+    w, h = size
+    if (n_frames - 1) * GRAY_STEP > 255:
+        raise ValueError(f"Como mucho {255 // GRAY_STEP + 1} frames")
+    frames = b"".join(np.full((h, w, 3), i * GRAY_STEP, dtype=np.uint8).tobytes() for i in range(n_frames))
+    cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", str(fps), "-i", "-"]
+    if tone:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency={tone}", "-t", f"{n_frames / fps}", "-c:a", "aac"]
+    # GOP corto: el seek de -ss cae en un keyframe anterior y hay que descartar frames hasta el exacto
+    cmd += ["-c:v", "libx264", "-qp", "0", "-g", "6", "-pix_fmt", "yuv420p", path]
+    subprocess.run(cmd, input=frames, check=True)
+
+
+def frame_index(frame: np.ndarray) -> int:
+    """Índice del frame de numbered_video que se está viendo."""
+    return int(round(float(frame.mean()) / GRAY_STEP))
@@ -0,0 +1,81 @@
+"""AssetCache: caché local write-through por contenido, con escritura por trozos y desalojo LRU."""
+import os
+
+import pytest
+
+from services.asset_cache import AssetCache
+
+
+def _objects(cache: AssetCache) -> list:
+    return sorted(os.listdir(os.path.join(cache.cache_dir, "objects")))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AssetCache(str(tmp_path / "assets"), max_bytes=1000)
+
+
+def test_put_bytes_then_copy_to(cache, tmp_path):
+    cache.put_bytes("boda/cartel.mp4", b"cartel")
+    dest = str(tmp_path / "cartel.mp4")
+    assert cache.copy_to("boda/cartel.mp4", dest)
+    with open(dest, "rb") as f:
+        assert f.read() == b"cartel"
+
+    # Quien recibe la copia puede borrarla: la caché sigue teniendo el blob
+    os.remove(dest)
+    assert cache.get("boda/cartel.mp4") is not None
+    assert not cache.copy_to("boda/otro.mp4", dest)
+    assert not os.path.exists(dest)
+
+
+def test_same_content_is_stored_once(cache):
+    cache.put_bytes("boda/a.jpg", b"imagen")
+    cache.put_bytes("boda/b.jpg", b"imagen")
+    assert cache.get("boda/a.jpg") == cache.get("boda/b.jpg")
+    assert len(_objects(cache)) == 1
+
+
+def test_writer_commit_and_abort(cache):
+    writer = cache.writer("boda/pareja.mp4")
+    for chunk in (b"pa", b"re", b"ja"):
+        writer.write(chunk)
+    writer.commit()
+    with open(cache.get("boda/pareja.mp4"), "rb") as f:
+        assert f.read() == b"pareja"
+
+    # Una subida fallida no deja nada: ni el blob ni el temporal
+    writer = cache.writer("boda/fallida.mp4")
+    writer.write(b"a medias")
+    writer.abort()
+    assert cache.get("boda/fallida.mp4") is None
+    assert len(_objects(cache)) == 1
+
+
+def test_writer_over_max_bytes_is_dropped(cache):
+    writer = cache.writer("boda/grande.mp4")
+    writer.write(b"x" * 600)
+    writer.write(b"x" * 600)
+    writer.commit()
+    assert cache.get("boda/grande.mp4") is None
+    assert _objects(cache) == []
+
+
+def test_least_recently_used_is_evicted(cache):
+    for name in "abc":
+        cache.put_bytes(f"boda/{name}", name.encode() * 400)
+        # mtime distinto para cada objeto aunque el reloj tenga poca resolución
+        os.utime(cache.get(f"boda/{name}"), (0, len(_objects(cache))))
+
+    # Con 1000 bytes solo caben dos: "a" era el menos usado
+    assert cache.get("boda/a") is None
+    assert cache.get("boda/b") is not None
+    assert cache.get("boda/c") is not None
+
+
+def test_disabled_cache_is_a_no_op(tmp_path):
+    cache = AssetCache(str(tmp_path / "assets"), max_bytes=0)
+    cache.put_bytes("boda/a", b"a")
+    assert cache.writer("boda/a") is None
+    assert cache.get("boda/a") is None
+    assert not os.path.exists(cache.cache_dir)
@@ -0,0 +1,99 @@
+"""VideoService.load_clip: recorte exacto a frame, escalado en el decoder y audio del tramo."""
+import os
+
+import pytest
+from moviepy import VideoFileClip
+
+from services.video_service import CARTEL_DURATION, DYNAMIC_START, FPS, PAREJA_VIDEO_DURATION, VideoService
+from tests.media import frame_index, has_audio, numbered_video
+
+SOURCE_FRAMES = 84
+SOURCE_SIZE = (128, 72)
+
+
+@pytest.fixture(scope="module")
+def numbered(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp("clip_loader") / "numbered.mp4")
+    numbered_video(path, SOURCE_FRAMES, SOURCE_SIZE, FPS, tone=440)
+    return path
+
+
+def _expected(start: float, t: float) -> int:
+    # Misma regla que VideoFileClip: int(fps * t + 1e-5) sobre el tiempo de la fuente
+    return int(FPS * (start + t) + 0.00001)
+
+
+@pytest.mark.parametrize("start, duration", [
+    (DYNAMIC_START, CARTEL_DURATION),
+    (DYNAMIC_START, PAREJA_VIDEO_DURATION),
+    (0.0, 1.0),
+    # Sin keyframe en el inicio (GOP de 6): el seek tiene que descartar hasta el frame exacto
+    (1.3, 0.75),
+])
+def test_trim_is_frame_accurate(numbered, start, duration):
+    n_frames = int(duration * FPS)
+    clip = VideoService.load_clip(numbered, start, duration)
+    try:
+        got = [frame_index(clip.get_frame(i / FPS)) for i in range(n_frames)]
+    finally:
+        clip.close()
+    assert got == [_expected(start, i / FPS) for i in range(n_frames)]
+
+
+def test_trim_boundaries_match_moviepy(numbered):
+    start, duration = DYNAMIC_START, PAREJA_VIDEO_DURATION
+    n_frames = int(duration * FPS)
+    clip = VideoService.load_clip(numbered, start, duration)
+    try:
+        with VideoFileClip(numbered, audio=False) as source:
+            ref = source.subclipped(start, start + duration)
+            for i in (0, 1, n_frames - 2, n_frames - 1):
+                assert frame_index(clip.get_frame(i / FPS)) == frame_index(ref.get_frame(i / FPS)), f"frame {i}"
+    finally:
+        clip.close()
+
+
+def test_scaled_inside_the_decoder(numbered):
+    clip = VideoService.load_clip(numbered, DYNAMIC_START, CARTEL_DURATION, height=36)
+    try:
+        assert tuple(clip.size) == (64, 36)
+        frame = clip.get_frame(0)
+        assert frame.shape == (36, 64, 3)
+        assert frame_index(frame) == _expected(DYNAMIC_START, 0)
+    finally:
+        clip.close()
+
+
+def test_backwards_seek_reopens_the_range(numbered):
+    clip = VideoService.load_clip(numbered, DYNAMIC_START, CARTEL_DURATION)
+    try:
+        last = int(CARTEL_DURATION * FPS) - 1
+        assert frame_index(clip.get_frame(last / FPS)) == _expected(DYNAMIC_START, last / FPS)
+        assert frame_index(clip.get_frame(0)) == _expected(DYNAMIC_START, 0)
+    finally:
+        clip.close()
+
+
+def test_audio_only_when_requested(numbered):
+    silent = VideoService.load_clip(numbered, DYNAMIC_START, CARTEL_DURATION)
+    with_audio = VideoService.load_clip(numbered, DYNAMIC_START, CARTEL_DURATION, audio=True)
+    try:
+        assert silent.audio is None
+        assert with_audio.audio is not None
+        assert with_audio.audio.duration == pytest.approx(CARTEL_DURATION)
+    finally:
+        silent.close()
+        with_audio.close()
+
+
+def test_render_keeps_clip_audio_without_static_track(render_assets, tmp_path):
+    vs = VideoService(
+        static_videos_dir=render_assets["static_videos_dir"],
+        overlay_path=render_assets["overlay"],
+        audio_path=str(tmp_path / "no_audio.m4a"),
+        temp_dir=str(tmp_path / "temp"),
+    )
+    out = str(tmp_path / "final.mp4")
+    vs.render_to_file(out, render_assets["cartel"], render_assets["pareja"], False)
+    assert os.path.exists(out)
+    assert has_audio(out)
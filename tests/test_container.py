@@ -0,0 +1,52 @@
+"""Container: un warmup que falla no deja en el registro la instancia a medio arrancar."""
+import pytest
+
+from core.container import Container
+
+pytestmark = pytest.mark.anyio
+
+
+class _Service:
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.started = False
+        self.closed = False
+
+    async def start(self):
+        if self.fail:
+            raise ConnectionError("sin red")
+        self.started = True
+
+    async def close(self):
+        self.closed = True
+
+
+async def test_failed_warmup_is_rebuilt_on_next_get():
+    built = []
+
+    def factory():
+        built.append(_Service(fail=not built))
+        return built[-1]
+
+    container = Container()
+    container.provide("svc", factory, warmup=lambda s: s.start(), shutdown=lambda s: s.close())
+    await container.startup()
+
+    first = built[0]
+    assert first.closed
+    again = container.get("svc")
+    assert again is not first and len(built) == 2
+    assert container.get("svc") is again
+
+
+async def test_failed_warmup_does_not_stop_the_rest():
+    container = Container()
+    container.provide("bad", lambda: _Service(fail=True), warmup=lambda s: s.start())
+    container.provide("good", lambda: _Service(fail=False), warmup=lambda s: s.start(),
+                      shutdown=lambda s: s.close())
+    await container.startup()
+
+    good = container.get("good")
+    assert good.started
+    await container.shutdown()
+    assert good.closed
@@ -0,0 +1,53 @@
+"""ContentIndex: SHA-256 del contenido -> último blob subido, para deduplicar subidas."""
+import os
+
+import pytest
+
+from services import content_index
+from services.content_index import ContentIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ContentIndex(str(tmp_path / "index"), max_entries=3)
+
+
+def test_put_get_discard(index):
+    index.put("aa", "boda/a.jpg", '"0x1"', "image/jpeg", 10)
+    assert index.get("aa") == {"blob": "boda/a.jpg", "etag": '"0x1"', "content_type": "image/jpeg", "size": 10}
+
+    # La última subida con ese contenido sustituye a la anterior
+    index.put("aa", "boda/b.jpg", '"0x2"', "image/jpeg", 10)
+    assert index.get("aa")["blob"] == "boda/b.jpg"
+
+    index.discard("aa")
+    assert index.get("aa") is None
+    index.discard("aa")
+
+
+def test_put_without_etag_is_ignored(index):
+    # Sin ETag no se puede copiar con source_if_match: no sirve de nada indexarlo
+    index.put("aa", "boda/a.jpg", None, "image/jpeg", 10)
+    assert index.get("aa") is None
+
+
+def test_corrupt_entry_is_a_miss(index):
+    with open(os.path.join(index.index_dir, "aa"), "w") as f:
+        f.write("{")
+    assert index.get("aa") is None
+
+
+def test_oldest_entries_are_pruned(index, monkeypatch):
+    monkeypatch.setattr(content_index, "PRUNE_EVERY", 5)
+    for i in range(5):
+        index.put(f"sha{i}", f"boda/{i}.jpg", f'"0x{i}"', "image/jpeg", i)
+        os.utime(os.path.join(index.index_dir, f"sha{i}"), (0, i))
+
+    assert [sha for sha in (f"sha{i}" for i in range(5)) if index.get(sha)] == ["sha2", "sha3", "sha4"]
+
+
+def test_disabled_index_is_a_no_op(tmp_path):
+    index = ContentIndex(str(tmp_path / "index"), max_entries=0)
+    index.put("aa", "boda/a.jpg", '"0x1"', "image/jpeg", 10)
+    assert index.get("aa") is None
+    assert not os.path.exists(index.index_dir)
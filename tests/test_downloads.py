@@ -0,0 +1,121 @@
+"""Descargas por rangos en paralelo y copia en streaming a blob con tope de tamaño."""
+import asyncio
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import HTTPException
+
+from services.storage import MemoryStorage
+from utils.downloads import download_to_dir, transfer_to_blob
+
+pytestmark = pytest.mark.anyio
+
+BODY = bytes(range(256)) * 1000  # 256000 bytes
+PART_SIZE = 20_000
+CONCURRENCY = 3
+
+
+class _Origin:
+    """Servidor de origen: con o sin soporte de Range, y cuenta las peticiones a la vez."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.ranges = 0
+
+    async def ranged(self, request: web.Request) -> web.StreamResponse:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            self.ranges += "Range" in request.headers
+            # Un origen lento: sin la espera cada petición acaba antes de que llegue la siguiente
+            await asyncio.sleep(0.02)
+            rng = request.http_range
+            start, stop = rng.start or 0, min(rng.stop or len(BODY), len(BODY))
+            part = BODY[start:stop]
+            status = 206 if "Range" in request.headers else 200
+            headers = {"Content-Type": "video/mp4"}
+            if status == 206:
+                headers["Content-Range"] = f"bytes {start}-{stop - 1}/{len(BODY)}"
+            return web.Response(status=status, body=part, headers=headers)
+        finally:
+            self.in_flight -= 1
+
+    async def plain(self, request: web.Request) -> web.Response:
+        return web.Response(body=BODY, content_type="video/mp4")
+
+    async def chunked(self, request: web.Request) -> web.StreamResponse:
+        # Sin Content-Length: el tope solo se puede aplicar mientras se lee
+        resp = web.StreamResponse(headers={"Content-Type": "video/mp4"})
+        await resp.prepare(request)
+        for i in range(0, len(BODY), 16_000):
+            await resp.write(BODY[i:i + 16_000])
+        await resp.write_eof()
+        return resp
+
+    async def missing(self, request: web.Request) -> web.Response:
+        return web.Response(status=404)
+
+
+@pytest.fixture
+async def origin():
+    handler = _Origin()
+    app = web.Application()
+    app.router.add_get("/ranged.mp4", handler.ranged)
+    app.router.add_get("/plain.mp4", handler.plain)
+    app.router.add_get("/chunked", handler.chunked)
+    app.router.add_get("/missing.mp4", handler.missing)
+    server = TestServer(app)
+    await server.start_server()
+    handler.url = lambda path: str(server.make_url(path))
+    yield handler
+    await server.close()
+
+
+async def test_ranged_download_is_parallel_and_bounded(origin, tmp_path):
+    path = await download_to_dir(origin.url("/ranged.mp4"), str(tmp_path), part_size=PART_SIZE,
+                                 concurrency=CONCURRENCY)
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+    assert origin.ranges == -(-len(BODY) // PART_SIZE)
+    # La primera petición va sola; el resto como mucho `concurrency` a la vez
+    assert 1 < origin.peak <= CONCURRENCY
+
+
+async def test_server_without_range_is_streamed(origin, tmp_path):
+    path = await download_to_dir(origin.url("/plain.mp4"), str(tmp_path), part_size=PART_SIZE)
+    assert path.endswith(".mp4")
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+
+
+async def test_failed_download_leaves_no_partial_file(origin, tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        await download_to_dir(origin.url("/missing.mp4"), str(tmp_path))
+    assert exc.value.status_code == 502
+    assert os.listdir(tmp_path) == []
+
+
+async def test_transfer_streams_into_storage(origin):
+    storage = MemoryStorage("http://app")
+    file_id, url = await transfer_to_blob(origin.url("/chunked"), storage, "vid", "boda")
+    assert (file_id, url) == ("vid", "http://app/api/media/boda/vid.mp4")
+    assert storage.get_object("boda/vid.mp4").data == BODY
+
+
+@pytest.mark.parametrize("path", ["/plain.mp4", "/chunked"], ids=["content_length", "sin_content_length"])
+async def test_transfer_over_max_bytes_is_rejected(origin, path):
+    storage = MemoryStorage("http://app")
+    with pytest.raises(HTTPException) as exc:
+        await transfer_to_blob(origin.url(path), storage, "vid", "boda", max_bytes=len(BODY) - 1)
+    assert exc.value.status_code == 502
+    assert storage.get_object("boda/vid.mp4") is None
+
+
+async def test_transfer_of_missing_source_is_a_client_error(origin):
+    storage = MemoryStorage("http://app")
+    with pytest.raises(HTTPException) as exc:
+        await transfer_to_blob(origin.url("/missing.mp4"), storage, "vid", "boda")
+    assert exc.value.status_code == 400
@@ -0,0 +1,45 @@
+"""RENDER_ENGINE: el filtergraph de ffmpeg tiene que dar el mismo vídeo final que moviepy."""
+import pytest
+
+from services.video_service import (
+    CARTEL_DURATION, FPS, PAREJA_IMAGE_DURATION, PAREJA_VIDEO_DURATION, RENDER_ENGINES, VideoService,
+)
+from tests.media import read_frames, psnr
+
+# Entre dos codificaciones x264 del mismo contenido; un frame de desfase en un corte
+# o un escalado distinto bajan de ~22 dB
+MIN_FRAME_PSNR = 30.0
+# Duración de nupzial1/3/4 en render_assets
+STATIC_DURATION = 0.5
+
+
+def _render(assets: dict, tmp_path, engine: str, is_image: bool) -> str:
+    vs = VideoService(
+        static_videos_dir=assets["static_videos_dir"],
+        overlay_path=assets["overlay"],
+        audio_path=assets["audio"],
+        temp_dir=str(tmp_path / f"temp_{engine}"),
+        render_engine=engine,
+    )
+    out = str(tmp_path / f"{engine}.mp4")
+    pareja = assets["pareja_img"] if is_image else assets["pareja"]
+    vs.render_to_file(out, assets["cartel"], pareja, is_image)
+    return out
+
+
+@pytest.mark.parametrize("is_image", [False, True], ids=["pareja_video", "pareja_imagen"])
+def test_engines_render_matching_frames(render_assets, tmp_path, is_image):
+    frames = {engine: read_frames(_render(render_assets, tmp_path, engine, is_image)) for engine in RENDER_ENGINES}
+    reference, candidate = frames["moviepy"], frames["ffmpeg"]
+
+    pareja = PAREJA_IMAGE_DURATION if is_image else PAREJA_VIDEO_DURATION
+    total = 3 * STATIC_DURATION + pareja + CARTEL_DURATION
+    # Mismo número de frames (int(duración * fps), como escribe moviepy) y mismo tamaño
+    assert reference.shape == candidate.shape
+    assert len(reference) == int(total * FPS)
+
+    per_frame = [psnr(a, b) for a, b in zip(reference, candidate)]
+    worst = min(range(len(per_frame)), key=per_frame.__getitem__)
+    assert per_frame[worst] >= MIN_FRAME_PSNR, \
+        f"frame {worst} ({worst / FPS:.3f}s): PSNR {per_frame[worst]:.1f} dB < {MIN_FRAME_PSNR} dB"
+
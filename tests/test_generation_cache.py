@@ -0,0 +1,113 @@
+"""GenerationCache.memoize: caché de generaciones de Runway y agrupación de peticiones iguales."""
+import asyncio
+
+import pytest
+
+from services.generation_cache import GenerationCache, generation_key
+
+pytestmark = pytest.mark.anyio
+
+KEY = generation_key("ab" * 32, prompt="cartel", model="gen4_turbo")
+STORED = ("cartel", "https://example.com/boda/cartel.mp4")
+
+
+class _Producer:
+    """produce() que cuenta las llamadas y no acaba hasta que se activa `release`."""
+
+    def __init__(self, result=STORED):
+        self.calls = 0
+        self.result = result
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GenerationCache(str(tmp_path / "generations"))
+
+
+def test_key_depends_on_image_and_params():
+    assert KEY == generation_key("ab" * 32, model="gen4_turbo", prompt="cartel")
+    assert KEY != generation_key("cd" * 32, prompt="cartel", model="gen4_turbo")
+    assert KEY != generation_key("ab" * 32, prompt="pareja", model="gen4_turbo")
+
+
+async def test_hit_after_produce(cache):
+    produce = _Producer()
+    produce.release.set()
+    assert await cache.memoize(KEY, produce) == STORED
+    assert await cache.memoize(KEY, produce) == STORED
+    assert produce.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # bypass vuelve a generar y guarda lo nuevo
+    fresh = _Producer(("cartel2", "https://example.com/boda/cartel2.mp4"))
+    fresh.release.set()
+    assert await cache.memoize(KEY, fresh, bypass=True) == fresh.result
+    assert cache.get(KEY) == fresh.result
+
+
+async def test_without_key_always_produces(cache):
+    produce = _Producer()
+    produce.release.set()
+    await cache.memoize(None, produce)
+    await cache.memoize(None, produce)
+    assert produce.calls == 2
+
+
+async def test_concurrent_requests_share_one_generation(cache):
+    produce = _Producer()
+    tasks = [asyncio.create_task(cache.memoize(KEY, produce)) for _ in range(3)]
+    await produce.started.wait()
+    produce.release.set()
+    assert await asyncio.gather(*tasks) == [STORED] * 3
+    assert produce.calls == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+async def test_cancelled_producer_hands_off_to_waiter(cache):
+    first, second = _Producer(), _Producer()
+    producer = asyncio.create_task(cache.memoize(KEY, first))
+    await first.started.wait()
+    waiter = asyncio.create_task(cache.memoize(KEY, second))
+    await asyncio.sleep(0)
+
+    # El cliente de la primera corta: la que esperaba pasa a generar en vez de cancelarse
+    producer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await producer
+    # Si la cancelación se propagara al que espera, second nunca arrancaría
+    await asyncio.wait({waiter, asyncio.create_task(second.started.wait())},
+                       return_when=asyncio.FIRST_COMPLETED)
+    assert not waiter.done()
+    assert second.started.is_set()
+
+    second.release.set()
+    assert await waiter == STORED
+    assert (first.calls, second.calls) == (1, 1)
+    assert cache.get(KEY) == STORED
+
+
+async def test_producer_error_reaches_waiters_and_is_not_cached(cache):
+    produce = _Producer(RuntimeError("Runway falló"))
+    tasks = [asyncio.create_task(cache.memoize(KEY, produce)) for _ in range(2)]
+    await produce.started.wait()
+    produce.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert [str(r) for r in results] == ["Runway falló"] * 2
+    assert produce.calls == 1
+    assert cache.get(KEY) is None
+
+
+async def test_expired_entry_is_a_miss(tmp_path):
+    cache = GenerationCache(str(tmp_path / "generations"), ttl=-1)
+    cache.put(KEY, STORED)
+    assert cache.get(KEY) is None
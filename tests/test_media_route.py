@@ -0,0 +1,78 @@
+"""/api/media: Range (206/416) y ETag/If-None-Match (304) con los backends local y memory."""
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core import deps
+from routers import media
+from services.storage import LocalStorage, MemoryStorage
+
+pytestmark = pytest.mark.anyio
+
+BODY = bytes(range(256)) * 40  # 10240 bytes
+URL = "/api/media/boda/final.mp4"
+
+
+@pytest.fixture(params=["local", "memory"])
+async def client(request, tmp_path):
+    if request.param == "local":
+        storage = LocalStorage(str(tmp_path / "storage"), "http://test")
+    else:
+        storage = MemoryStorage("http://test")
+    await storage.upload_stream(BODY, "final", folder="boda", content_settings={"content_type": "video/mp4"})
+
+    app = FastAPI()
+    app.include_router(media.router)
+    app.dependency_overrides[deps.get_blob_storage] = lambda: storage
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_full_response(client):
+    resp = await client.get(URL)
+    assert resp.status_code == 200
+    assert resp.content == BODY
+    assert resp.headers["content-type"] == "video/mp4"
+    assert resp.headers["accept-ranges"] == "bytes"
+    assert "max-age=" in resp.headers["cache-control"]
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=100-199", 100, 199),
+    ("bytes=10000-", 10000, len(BODY) - 1),
+    ("bytes=-40", len(BODY) - 40, len(BODY) - 1),
+    ("bytes=10200-99999", 10200, len(BODY) - 1),
+])
+async def test_range_is_partial_content(client, header, start, end):
+    resp = await client.get(URL, headers={"Range": header})
+    assert resp.status_code == 206
+    assert resp.content == BODY[start:end + 1]
+    assert resp.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+
+
+async def test_unsatisfiable_range(client):
+    resp = await client.get(URL, headers={"Range": f"bytes={len(BODY)}-"})
+    assert resp.status_code == 416
+    assert resp.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+async def test_if_none_match_is_not_modified(client):
+    tag = (await client.get(URL)).headers["etag"]
+    resp = await client.get(URL, headers={"If-None-Match": tag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == tag
+
+    # Comparación débil, y un ETag distinto vuelve a dar el fichero entero
+    assert (await client.get(URL, headers={"If-None-Match": f"W/{tag}"})).status_code == 304
+    assert (await client.get(URL, headers={"If-None-Match": '"otro"'})).status_code == 200
+
+
+async def test_if_range_with_stale_etag_sends_everything(client):
+    resp = await client.get(URL, headers={"Range": "bytes=0-9", "If-Range": '"otro"'})
+    assert resp.status_code == 200
+    assert resp.content == BODY
+
+
+async def test_missing_object_is_404(client):
+    assert (await client.get("/api/media/boda/nada.mp4")).status_code == 404
@@ -0,0 +1,113 @@
+"""RenderJobQueue: cola acotada (429 al llenarse) y estado de los jobs en /api/jobs/{id}."""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core import deps
+from routers import final_video
+from services.render_jobs import QueueFullError, RenderJobQueue, RenderJobStore
+
+pytestmark = pytest.mark.anyio
+
+FINAL_VIDEO = {
+    "id": "boda", "nombre1": "A", "nombre2": "B", "email1": "a@example.com", "email2": "b@example.com",
+    "cartel_video": "cartel.mp4", "pareja_video": "pareja.mp4", "isImage": False, "async_job": True,
+}
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return RenderJobQueue(RenderJobStore(str(tmp_path / "jobs")), concurrency=1, max_pending=1)
+
+
+@pytest.fixture
+def client(jobs):
+    app = FastAPI()
+    app.include_router(final_video.router)
+    app.dependency_overrides[deps.get_render_jobs] = lambda: jobs
+    # El router pide todas sus dependencias aunque la cola rechace el job antes de usarlas
+    for dep in (deps.get_video_service, deps.get_render_executor, deps.get_render_metrics,
+                deps.get_blob_storage, deps.get_http_clients):
+        app.dependency_overrides[dep] = lambda: None
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def _fill(jobs: RenderJobQueue) -> asyncio.Event:
+    """Un job en curso (bloqueado hasta que se active el evento) y otro esperando: cola llena."""
+    release = asyncio.Event()
+
+    async def blocked(job):
+        await release.wait()
+        return "https://example.com/final.mp4"
+
+    jobs.submit(blocked)
+    # El worker se lleva el primero; el segundo ocupa el único hueco de espera
+    await asyncio.sleep(0)
+    jobs.submit(blocked)
+    return release
+
+
+async def test_submit_rejects_when_full(jobs):
+    release = await _fill(jobs)
+    try:
+        with pytest.raises(QueueFullError) as exc:
+            jobs.submit(lambda job: asyncio.sleep(0))
+        assert exc.value.retry_after >= 1
+    finally:
+        release.set()
+        await jobs.stop()
+
+
+async def test_generate_final_video_returns_429_when_full(jobs, client):
+    release = await _fill(jobs)
+    try:
+        async with client:
+            resp = await client.post("/api/generate_final_video", json=FINAL_VIDEO)
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) >= 1
+    finally:
+        release.set()
+        await jobs.stop()
+
+
+async def test_job_status_is_polled_until_done(jobs, client):
+    release = asyncio.Event()
+
+    async def runner(job):
+        job.stage("rendering")
+        await release.wait()
+        return "https://example.com/final.mp4"
+
+    job_id, result = jobs.submit(runner)
+    try:
+        async with client:
+            await asyncio.sleep(0)
+            running = (await client.get(f"/api/jobs/{job_id}")).json()
+            assert (running["status"], running["stage"]) == ("running", "rendering")
+
+            release.set()
+            assert await result == "https://example.com/final.mp4"
+            done = (await client.get(f"/api/jobs/{job_id}")).json()
+            assert (done["status"], done["progress"], done["video_url"]) == \
+                ("done", 1.0, "https://example.com/final.mp4")
+
+            assert (await client.get("/api/jobs/0123abcd")).status_code == 404
+            assert (await client.get("/api/jobs/..%2Fjobs")).status_code == 404
+    finally:
+        await jobs.stop()
+
+
+async def test_failed_job_reports_error(jobs):
+    async def runner(job):
+        raise RuntimeError("ffmpeg falló")
+
+    job_id, result = jobs.submit(runner)
+    try:
+        with pytest.raises(RuntimeError):
+            await result
+        job = jobs.store.get(job_id)
+        assert (job["status"], job["error"]) == ("failed", "ffmpeg falló")
+    finally:
+        await jobs.stop()
@@ -0,0 +1,40 @@
+"""RENDER_MODE: "spliced" tiene que dar el mismo vídeo final que "full"."""
+import pytest
+
+from services.video_service import (
+    CARTEL_DURATION, FPS, PAREJA_IMAGE_DURATION, PAREJA_VIDEO_DURATION, RENDER_MODES, VideoService,
+)
+from tests.media import read_frames, psnr
+from tests.test_engine_parity import MIN_FRAME_PSNR, STATIC_DURATION
+
+
+def _render(assets: dict, tmp_path, mode: str, is_image: bool) -> str:
+    vs = VideoService(
+        static_videos_dir=assets["static_videos_dir"],
+        overlay_path=assets["overlay"],
+        audio_path=assets["audio"],
+        temp_dir=str(tmp_path / f"temp_{mode}"),
+        render_mode=mode,
+    )
+    out = str(tmp_path / f"{mode}.mp4")
+    pareja = assets["pareja_img"] if is_image else assets["pareja"]
+    vs.render_to_file(out, assets["cartel"], pareja, is_image)
+    return out
+
+
+@pytest.mark.parametrize("is_image", [False, True], ids=["pareja_video", "pareja_imagen"])
+def test_spliced_matches_full_render(render_assets, tmp_path, is_image):
+    frames = {mode: read_frames(_render(render_assets, tmp_path, mode, is_image)) for mode in RENDER_MODES}
+    reference, candidate = frames["full"], frames["spliced"]
+
+    # Las duraciones dinámicas no caen en frames exactos (2.32 s = 55.68 frames): cada
+    # segmento no puede redondear por su cuenta, el total es el de write_videofile
+    pareja = PAREJA_IMAGE_DURATION if is_image else PAREJA_VIDEO_DURATION
+    total = 3 * STATIC_DURATION + pareja + CARTEL_DURATION
+    assert reference.shape == candidate.shape
+    assert len(candidate) == int(total * FPS)
+
+    per_frame = [psnr(a, b) for a, b in zip(reference, candidate)]
+    worst = min(range(len(per_frame)), key=per_frame.__getitem__)
+    assert per_frame[worst] >= MIN_FRAME_PSNR, \
+        f"frame {worst} ({worst / FPS:.3f}s): PSNR {per_frame[worst]:.1f} dB < {MIN_FRAME_PSNR} dB"
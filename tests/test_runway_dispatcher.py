@@ -0,0 +1,98 @@
+"""RunwayDispatcher: concurrencia, cola acotada (RunwayQueueFullError) y token bucket."""
+import asyncio
+import time
+
+import pytest
+
+from services.runway_service import RunwayDispatcher, RunwayQueueFullError
+
+pytestmark = pytest.mark.anyio
+
+
+async def _hold(dispatcher: RunwayDispatcher, entered: asyncio.Event, release: asyncio.Event):
+    async with dispatcher.slot():
+        entered.set()
+        await release.wait()
+
+
+async def test_rejects_when_max_pending_is_exceeded():
+    dispatcher = RunwayDispatcher(concurrency=1, rate_per_minute=0, max_pending=1)
+    release = asyncio.Event()
+    first, second = asyncio.Event(), asyncio.Event()
+    running = asyncio.create_task(_hold(dispatcher, first, release))
+    await first.wait()
+    queued = asyncio.create_task(_hold(dispatcher, second, release))
+    await asyncio.sleep(0)
+    assert (dispatcher.in_flight, dispatcher.waiting) == (1, 1)
+
+    with pytest.raises(RunwayQueueFullError) as exc:
+        async with dispatcher.slot():
+            pass
+    assert exc.value.retry_after >= 1
+    assert dispatcher.rejected == 1
+    assert "runway_rejected_total 1" in dispatcher.render()
+
+    # Al acabar la primera entra la que esperaba, no la rechazada
+    release.set()
+    await asyncio.gather(running, queued)
+    assert second.is_set()
+    assert (dispatcher.in_flight, dispatcher.waiting) == (0, 0)
+
+
+async def test_without_pending_room_only_free_slots_are_admitted():
+    dispatcher = RunwayDispatcher(concurrency=2, rate_per_minute=0, max_pending=0)
+    release = asyncio.Event()
+    entered = [asyncio.Event(), asyncio.Event()]
+    tasks = [asyncio.create_task(_hold(dispatcher, e, release)) for e in entered]
+    for e in entered:
+        await e.wait()
+
+    with pytest.raises(RunwayQueueFullError):
+        async with dispatcher.slot():
+            pass
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+async def test_cancelled_waiter_frees_its_place():
+    dispatcher = RunwayDispatcher(concurrency=1, rate_per_minute=0, max_pending=1)
+    release = asyncio.Event()
+    first, second = asyncio.Event(), asyncio.Event()
+    running = asyncio.create_task(_hold(dispatcher, first, release))
+    await first.wait()
+    queued = asyncio.create_task(_hold(dispatcher, second, release))
+    await asyncio.sleep(0)
+
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert dispatcher.waiting == 0
+    release.set()
+    await running
+    async with dispatcher.slot():
+        assert dispatcher.in_flight == 1
+
+
+async def test_creations_are_spaced_by_the_token_bucket():
+    # 600/min = un token cada 0.1 s, sin ráfaga
+    dispatcher = RunwayDispatcher(concurrency=5, rate_per_minute=600, burst=1, max_pending=5)
+    start = time.monotonic()
+    for _ in range(3):
+        async with dispatcher.slot():
+            pass
+    assert time.monotonic() - start >= 0.18
+
+
+async def test_penalize_blocks_creations():
+    dispatcher = RunwayDispatcher(concurrency=5, rate_per_minute=6000, burst=5, max_pending=5)
+    dispatcher.penalize(0.2)
+    start = time.monotonic()
+    async with dispatcher.slot():
+        pass
+    assert time.monotonic() - start >= 0.18
+
+
+@pytest.mark.parametrize("limits", [{"concurrency": 0}, {"burst": 0}, {"rate_per_minute": -1}, {"max_pending": -1}])
+def test_invalid_limits(limits):
+    with pytest.raises(ValueError):
+        RunwayDispatcher(**limits)
@@ -1,122 +1,60 @@
-from azure.storage.blob import BlobServiceClient, ContentSettings, generate_blob_sas, BlobSasPermissions
+from azure.storage.blob import BlobServiceClient, BlobBlock, ContentSettings, generate_blob_sas, BlobSasPermissions
 from datetime import datetime, timedelta
 import os
 import uuid
-from typing import Optional, Tuple, Union
+from typing import Iterable, Optional, Tuple, Union
 from fastapi import HTTPException
 
-def upload_to_blob_storage(
-    file_path: str,
-    content_type: str,
-    filename: str,
-    folder: str = "",
-    generate_sas: bool = False
-) -> Tuple[str, str]:
-    """
-    Uploads a file to Azure Blob Storage and returns its ID and public URL.
-    
-    Args:
-        file_path: Path to the file to upload
-        content_type: MIME type of the file (e.g. 'image/jpeg', 'video/mp4')
-        folder: Optional folder name within the container
-        generate_sas: Whether to generate a SAS token for private containers
-    
-    Returns:
-        Tuple containing (file_id, public_url)
-    """
-
-    print("Uploading file to blob storage:", file_path)
-    try:
-        # Get connection string from environment
-        conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-        if not conn_str:
-            raise HTTPException(status_code=500, detail="Missing AZURE_STORAGE_CONNECTION_STRING")
-
-        # Generate unique file ID
-        #file_id = uuid.uuid4().hex
-        
-        # Create blob name with optional folder
-        blob_name = f"{folder}/{filename}" if folder else filename
-        
-        # Add file extension from content type
-        if content_type == "image/jpeg":
-            blob_name += ".jpg"
-        elif content_type == "image/png":
-            blob_name += ".png"
-        elif content_type == "video/mp4":
-            blob_name += ".mp4"
-        
-        # Get container name
-        container = os.getenv("AZURE_BLOB_CONTAINER", "public-data")
-        
-        # Create blob client
-        blob_service = BlobServiceClient.from_connection_string(conn_str)
-        blob_client = blob_service.get_blob_client(container=container, blob=blob_name)
-
-        # Upload file with content settings
-        with open(file_path, "rb") as data:
-            blob_client.upload_blob(
-                data,
-                overwrite=True,
-                content_settings=ContentSettings(content_type=content_type)
-            )
-
-        # Generate base URL
-        public_url = f"{blob_service.url}{container}/{blob_name}"
+# Subidas desde la app: services.blob_storage_service.BlobStorageService (SDK async).
+# Esto queda para los procesos de render, que suben el encode en streaming desde
+# un hilo sin event loop.
 
-        # Add SAS token if requested
-        if generate_sas:
-            account_key = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
-            if account_key:
-                sas = generate_blob_sas(
-                    account_name=blob_service.account_name,
-                    container_name=container,
-                    blob_name=blob_name,
-                    account_key=account_key,
-                    permission=BlobSasPermissions(read=True),
-                    expiry=datetime.utcnow() + timedelta(hours=24)
-                )
-                public_url = f"{public_url}?{sas}"
-
-        return filename, public_url
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error uploading to blob storage: {str(e)}")
+# Tamaño de cada bloque en las subidas por streaming (Put Block)
+STREAM_BLOCK_SIZE = 4 * 1024 * 1024
 
-def upload_bytes_to_blob_storage(
-    video_content: bytes,
+def upload_stream_to_blob_storage(
+    chunks: Iterable[bytes],
     content_settings: Union[ContentSettings, dict],
     filename: str,
     folder: str,
-    generate_sas: bool = False
+    generate_sas: bool = False,
+    block_size: int = STREAM_BLOCK_SIZE,
+    connection_string: Optional[str] = None,
+    container: Optional[str] = None,
+    signer=None,
 ) -> Tuple[str, str]:
     """
-    Upload raw bytes to Azure Blob Storage and return (file_id, public_url).
+    Upload a stream of chunks to Azure Blob Storage as a block blob and return (file_id, public_url).
+
+    Each block is staged as soon as `block_size` bytes are buffered, so the upload overlaps
+    with whoever produces the chunks (e.g. an encoder writing to a pipe). The block list is
+    only committed once the iterator is exhausted: if it raises, nothing becomes visible.
 
     Args:
-        video_content: Raw bytes to upload.
+        chunks: Iterable of byte chunks (any size).
         content_settings: ContentSettings instance or dict with content metadata (must include content_type).
         folder: Optional folder within the container.
         generate_sas: Whether to generate a SAS token for the returned URL.
+        block_size: Size of each staged block in bytes.
+        connection_string, container: Override the AZURE_* environment variables.
+        signer: Object with sign(blob_name) -> SAS (e.g. SasManager's BlobSasSigner) used when
+            generate_sas is set; without it a per-blob SAS is signed with AZURE_STORAGE_ACCOUNT_KEY.
     """
     try:
-        conn_str = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+        conn_str = connection_string or os.getenv("AZURE_STORAGE_CONNECTION_STRING")
         if not conn_str:
             raise HTTPException(status_code=500, detail="Missing AZURE_STORAGE_CONNECTION_STRING")
 
-        #file_id = uuid.uuid4().hex
         blob_name = f"{folder}/{filename}" if folder else filename
 
-        # Normalize ContentSettings
         if isinstance(content_settings, dict):
             try:
                 cs = ContentSettings(**content_settings)
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Invalid content_settings dict: {e}")
         else:
-            cs = content_settings  # assume ContentSettings
+            cs = content_settings
 
-        # Try to append extension based on content_type when possible
         ctype = getattr(cs, "content_type", None)
         if ctype == "image/jpeg":
             blob_name += ".jpg"
@@ -125,20 +63,35 @@ def upload_bytes_to_blob_storage(
         elif ctype == "video/mp4":
             blob_name += ".mp4"
 
-        container = os.getenv("AZURE_BLOB_CONTAINER", "public-data")
+        container = container or os.getenv("AZURE_BLOB_CONTAINER", "public-data")
         blob_service = BlobServiceClient.from_connection_string(conn_str)
         blob_client = blob_service.get_blob_client(container=container, blob=blob_name)
 
-        # Upload raw bytes
-        blob_client.upload_blob(
-            video_content,
-            overwrite=True,
-            content_settings=cs
-        )
+        # Los ids de bloque deben tener todos la misma longitud dentro del blob
+        prefix = uuid.uuid4().hex[:8]
+        blocks = []
+        buf = bytearray()
+
+        def stage(data):
+            block_id = f"{prefix}-{len(blocks):06d}"
+            blob_client.stage_block(block_id=block_id, data=bytes(data))
+            blocks.append(BlobBlock(block_id=block_id))
+
+        for chunk in chunks:
+            buf += chunk
+            while len(buf) >= block_size:
+                stage(buf[:block_size])
+                del buf[:block_size]
+        if buf or not blocks:
+            stage(buf)
+
+        blob_client.commit_block_list(blocks, content_settings=cs)
 
         public_url = f"{blob_service.url}{container}/{blob_name}"
 
-        if generate_sas:
+        if generate_sas and signer is not None:
+            public_url = f"{public_url}?{signer.sign(blob_name)}"
+        elif generate_sas:
             account_key = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
             if account_key:
                 sas = generate_blob_sas(
@@ -156,4 +109,4 @@ def upload_bytes_to_blob_storage(
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error uploading bytes to blob storage: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error uploading stream to blob storage: {str(e)}")
@@ -0,0 +1,213 @@
+import os
+import re
+import time
+import uuid
+import asyncio
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlparse
+import aiohttp
+import aiofiles
+from fastapi import HTTPException
+import logging
+
+if TYPE_CHECKING:
+    from services.storage import StorageBackend
+
+logger = logging.getLogger("video_generation_app")
+
+# Diccionario de mapeo de Content-Type a extensiones
+MIME_EXTENSIONS = {
+    "video/mp4": ".mp4",
+    "video/mpeg": ".mp4",
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "application/pdf": ".pdf",
+}
+
+CHUNK_SIZE = 1024 * 1024
+# Tamaño de cada petición Range; el primero sirve también para conocer el tamaño total
+RANGE_PART_SIZE = 8 * 1024 * 1024
+RANGE_CONCURRENCY = 4
+# Sin límite total (los vídeos pueden tardar), pero sí para conectar y entre lecturas
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+# Copia de la salida de Runway a blob: un MP4 de 5-10 s son decenas de MB
+TRANSFER_TIMEOUT = aiohttp.ClientTimeout(total=600, sock_connect=10, sock_read=60)
+TRANSFER_MAX_BYTES = 512 * 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+def _extension(url: str, content_type: str) -> str:
+    """Extensión desde la ruta de la URL o, si no tiene, desde el Content-Type."""
+    ext = os.path.splitext(urlparse(url).path)[1]
+    if ext:
+        return ext
+    ct = (content_type or "").lower().split(";")[0].strip()
+    inferred = MIME_EXTENSIONS.get(ct)
+    if not inferred:
+        logger.warning(f"Could not infer extension from Content-Type: {ct}. Using generic name.")
+    return inferred or ""
+
+
+async def _write_body(resp: aiohttp.ClientResponse, path: str, offset: Optional[int] = None) -> int:
+    written = 0
+    async with aiofiles.open(path, "wb" if offset is None else "r+b") as f:
+        if offset:
+            await f.seek(offset)
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            await f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+async def _fetch_range(session: aiohttp.ClientSession, url: str, path: str, start: int, end: int):
+    async with session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=DOWNLOAD_TIMEOUT) as r:
+        if r.status != 206:
+            raise aiohttp.ClientResponseError(r.request_info, r.history, status=r.status,
+                                              message="Respuesta sin rango a una petición Range")
+        written = await _write_body(r, path, start)
+    if written != end - start + 1:
+        raise aiohttp.ClientPayloadError(f"Rango {start}-{end} incompleto ({written} bytes)")
+
+
+async def download_to_dir(url: str, dest_dir: str, session: Optional[aiohttp.ClientSession] = None,
+                          part_size: int = RANGE_PART_SIZE, concurrency: int = RANGE_CONCURRENCY) -> str:
+    """
+    Descarga la URL en dest_dir sin bloquear el event loop y devuelve la ruta del fichero.
+
+    La primera petición pide solo el primer rango: si el servidor responde 206 y
+    queda más, el resto se baja en paralelo (hasta `concurrency` peticiones Range)
+    escribiendo cada trozo en su offset. Si ignora Range (200) se baja en streaming.
+    Ante cualquier error borra el fichero parcial y lanza HTTPException(502).
+    """
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession(timeout=DOWNLOAD_TIMEOUT)
+    out_path = None
+    try:
+        async with session.get(url, headers={"Range": f"bytes=0-{part_size - 1}"}, timeout=DOWNLOAD_TIMEOUT) as r:
+            r.raise_for_status()
+            out_path = os.path.join(dest_dir, f"input_{uuid.uuid4()}{_extension(url, r.headers.get('Content-Type'))}")
+            logger.info(f"Saving to path: {out_path}")
+            m = _CONTENT_RANGE.match(r.headers.get("Content-Range", "")) if r.status == 206 else None
+            await _write_body(r, out_path)
+        total = int(m.group(3)) if m else None
+
+        if total is not None and total > part_size:
+            async with aiofiles.open(out_path, "r+b") as f:
+                await f.truncate(total)
+            sem = asyncio.Semaphore(concurrency)
+
+            async def part(start: int):
+                async with sem:
+                    await _fetch_range(session, url, out_path, start, min(start + part_size, total) - 1)
+
+            tasks = [asyncio.create_task(part(start)) for start in range(part_size, total, part_size)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+        if total is not None and os.path.getsize(out_path) != total:
+            raise aiohttp.ClientPayloadError(f"Descarga incompleta: {os.path.getsize(out_path)} de {total} bytes")
+        return out_path
+    except BaseException as e:
+        if out_path:
+            try:
+                if os.path.exists(out_path): os.remove(out_path)
+            except OSError:
+                pass
+        if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError, OSError)):
+            logger.error(f"Error during download: {e}")
+            raise HTTPException(status_code=502, detail=f"Error descargando {url}: {e}") from e
+        raise
+    finally:
+        if own_session:
+            await session.close()
+
+
+async def download_input(url: str, dest_dir: str, session: Optional[aiohttp.ClientSession] = None,
+                         storage: Optional["StorageBackend"] = None) -> str:
+    """
+    Como download_to_dir, pero si la URL es un blob de nuestro contenedor lo baja
+    con `storage` (caché local si lo subimos nosotros; si no, download_blob en
+    paralelo, con los reintentos del SDK y sin depender de que el contenedor sea
+    público). El GET a la URL queda como fallback.
+    """
+    blob_name = storage.own_blob_name(url) if storage is not None else None
+    if blob_name is None:
+        return await download_to_dir(url, dest_dir, session)
+
+    ext = os.path.splitext(blob_name)[1]
+    out_path = os.path.join(dest_dir, f"input_{uuid.uuid4()}{ext}")
+    try:
+        content_type = await storage.download_to_path(blob_name, out_path)
+    except Exception as e:
+        logger.warning(f"Descarga por SDK de {blob_name} falló ({e}); usando la URL")
+        return await download_to_dir(url, dest_dir, session)
+    if not ext:
+        ext = _extension(url, content_type)
+        if ext:
+            os.replace(out_path, out_path + ext)
+            out_path += ext
+    logger.info(f"Blob propio {blob_name} descargado en {out_path}")
+    return out_path
+
+
+async def transfer_to_blob(url: str, storage: "StorageBackend", filename: str, folder: str,
+                           content_type: str = "video/mp4",
+                           session: Optional[aiohttp.ClientSession] = None,
+                           max_bytes: int = TRANSFER_MAX_BYTES) -> tuple[str, str]:
+    """
+    Copia la URL a blob storage en streaming, sin pasar por disco ni tener el fichero
+    entero en memoria: el cuerpo de la respuesta va directo a los bloques de
+    storage.upload_stream, con lo que hay en vuelo acotado.
+    Devuelve (file_id, public_url) como storage.upload_stream.
+
+    Respuesta distinta de 200 -> HTTPException(400); más de max_bytes, timeout o
+    error de red -> HTTPException(502). En ambos casos no se hace commit del blob.
+    """
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession(timeout=TRANSFER_TIMEOUT)
+    start = time.perf_counter()
+    received = 0
+    try:
+        async with session.get(url, timeout=TRANSFER_TIMEOUT) as r:
+            if r.status != 200:
+                raise HTTPException(status_code=400, detail=f"Error descargando {url}: HTTP {r.status}")
+            if r.content_length is not None and r.content_length > max_bytes:
+                raise HTTPException(status_code=502, detail=f"{url} excede el máximo de {max_bytes} bytes")
+
+            async def body():
+                nonlocal received
+                try:
+                    async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                        received += len(chunk)
+                        if received > max_bytes:
+                            raise HTTPException(status_code=502, detail=f"{url} excede el máximo de {max_bytes} bytes")
+                        yield chunk
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.error(f"Error during transfer: {e}")
+                    raise HTTPException(status_code=502, detail=f"Error descargando {url}: {e}") from e
+
+            result = await storage.upload_stream(
+                body(),
+                filename=filename,
+                folder=folder,
+                content_settings={"content_type": content_type},
+            )
+        elapsed = time.perf_counter() - start
+        logger.info(f"Transferencia a blob {folder}/{filename}: {received} bytes en {elapsed:.2f}s "
+                    f"({received / max(elapsed, 1e-6) / 1024 ** 2:.1f} MB/s)")
+        return result
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error during transfer: {e}")
+        raise HTTPException(status_code=502, detail=f"Error descargando {url}: {e}") from e
+    finally:
+        if own_session:
+            await session.close()
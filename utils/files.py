@@ -1,10 +1,13 @@
 import os, uuid, shutil
+from typing import Optional
 from fastapi import UploadFile
 from fastapi.responses import FileResponse
 from .images import compress_image
 
 TEMP_DIR = None  # se fija en main al arrancar (o usa settings)
 
+PLACEHOLDER_DIR = "placeholder_assets"
+
 PLACEHOLDERS = {
     "cartel_img": "placeholder_assets/cartel.png",
     "cartel": "placeholder_assets/cartel.mp4",
@@ -28,6 +31,19 @@ def save_uploaded_file(upload: UploadFile) -> str:
 def get_media_url(rel_path: str) -> str:
     return f"/api/media/{rel_path.replace('\\', '/')}"
 
+def media_file(rel_path: str) -> Optional[str]:
+    """
+    Fichero local detrás de una URL de get_media_url: los placeholders o los ficheros
+    sueltos de TEMP_DIR (no sus subdirectorios: jobs, cachés). None si no es ninguno.
+    """
+    path = os.path.abspath(rel_path)
+    placeholders = os.path.abspath(PLACEHOLDER_DIR)
+    in_placeholders = os.path.commonpath([path, placeholders]) == placeholders
+    in_temp = TEMP_DIR is not None and os.path.dirname(path) == os.path.abspath(TEMP_DIR)
+    if (in_placeholders or in_temp) and os.path.isfile(path):
+        return path
+    return None
+
 def get_placeholder(kind: str) -> str:
     return PLACEHOLDERS.get(kind, PLACEHOLDERS["cartel"])
 
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from services.storage import StoredObject
+
+# Lecturas de 1 MiB en vez de los 64 KiB de Starlette: 16 veces menos saltos al
+# hilo de anyio por MP4 servido cuando el servidor no ofrece pathsend
+MEDIA_CHUNK_SIZE = 1024 * 1024
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse de Starlette (Range, multirango, If-Range, HEAD) con trozos más
+    grandes. Si el servidor ASGI ofrece la extensión http.response.pathsend (p.ej.
+    Granian) el fichero completo se envía sin copiarlo por Python (sendfile);
+    uvicorn no la tiene y se lee por trozos.
+    """
+    chunk_size = MEDIA_CHUNK_SIZE
+
+
+def etag(obj: StoredObject) -> str:
+    # Misma fórmula que FileResponse: el ETag de un fichero no cambia al pasar por aquí
+    base = f"{obj.modified}-{obj.size}"
+    return f'"{hashlib.md5(base.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def _not_modified(request: Request, tag: str, modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Comparación débil (RFC 9110 13.1.2): W/"x" equivale a "x"
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or tag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _byte_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    (inicio, fin inclusive) de un Range de un solo tramo; None si no hay Range o es
+    multirango (se responde 200 entero). ValueError si no es satisfacible.
+    """
+    if not header:
+        return None
+    m = _RANGE.match(header.strip())
+    if m is None:
+        return None
+    first, last = m.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N: los N últimos
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def media_response(request: Request, obj: StoredObject, max_age: int) -> Response:
+    """
+    Respuesta para un objeto de media: 304 si el cliente ya lo tiene
+    (If-None-Match / If-Modified-Since), Range para que los reproductores puedan
+    saltar sin volver a bajar el MP4 entero, y Cache-Control para que lo guarden.
+    """
+    tag = etag(obj)
+    headers = {
+        "Cache-Control": f"public, max-age={max_age}",
+        "ETag": tag,
+        "Last-Modified": formatdate(obj.modified, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, tag, obj.modified):
+        return Response(status_code=304, headers=headers)
+
+    if obj.path is not None:
+        return MediaFileResponse(obj.path, media_type=obj.content_type, headers=headers, stat_result=os.stat(obj.path))
+
+    # Objeto en memoria: un solo tramo, sin copiar (memoryview)
+    data = memoryview(obj.data)
+    try:
+        if_range = request.headers.get("if-range")
+        byte_range = _byte_range(request.headers.get("range"), obj.size) if if_range in (None, tag) else None
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{obj.size}"})
+    if byte_range is None:
+        return Response(data, media_type=obj.content_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{obj.size}"
+    return Response(data[start:end + 1], status_code=206, media_type=obj.content_type, headers=headers)